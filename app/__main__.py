@@ -0,0 +1,220 @@
+import argparse
+from threading import Thread
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.database import init_db
+from app.maintenance import TASKS as MAINTENANCE_TASKS
+
+# pylint: disable=import-outside-toplevel
+
+APP = 'app.api:app'
+
+
+def _start_admin_panel() -> None:
+    from app.admin import run_admin_app
+
+    thread = Thread(target=run_admin_app, args=(settings.admin_panel_port,))
+    thread.daemon = True
+    thread.start()
+
+
+def _serve_gunicorn(port: int, workers: int) -> bool:
+    # gunicorn is optional: with it, SIGHUP replaces workers gracefully and a
+    # crashed worker is restarted; without it uvicorn supervises the workers
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        return False
+
+    class Application(BaseApplication):  # pylint: disable=abstract-method
+        def load_config(self) -> None:
+            options: Dict[str, Any] = {
+                'bind': f'127.0.0.1:{port}',
+                'workers': workers,
+                'worker_class': 'uvicorn.workers.UvicornWorker',
+                'graceful_timeout': 30,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self) -> Any:
+            from app.api import app
+
+            return app
+
+    Application().run()
+    return True
+
+
+def serve(port: int, workers: int, reload: bool, admin_panel: bool) -> None:
+    # flask, flask-admin and uvicorn are only needed by the process that serves
+    import uvicorn
+
+    if admin_panel:
+        _start_admin_panel()
+
+    if workers > 1 and not reload and _serve_gunicorn(port, workers):
+        return
+    uvicorn.run(APP, port=port, workers=workers, reload=reload)
+
+
+def backfill_rollups() -> None:
+    from app import crud_users, rollups, writer
+    from app.database import Session
+
+    session = Session()
+    try:
+        print(f'wrote {rollups.backfill(session)} rollup rows')
+        with writer.exclusive():
+            print(f'wrote {crud_users.backfill_user_stats(session)} user stats rows')
+            session.commit()
+    finally:
+        session.close()
+
+
+def rebuild_search() -> None:
+    from app import search, writer
+    from app.database import Session
+
+    session = Session()
+    try:
+        with writer.exclusive():
+            search.rebuild(session)
+            session.commit()
+    finally:
+        session.close()
+
+
+def run_maintenance(tasks: List[str]) -> None:
+    from app.database import Session
+    from app.maintenance import run_task
+
+    session = Session()
+    try:
+        for task in tasks:
+            rows = run_task(session, task, force=True)
+            print(f'{task}: {"did not run" if rows is None else rows}')
+    finally:
+        session.close()
+
+
+def _print_progress(progress: Any) -> None:
+    status = progress.as_dict()
+    print(
+        f'{progress.operation}: {status["pages_copied"]}/{status["pages_total"]} pages, '
+        f'{status["megabytes_per_second"]} MB/s'
+    )
+
+
+def run_backup(path: Optional[str]) -> None:
+    from app import backup
+    from app.database import engine
+
+    progress = backup.backup(
+        engine, path or backup.default_path(engine), report=_print_progress
+    )
+    print(f'backed up to {progress.path} in {progress.seconds:.2f}s')
+
+
+def run_restore(path: str) -> None:
+    from app import backup, writer
+    from app.database import engine
+
+    # keeps writers of a service that is still running out while pages are copied
+    with writer.exclusive():
+        progress = backup.restore(path, engine, report=_print_progress)
+    print(f'restored {progress.path} in {progress.seconds:.2f}s')
+
+
+def refresh_similar_movies(full: bool) -> None:
+    from app import similarity
+    from app.database import Session
+
+    session = Session()
+    try:
+        print(f'recomputed {similarity.refresh(session, full=full)} movies')
+    finally:
+        session.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m app')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('init-db', help='create database tables')
+    commands.add_parser(
+        'backfill-rollups',
+        help='rebuild rating trend rollups and user stats from all reviews',
+    )
+    commands.add_parser(
+        'rebuild-search', help='rebuild the full text index of review texts'
+    )
+    maintenance_parser = commands.add_parser(
+        'maintenance', help='run database maintenance tasks now'
+    )
+    maintenance_parser.add_argument(
+        '--task',
+        action='append',
+        dest='tasks',
+        choices=list(MAINTENANCE_TASKS),
+        help='run only this task, can be repeated',
+    )
+    backup_parser = commands.add_parser(
+        'backup', help='copy the database while the api keeps serving'
+    )
+    backup_parser.add_argument(
+        'path',
+        nargs='?',
+        help=f'defaults to a timestamped file in {settings.backup_dir}',
+    )
+    restore_parser = commands.add_parser(
+        'restore', help='replace the database with a backup, e.g. on a new replica'
+    )
+    restore_parser.add_argument('path')
+    similar_parser = commands.add_parser(
+        'similar-movies', help='recompute similar movies of movies with new reviews'
+    )
+    similar_parser.add_argument(
+        '--full', action='store_true', help='recompute every movie'
+    )
+    serve_parser = commands.add_parser('serve', help='run the api')
+    serve_parser.add_argument('--port', type=int, default=settings.api_port)
+    serve_parser.add_argument(
+        '--workers',
+        type=int,
+        default=settings.workers,
+        help='worker processes, writes are serialized through a single writer lock',
+    )
+    serve_parser.add_argument(
+        '--reload', action='store_true', help='restart on code changes (one worker)'
+    )
+    serve_parser.add_argument(
+        '--no-admin', action='store_true', help='do not start the flask-admin page'
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == 'init-db':
+        init_db()
+    elif args.command == 'backfill-rollups':
+        backfill_rollups()
+    elif args.command == 'rebuild-search':
+        rebuild_search()
+    elif args.command == 'maintenance':
+        run_maintenance(args.tasks or list(MAINTENANCE_TASKS))
+    elif args.command == 'backup':
+        run_backup(args.path)
+    elif args.command == 'restore':
+        run_restore(args.path)
+    elif args.command == 'similar-movies':
+        refresh_similar_movies(full=args.full)
+    else:
+        serve(
+            port=args.port,
+            workers=args.workers,
+            reload=args.reload,
+            admin_panel=settings.admin_panel and not args.no_admin,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+from typing import Any
+
+from flask import Flask, redirect
+from flask_admin import Admin
+from flask_admin.contrib.sqla import ModelView
+from sqlalchemy.orm import Session
+
+from app import database, models
+
+
+class UserView(ModelView):
+    column_auto_select_related = True
+    column_list = ('id', 'username', 'reviews')
+
+
+class MovieView(ModelView):
+    column_auto_select_related = True
+    column_list = ('id', 'title', 'release_year', 'avg_rating', 'reviews')
+
+    form_widget_args = {'avg_rating': {'disabled': True}}
+
+
+class ReviewBaseView(ModelView):
+    column_list = (
+        'id',
+        'user.username',
+        'user.id',
+        'movie.title',
+        'movie.id',
+        'movie.release_year',
+        'rate',
+        'text',
+        'datetime',
+    )
+
+    column_sortable_list = (
+        'id',
+        'user.username',
+        'user.id',
+        'movie.id',
+        'movie.title',
+        'movie.release_year',
+    )
+
+    # column_searchable_list = (models.User.id, models.User.username, models.Movie.title)
+
+    column_labels = {
+        'user.username': 'Username',
+        'user.id': 'User Id',
+        'movie.title': 'Movie Title',
+        'movie.id': 'Movie Id',
+        'movie.release_year': 'Movie Year',
+    }
+
+
+class ReviewUserView(ReviewBaseView):
+    column_searchable_list = (models.User.id, models.User.username)
+
+
+class ReviewMovieView(ReviewBaseView):
+    column_searchable_list = (models.Movie.id, models.Movie.title)
+
+
+def create_admin_app(session: Session) -> Flask:
+    flask_app = Flask(__name__)
+    flask_app.secret_key = 'pls work'
+
+    @flask_app.route('/')
+    def redirect_to_admin() -> Any:
+        return redirect('/admin')
+
+    admin = Admin(flask_app, name='movies blog', template_mode='bootstrap3')
+    admin.add_view(MovieView(models.Movie, session, name='Movie'))
+    admin.add_view(UserView(models.User, session, name='User'))
+    admin.add_view(
+        ReviewUserView(
+            models.Review, session, name='Reviews-Users', endpoint='reviews-users'
+        )
+    )
+    admin.add_view(
+        ReviewMovieView(
+            models.Review, session, name='Reviews-Movies', endpoint='reviews-movies'
+        )
+    )
+    return flask_app
+
+
+def run_admin_app(port: int) -> None:
+    create_admin_app(database.Session()).run(port=port)
@@ -0,0 +1,196 @@
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from time import monotonic
+from typing import AsyncIterator, Callable, Deque, Dict, Tuple
+
+from app import metrics
+from app.config import settings
+
+ROUTE_CLASSES = ('auth', 'search', 'write', 'read')
+
+ADMISSION_ACTIVE = metrics.registry.gauge(
+    'admission_active', 'Requests holding a slot of their route class', ('route_class',)
+)
+ADMISSION_QUEUED = metrics.registry.gauge(
+    'admission_queued',
+    'Requests waiting for a slot of their route class',
+    ('route_class',),
+)
+ADMISSION_REJECTED = metrics.registry.counter(
+    'admission_rejected_total',
+    'Requests shed with 503 by route class and reason',
+    ('route_class', 'reason'),
+)
+RATE_LIMITED = metrics.registry.counter(
+    'rate_limited_total', 'Requests rejected with 429 by the per-user rate limit'
+)
+
+# buckets that refilled equal a new one and are dropped once there are more than
+# this, and again whenever their number doubled since
+BUCKETS_PRUNE_SIZE = 10000
+
+
+class Overloaded(Exception):
+    def __init__(self, route_class: str) -> None:
+        super().__init__(route_class)
+        self.route_class = route_class
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('wake',)
+
+    def __init__(self, wake: Callable[[], object]) -> None:
+        self.wake = wake
+
+
+def _set_result(future: 'asyncio.Future[None]') -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class Limiter:
+    # a slot freed while requests wait is handed to the oldest waiter instead of
+    # being released, so waiters cannot be overtaken; waiters are coroutines of any
+    # event loop awaiting a future, none of them holds a thread
+    def __init__(self, route_class: str) -> None:
+        self.route_class = route_class
+        self.active = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return settings.admission_limits.get(self.route_class, 0)
+
+    @property
+    def queue_size(self) -> int:
+        return settings.admission_queues.get(self.route_class, 0)
+
+    def _try_acquire(self, wake: Callable[[], object]) -> Tuple[bool, _Waiter]:
+        waiter = _Waiter(wake)
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                ADMISSION_ACTIVE.inc(self.route_class)
+                return True, waiter
+            if len(self._waiters) >= self.queue_size:
+                ADMISSION_REJECTED.inc(self.route_class, 'queue_full')
+                raise Overloaded(self.route_class)
+            self._waiters.append(waiter)
+            ADMISSION_QUEUED.inc(self.route_class)
+            return False, waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        # False when the slot was handed over just as the waiter gave up
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            ADMISSION_QUEUED.dec(self.route_class)
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters and self.active <= self.limit:
+                waiter = self._waiters.popleft()
+                ADMISSION_QUEUED.dec(self.route_class)
+            else:
+                self.active -= 1
+                ADMISSION_ACTIVE.dec(self.route_class)
+                return
+        waiter.wake()
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        future: 'asyncio.Future[None]' = loop.create_future()
+        acquired, waiter = self._try_acquire(
+            lambda: loop.call_soon_threadsafe(_set_result, future)
+        )
+        if acquired:
+            return
+        try:
+            await asyncio.wait_for(future, settings.admission_timeout)
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                ADMISSION_REJECTED.inc(self.route_class, 'timeout')
+                raise Overloaded(self.route_class) from None
+        except asyncio.CancelledError:
+            if not self._abandon(waiter):
+                self.release()
+            raise
+
+
+limiters = {route_class: Limiter(route_class) for route_class in ROUTE_CLASSES}
+
+
+@asynccontextmanager
+async def admitted(route_class: str) -> AsyncIterator[None]:
+    limiter = limiters[route_class]
+    if limiter.limit <= 0:
+        yield
+        return
+    await limiter.acquire_async()
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+def admit(route_class: str) -> Callable[[], AsyncIterator[None]]:
+    # route dependency, requests queue on the event loop before taking a thread
+    async def dependency() -> AsyncIterator[None]:
+        async with admitted(route_class):
+            yield
+
+    return dependency
+
+
+class TokenBuckets:
+    def __init__(self) -> None:
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._prune_at = BUCKETS_PRUNE_SIZE
+
+    def _prune(self, now: float, rate: float, burst: int) -> None:
+        self._buckets = {
+            key: (tokens, updated)
+            for key, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * rate < burst
+        }
+
+    def take(self, key: str) -> None:
+        rate, burst = settings.rate_limit_per_second, settings.rate_limit_burst
+        if rate <= 0:
+            return
+        now = monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                RATE_LIMITED.inc()
+                raise RateLimited((1 - tokens) / rate)
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self._prune_at:
+                self._prune(now, rate, burst)
+                self._prune_at = max(BUCKETS_PRUNE_SIZE, 2 * len(self._buckets))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._prune_at = BUCKETS_PRUNE_SIZE
+
+
+# logins are charged by client address and username before the password check,
+# users by their name once it passed
+login_buckets = TokenBuckets()
+user_buckets = TokenBuckets()
@@ -1,25 +1,35 @@
-from threading import Thread
-from typing import Any
+import math
 
-import uvicorn
-from fastapi import FastAPI, status
+from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
-from flask import Flask, redirect
-from flask_admin import Admin
-from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import inspect
 
+import app.routing.backups as backups_routing
+import app.routing.batch as batch_routing
+import app.routing.metrics as metrics_routing
 import app.routing.movies as movies_routing
+import app.routing.profiles as profiles_routing
+import app.routing.reviews as reviews_routing
+import app.routing.streams as streams_routing
 import app.routing.users as users_routing
-from app import models
-from app.database import Session, engine
+from app.admission import Overloaded, RateLimited
+from app.autocomplete import autocomplete
+from app.batch import BATCH_PATH
+from app.compression import CompressionMiddleware
+from app.config import settings
+from app.database import DeclarativeBase, Session, engine
 from app.dependencies import UnauthorizedException
+from app.maintenance import Scheduler
+from app.profiling import ProfilingMiddleware
+from app.timing import TimingMiddleware
+from app.writer import WriterBusy
 
-models.DeclarativeBase.metadata.create_all(bind=engine)
-app = FastAPI()
+maintenance_scheduler = Scheduler(Session)
 
 
-@app.exception_handler(UnauthorizedException)
-def unauthorized_exception_handler() -> JSONResponse:
+def unauthorized_exception_handler(
+    _: Request, __: UnauthorizedException
+) -> JSONResponse:
     return JSONResponse(
         status_code=status.HTTP_401_UNAUTHORIZED,
         content={'detail': 'Incorrect username or password'},
@@ -27,101 +37,126 @@ def unauthorized_exception_handler() -> JSONResponse:
     )
 
 
-app.include_router(
-    users_routing.router,
-    prefix='/users',
-    tags=['users'],
-)
+def writer_busy_exception_handler(_: Request, __: WriterBusy) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={'detail': 'Too many concurrent writes, try again later'},
+        headers={'Retry-After': '1'},
+    )
 
-app.include_router(
-    movies_routing.router,
-    prefix='/movies',
-    tags=['movies'],
-)
 
+def overloaded_exception_handler(_: Request, __: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={'detail': 'Server is overloaded, try again later'},
+        headers={'Retry-After': '1'},
+    )
 
-class UserView(ModelView):
-    column_auto_select_related = True
-    column_list = ('id', 'username', 'reviews')
 
+def rate_limited_exception_handler(_: Request, exc: RateLimited) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={'detail': 'Too many requests, try again later'},
+        headers={'Retry-After': str(math.ceil(exc.retry_after))},
+    )
 
-class MovieView(ModelView):
-    column_auto_select_related = True
-    column_list = ('id', 'title', 'release_year', 'avg_rating', 'reviews')
 
-    form_widget_args = {'avg_rating': {'disabled': True}}
+def dispose_engine() -> None:
+    engine.dispose()
 
 
-class ReviewBaseView(ModelView):
-    column_list = (
-        'id',
-        'user.username',
-        'user.id',
-        'movie.title',
-        'movie.id',
-        'movie.release_year',
-        'rate',
-        'text',
-        'datetime',
+def _schema_ready() -> bool:
+    # a database that init-db has not created or upgraded yet gets its in-memory
+    # indexes built by the first request and no maintenance
+    return set(DeclarativeBase.metadata.tables) <= set(
+        inspect(engine).get_table_names()
     )
 
-    column_sortable_list = (
-        'id',
-        'user.username',
-        'user.id',
-        'movie.id',
-        'movie.title',
-        'movie.release_year',
-    )
 
-    # column_searchable_list = (models.User.id, models.User.username, models.Movie.title)
+def build_autocomplete() -> None:
+    if not _schema_ready():
+        return
+    session = Session()
+    try:
+        autocomplete.refresh(session)
+    finally:
+        session.close()
 
-    column_labels = {
-        'user.username': 'Username',
-        'user.id': 'User Id',
-        'movie.title': 'Movie Title',
-        'movie.id': 'Movie Id',
-        'movie.release_year': 'Movie Year',
-    }
 
+def start_maintenance() -> None:
+    if settings.maintenance and _schema_ready():
+        maintenance_scheduler.start()
 
-class ReviewUserView(ReviewBaseView):
-    column_searchable_list = (models.User.id, models.User.username)
 
+def stop_maintenance() -> None:
+    maintenance_scheduler.stop()
 
-class ReviewMovieView(ReviewBaseView):
-    column_searchable_list = (models.Movie.id, models.Movie.title)
 
+def create_app() -> FastAPI:
+    fastapi_app = FastAPI(
+        on_startup=[build_autocomplete, start_maintenance],
+        on_shutdown=[stop_maintenance, dispose_engine],
+    )
+    # innermost, so compression shows up in Server-Timing and request latency
+    fastapi_app.add_middleware(CompressionMiddleware)
+    fastapi_app.add_middleware(TimingMiddleware)
+    fastapi_app.add_middleware(ProfilingMiddleware)
+    fastapi_app.add_exception_handler(
+        UnauthorizedException, unauthorized_exception_handler
+    )
+    fastapi_app.add_exception_handler(WriterBusy, writer_busy_exception_handler)
+    fastapi_app.add_exception_handler(Overloaded, overloaded_exception_handler)
+    fastapi_app.add_exception_handler(RateLimited, rate_limited_exception_handler)
+
+    fastapi_app.include_router(
+        users_routing.router,
+        prefix='/users',
+        tags=['users'],
+    )
+
+    fastapi_app.include_router(
+        movies_routing.router,
+        prefix='/movies',
+        tags=['movies'],
+    )
 
-flask_app = Flask(__name__)
-flask_app.secret_key = 'pls work'
+    fastapi_app.include_router(
+        streams_routing.router,
+        prefix='/movies',
+        tags=['movies'],
+    )
 
+    fastapi_app.include_router(
+        reviews_routing.router,
+        prefix='/reviews',
+        tags=['reviews'],
+    )
 
-@flask_app.route('/')
-def redirect_to_admin() -> Any:
-    return redirect('/admin')
+    fastapi_app.include_router(
+        metrics_routing.router,
+        prefix='/metrics',
+        tags=['metrics'],
+    )
 
+    fastapi_app.include_router(
+        profiles_routing.router,
+        prefix='/profiles',
+        tags=['profiles'],
+    )
 
-def _start_flask_admin_page() -> None:
-    admin = Admin(flask_app, name='movies blog', template_mode='bootstrap3')
-    session = Session()
-    admin.add_view(MovieView(models.Movie, session, name='Movie'))
-    admin.add_view(UserView(models.User, session, name='User'))
-    admin.add_view(
-        ReviewUserView(
-            models.Review, session, name='Reviews-Users', endpoint='reviews-users'
-        )
+    fastapi_app.include_router(
+        batch_routing.router,
+        prefix=BATCH_PATH,
+        tags=['batch'],
     )
-    admin.add_view(
-        ReviewMovieView(
-            models.Review, session, name='Reviews-Movies', endpoint='reviews-movies'
-        )
+
+    fastapi_app.include_router(
+        backups_routing.router,
+        prefix='/backups',
+        tags=['backups'],
     )
-    flask_app.run(port=5000)
+
+    return fastapi_app
 
 
-if __name__ == '__main__':
-    thread = Thread(target=_start_flask_admin_page)
-    thread.daemon = True
-    thread.start()
-    uvicorn.run(app, port=8000)
+app = create_app()
@@ -0,0 +1,166 @@
+import datetime
+from typing import Any, Callable, Collection, List, Optional, Sequence, Union
+
+from sqlalchemy import insert, select, union_all
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement, func
+from sqlalchemy.sql.selectable import Subquery
+
+from app import metrics, models
+from app.config import settings
+
+AnyReview = Union[models.Review, models.ArchivedReview]
+
+COLUMNS = ('id', 'rate', 'text', 'datetime', 'user_id', 'movie_id')
+
+ARCHIVED_REVIEWS = metrics.registry.counter(
+    'archived_reviews_total',
+    'Reviews moved to the archive and back by writes',
+    ('direction',),
+)
+
+
+def _select(model: Any, *criteria: Any) -> Any:
+    return select(*(getattr(model, name) for name in COLUMNS)).where(*criteria)
+
+
+def all_reviews() -> Subquery:
+    # hot and archived reviews, for the queries that aggregate every review
+    return union_all(_select(models.Review), _select(models.ArchivedReview)).subquery(
+        'all_reviews'
+    )
+
+
+def rating_counts(movie_ids: Optional[Collection[int]] = None) -> Subquery:
+    # movie_id, no_ratings of the movies with ratings; each table is grouped on its
+    # own with the filter on movie ids, only their per movie counts are combined
+    counts = []
+    for model in (models.Review, models.ArchivedReview):
+        count = select(model.movie_id, func.count(model.id).label('no_ratings'))
+        if movie_ids is not None:
+            count = count.where(model.movie_id.in_(movie_ids))
+        counts.append(count.group_by(model.movie_id))
+    both = union_all(*counts).subquery()
+    return (
+        select(both.c.movie_id, func.sum(both.c.no_ratings).label('no_ratings'))
+        .group_by(both.c.movie_id)
+        .subquery('rating_counts')
+    )
+
+
+def _both(aggregate: Callable[[Any], Any], movie_id: Any) -> ColumnElement:
+    hot, cold = (
+        select(aggregate(model)).where(model.movie_id == movie_id).scalar_subquery()
+        for model in (models.Review, models.ArchivedReview)
+    )
+    return hot + cold
+
+
+def rating_count_of(movie_id: Any) -> ColumnElement:
+    return _both(lambda model: func.count(model.id), movie_id)
+
+
+def review_count_of(movie_id: Any) -> ColumnElement:
+    return _both(lambda model: func.count(model.text), movie_id)
+
+
+def rating_total_of(movie_id: Any) -> ColumnElement:
+    return _both(lambda model: func.total(model.rate), movie_id)
+
+
+def newest_archived_id(session: Session) -> int:
+    return int(session.query(func.max(models.ArchivedReview.id)).scalar() or 0)
+
+
+def next_review_id(session: Session) -> Optional[int]:
+    # sqlite numbers a new row after the highest id of the hot table only, which
+    # may be below ids that were archived; None leaves the choice to sqlite
+    newest_archived = newest_archived_id(session)
+    if not newest_archived:
+        return None
+    newest_hot = session.query(func.max(models.Review.id)).scalar() or 0
+    return newest_archived + 1 if newest_hot < newest_archived else None
+
+
+def merge_page(
+    session: Session,
+    reviews: List[models.Review],
+    criterion: ColumnElement,
+    after_id: int,
+    limit: int,
+) -> List[AnyReview]:
+    # pages are ordered by id, ones starting after the newest archived review never
+    # read the archive
+    if after_id >= newest_archived_id(session):
+        return list(reviews)
+    archived = (
+        session.query(models.ArchivedReview)
+        .filter(criterion)
+        .filter(models.ArchivedReview.id > after_id)
+        .order_by(models.ArchivedReview.id)
+        .limit(limit)
+        .all()
+    )
+    if not archived:
+        return list(reviews)
+    merged: List[AnyReview] = [*reviews, *archived]
+    return sorted(merged, key=lambda review: review.id)[:limit]
+
+
+def _move(session: Session, source: Any, target: Any, *criteria: Any) -> int:
+    moved = session.execute(
+        insert(target).from_select(COLUMNS, _select(source, *criteria))
+    ).rowcount
+    if moved:
+        session.query(source).filter(*criteria).delete(synchronize_session=False)
+    return int(moved)
+
+
+def archive_reviews(session: Session, now: Optional[datetime.datetime] = None) -> int:
+    # moves a batch of the oldest reviews, the maintenance task calls it every
+    # interval until none are left to move
+    if settings.archive_after_days <= 0:
+        return 0
+    cutoff = (now or datetime.datetime.now()) - datetime.timedelta(
+        days=settings.archive_after_days
+    )
+    batch = (
+        select(models.Review.id)
+        .where(models.Review.datetime < cutoff)
+        .order_by(models.Review.datetime)
+        .limit(settings.archive_batch_size)
+    )
+    moved = _move(
+        session, models.Review, models.ArchivedReview, models.Review.id.in_(batch)
+    )
+    ARCHIVED_REVIEWS.inc('archived', amount=moved)
+    return moved
+
+
+def restore_review(
+    session: Session, movie_id: int, user_id: int
+) -> Optional[models.Review]:
+    # a review about to be changed moves back to the hot table, where every write
+    # path expects it
+    criteria: Sequence[Any] = (
+        models.ArchivedReview.movie_id == movie_id,
+        models.ArchivedReview.user_id == user_id,
+    )
+    if not _move(session, models.ArchivedReview, models.Review, *criteria):
+        return None
+    ARCHIVED_REVIEWS.inc('restored')
+    return (
+        session.query(models.Review)
+        .filter_by(movie_id=movie_id, user_id=user_id)
+        .one_or_none()
+    )
+
+
+def get_archived_review(
+    session: Session, movie_id: int, user_id: int
+) -> Optional[models.ArchivedReview]:
+    return (
+        session.query(models.ArchivedReview)
+        .filter_by(movie_id=movie_id, user_id=user_id)
+        .one_or_none()
+    )
@@ -0,0 +1,156 @@
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import archive, invalidation, models, schemas
+
+MAX_SUGGESTIONS = 50
+# results of prefixes this short match a large part of the catalog and are memoized
+MEMO_PREFIX_LEN = 3
+
+NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(title: str) -> str:
+    decomposed = unicodedata.normalize('NFKD', title.casefold())
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return NON_WORD.sub(' ', stripped).strip()
+
+
+def _keys(entry: schemas.MovieSuggestion) -> List[Tuple[str, int]]:
+    # every word starts a key, so 'river' finds 'The Dark River'
+    words = normalize(entry.title).split()
+    return [(' '.join(words[i:]), entry.id) for i in range(len(words))]
+
+
+def _rank(entry: schemas.MovieSuggestion) -> Tuple[int, float, str]:
+    return -entry.no_ratings, -entry.avg_rating, entry.title
+
+
+class Autocomplete:
+    # sorted (normalized title suffix, movie id) keys searched with bisect; created,
+    # rated and deleted movies arrive through the invalidation bus
+    def __init__(self) -> None:
+        self._entries: Dict[int, schemas.MovieSuggestion] = {}
+        self._keys: List[Tuple[str, int]] = []
+        self._memo: Dict[str, List[int]] = {}
+        self._dirty: Set[int] = set()
+        self._built = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def invalidate(self, movie_id: int) -> None:
+        with self._lock:
+            self._dirty.add(movie_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._built = False
+
+    @staticmethod
+    def _load(
+        session: Session, movie_ids: Optional[Collection[int]] = None
+    ) -> List[schemas.MovieSuggestion]:
+        counts = archive.rating_counts(movie_ids)
+        query = session.query(
+            models.Movie.id,
+            models.Movie.title,
+            models.Movie.release_year,
+            models.Movie.avg_rating,
+            func.coalesce(counts.c.no_ratings, 0),
+        ).outerjoin(counts, counts.c.movie_id == models.Movie.id)
+        if movie_ids is not None:
+            query = query.filter(models.Movie.id.in_(movie_ids))
+        return [
+            schemas.MovieSuggestion(
+                id=movie_id,
+                title=title,
+                release_year=release_year,
+                avg_rating=avg_rating,
+                no_ratings=no_ratings,
+            )
+            for movie_id, title, release_year, avg_rating, no_ratings in query
+        ]
+
+    def _forget_memo(self, entry: schemas.MovieSuggestion) -> None:
+        for key, _ in _keys(entry):
+            for length in range(1, MEMO_PREFIX_LEN + 1):
+                self._memo.pop(key[:length], None)
+
+    def _remove(self, movie_id: int) -> None:
+        entry = self._entries.pop(movie_id, None)
+        if entry is None:
+            return
+        self._forget_memo(entry)
+        for key in _keys(entry):
+            del self._keys[bisect_left(self._keys, key)]
+
+    def _add(self, entry: schemas.MovieSuggestion) -> None:
+        self._entries[entry.id] = entry
+        self._forget_memo(entry)
+        for key in _keys(entry):
+            insort(self._keys, key)
+
+    def refresh(self, session: Session) -> None:
+        invalidation.poll(session)
+        if self._built and not self._dirty:
+            return
+        with self._refresh_lock:
+            with self._lock:
+                rebuild = not self._built
+                dirty, self._dirty = self._dirty, set()
+            if rebuild:
+                entries = self._load(session)
+                with self._lock:
+                    self._entries = {entry.id: entry for entry in entries}
+                    self._keys = sorted(
+                        key for entry in entries for key in _keys(entry)
+                    )
+                    self._memo = {}
+                    self._built = True
+            elif dirty:
+                entries = self._load(session, dirty)
+                with self._lock:
+                    for movie_id in dirty:
+                        self._remove(movie_id)
+                    for entry in entries:
+                        self._add(entry)
+
+    def _matches(self, prefix: str) -> List[int]:
+        movie_ids = set()
+        for i in range(bisect_left(self._keys, (prefix,)), len(self._keys)):
+            key, movie_id = self._keys[i]
+            if not key.startswith(prefix):
+                break
+            movie_ids.add(movie_id)
+        return heapq.nsmallest(
+            MAX_SUGGESTIONS,
+            movie_ids,
+            key=lambda movie_id: _rank(self._entries[movie_id]),
+        )
+
+    def suggest(
+        self, session: Session, query: str, limit: int = 10
+    ) -> List[schemas.MovieSuggestion]:
+        self.refresh(session)
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            if len(prefix) <= MEMO_PREFIX_LEN:
+                movie_ids = self._memo.get(prefix)
+                if movie_ids is None:
+                    movie_ids = self._memo[prefix] = self._matches(prefix)
+            else:
+                movie_ids = self._matches(prefix)
+            return [self._entries[movie_id] for movie_id in movie_ids[:limit]]
+
+
+autocomplete = Autocomplete()
+invalidation.subscribe('movie', autocomplete)
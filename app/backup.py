@@ -0,0 +1,219 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from time import perf_counter, time
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.engine import Engine
+
+from app import metrics
+from app.config import settings
+
+logger = logging.getLogger('app.backup')
+
+BACKUP_RUNS = metrics.registry.counter(
+    'backup_runs_total', 'Backups and restores by result', ('operation', 'result')
+)
+BACKUP_PAGES = metrics.registry.counter(
+    'backup_pages_total',
+    'Database pages copied by backups and restores',
+    ('operation',),
+)
+BACKUP_LAST_SUCCESS = metrics.registry.gauge(
+    'backup_last_success_timestamp_seconds',
+    'Unix time a backup or restore last finished',
+    ('operation',),
+)
+
+
+class BackupError(Exception):
+    pass
+
+
+class BackupRunning(BackupError):
+    pass
+
+
+class Progress:
+    def __init__(self, operation: str, path: str) -> None:
+        self.operation = operation
+        self.path = path
+        self.state = 'running'
+        self.error: Optional[str] = None
+        self.page_size = 0
+        self.pages_total = 0
+        self.pages_remaining = 0
+        self.started_at = time()
+        self._start = perf_counter()
+        self.seconds = 0.0
+
+    def step(self, remaining: int, total: int) -> None:
+        self.pages_remaining = remaining
+        self.pages_total = total
+        self.seconds = perf_counter() - self._start
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.seconds = perf_counter() - self._start
+        if error is None:
+            self.state = 'done'
+            BACKUP_PAGES.inc(self.operation, amount=self.pages_total)
+            BACKUP_LAST_SUCCESS.set(self.operation, value=time())
+        else:
+            self.state, self.error = 'failed', str(error)
+        BACKUP_RUNS.inc(self.operation, self.state)
+
+    @property
+    def pages_copied(self) -> int:
+        return self.pages_total - self.pages_remaining
+
+    def as_dict(self) -> Dict[str, Any]:
+        seconds = self.seconds or float('inf')
+        return {
+            'operation': self.operation,
+            'path': self.path,
+            'state': self.state,
+            'error': self.error,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'seconds': round(self.seconds, 3),
+            'pages_total': self.pages_total,
+            'pages_copied': self.pages_copied,
+            'bytes_copied': self.pages_copied * self.page_size,
+            'pages_per_second': round(self.pages_copied / seconds, 1),
+            'megabytes_per_second': round(
+                self.pages_copied * self.page_size / seconds / 1e6, 2
+            ),
+        }
+
+
+ProgressCallback = Callable[[Progress], None]
+
+
+def _copy(
+    source: sqlite3.Connection,
+    target: sqlite3.Connection,
+    progress: Progress,
+    sleep: float,
+    report: Optional[ProgressCallback],
+) -> None:
+    progress.page_size = source.execute('PRAGMA page_size').fetchone()[0]
+
+    def step(_: int, remaining: int, total: int) -> None:
+        progress.step(remaining, total)
+        if report is not None:
+            report(progress)
+
+    source.backup(target, pages=settings.backup_step_pages, progress=step, sleep=sleep)
+
+
+def _sqlite_path(engine: Engine) -> str:
+    if engine.dialect.name != 'sqlite' or not engine.url.database:
+        raise BackupError('online backup needs a sqlite database file')
+    return str(engine.url.database)
+
+
+def default_path(engine: Engine) -> str:
+    stem = os.path.splitext(os.path.basename(_sqlite_path(engine)))[0]
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    return os.path.join(settings.backup_dir, f'{stem}-{stamp}.db')
+
+
+def backup(
+    engine: Engine,
+    path: str,
+    report: Optional[ProgressCallback] = None,
+    progress: Optional[Progress] = None,
+) -> Progress:
+    # copies settings.backup_step_pages pages at a time and sleeps in between;
+    # under WAL the copy reads one snapshot, so writers go on and commits made
+    # meanwhile do not restart it, with the rollback journal a writer only waits
+    # for the current step and its commit restarts the copy
+    progress = progress or Progress('backup', path)
+    _sqlite_path(engine)
+    partial = f'{path}.partial'
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    raw = engine.raw_connection()
+    try:
+        source = raw.connection
+        snapshot = source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        if snapshot:
+            source.execute('BEGIN')
+            source.execute('SELECT 1 FROM sqlite_master').fetchall()
+        target = sqlite3.connect(partial)
+        try:
+            _copy(source, target, progress, settings.backup_step_sleep, report)
+        finally:
+            target.close()
+            if snapshot:
+                source.execute('ROLLBACK')
+        # readers of the backup directory never see a half written file
+        os.replace(partial, path)
+    except BaseException as exc:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        progress.finish(exc)
+        raise
+    finally:
+        raw.close()
+    progress.finish()
+    return progress
+
+
+def restore(
+    path: str, engine: Engine, report: Optional[ProgressCallback] = None
+) -> Progress:
+    # copies the pages of a backup over the database of the engine, much faster
+    # than reinserting its rows; meant for new replicas and stopped services, the
+    # in-memory caches and indexes of running workers do not see it
+    progress = Progress('restore', path)
+    _sqlite_path(engine)
+    if not os.path.isfile(path):
+        raise BackupError(f'{path} does not exist')
+    source = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        try:
+            check = source.execute('PRAGMA quick_check').fetchone()[0]
+        except sqlite3.DatabaseError as exc:
+            check = str(exc)
+        if check != 'ok':
+            raise BackupError(f'{path} is damaged: {check}')
+        raw = engine.raw_connection()
+        try:
+            _copy(source, raw.connection, progress, 0, report)
+        finally:
+            raw.close()
+    except BaseException as exc:
+        progress.finish(exc)
+        raise
+    finally:
+        source.close()
+    progress.finish()
+    return progress
+
+
+_lock = threading.Lock()
+_latest: Optional[Progress] = None
+
+
+def latest() -> Optional[Progress]:
+    return _latest
+
+
+def start_backup(engine: Engine) -> Progress:
+    # runs on a thread so the request returns at once, one backup at a time
+    global _latest  # pylint: disable=global-statement
+    path = default_path(engine)
+    with _lock:
+        if _latest is not None and _latest.state == 'running':
+            raise BackupRunning
+        progress = _latest = Progress('backup', path)
+
+    def run() -> None:
+        try:
+            backup(engine, path, progress=progress)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('backup to %s failed', path)
+
+    threading.Thread(target=run, name='backup', daemon=True).start()
+    return progress
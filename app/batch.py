@@ -0,0 +1,110 @@
+import asyncio
+import json
+from contextvars import ContextVar
+from typing import Awaitable, List, Optional
+
+from starlette.requests import Request
+from starlette.types import Message
+
+from app import schemas
+
+BATCH_PATH = '/batch'
+
+_user: ContextVar[Optional[schemas.User]] = ContextVar('batch_user', default=None)
+
+
+def authenticated_user() -> Optional[schemas.User]:
+    # set while the sub-requests of a batch run, they reuse its authentication
+    return _user.get()
+
+
+def _body(content_type: str, body: bytes) -> object:
+    if not body:
+        return None
+    if content_type.startswith('application/json'):
+        return json.loads(body)
+    return body.decode('utf-8', 'replace')
+
+
+async def _call(parent: Request, sub: schemas.SubRequest) -> schemas.SubResponse:
+    path, _, query = sub.path.partition('?')
+    if path.rstrip('/') == BATCH_PATH:
+        return schemas.SubResponse(
+            id=sub.id, status=400, body={'detail': 'Batches cannot be nested'}
+        )
+
+    body = b'' if sub.body is None else json.dumps(sub.body).encode()
+    headers = [
+        (name, value)
+        for name, value in parent.scope['headers']
+        if name in (b'host', b'authorization')
+    ]
+    if body:
+        headers.append((b'content-type', b'application/json'))
+    scope = dict(
+        parent.scope,
+        method=sub.method.value,
+        path=path,
+        raw_path=path.encode(),
+        query_string=query.encode(),
+        headers=headers,
+    )
+    for key in ('endpoint', 'path_params', 'route', 'router', 'state'):
+        scope.pop(key, None)
+
+    received = False
+    done = asyncio.Event()
+    status = 500
+    content_type = ''
+    chunks: List[bytes] = []
+
+    async def receive() -> Message:
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message: Message) -> None:
+        nonlocal status, content_type
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            for name, value in message.get('headers', []):
+                if name == b'content-type':
+                    content_type = value.decode('latin-1')
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    try:
+        await parent.app(scope, receive, send)
+    except Exception:  # pylint: disable=broad-except
+        # the server error middleware has already sent the 500
+        pass
+    finally:
+        done.set()
+    return schemas.SubResponse(
+        id=sub.id, status=status, body=_body(content_type, b''.join(chunks))
+    )
+
+
+async def run(
+    parent: Request, user: schemas.User, requests: List[schemas.SubRequest]
+) -> List[schemas.SubResponse]:
+    # consecutive reads run concurrently, each on its own pooled session; a write
+    # waits for the reads before it and the requests after it wait for the write
+    token = _user.set(user)
+    try:
+        responses: List[schemas.SubResponse] = []
+        reads: List[Awaitable[schemas.SubResponse]] = []
+        for sub in requests:
+            if sub.method is schemas.BatchMethod.get:
+                reads.append(_call(parent, sub))
+                continue
+            responses.extend(await asyncio.gather(*reads))
+            reads = []
+            responses.append(await _call(parent, sub))
+        responses.extend(await asyncio.gather(*reads))
+        return responses
+    finally:
+        _user.reset(token)
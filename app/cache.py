@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+from app import metrics
+
+V = TypeVar('V')
+
+
+class LRUCache(Generic[V]):
+    # values must be immutable snapshots, they are shared by all threads and outlive
+    # the session that loaded them
+    def __init__(self, name: str, maxsize: int, ttl: float) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, Tuple[float, V]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > monotonic():
+                    self._entries.move_to_end(key)
+                    metrics.CACHE_REQUESTS.inc(self.name, 'hit')
+                    return value
+                del self._entries[key]
+        metrics.CACHE_REQUESTS.inc(self.name, 'miss')
+        return None
+
+    def set(self, key: Hashable, value: V, generation: Optional[int] = None) -> None:
+        with self._lock:
+            # a value loaded before an invalidation may already be stale
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_load(
+        self, key: Hashable, load: Callable[[], Optional[V]]
+    ) -> Optional[V]:
+        if not self.enabled:
+            return load()
+        value = self.get(key)
+        if value is not None:
+            return value
+        generation = self._generation
+        value = load()
+        if value is not None:
+            self.set(key, value, generation)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
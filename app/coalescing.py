@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+from typing import Any, Callable, Coroutine, Dict, Hashable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app import metrics, negotiation, profiling, timing
+from app.config import settings
+from app.timing import TimedRoute
+
+COALESCED_REQUESTS = metrics.registry.counter(
+    'coalesced_requests_total',
+    'GET requests answered with the response of an identical in-flight request',
+    ('route',),
+)
+
+_flights: Dict[Hashable, 'asyncio.Future[Optional[Response]]'] = {}
+
+
+def request_key(route: str, request: Request) -> Hashable:
+    # identical credentials share one authentication, other users never share
+    authorization = request.headers.get('authorization', '')
+    return (
+        route,
+        tuple(sorted(request.path_params.items())),
+        tuple(sorted(request.query_params.multi_items())),
+        negotiation.wants_msgpack(request),
+        hashlib.sha256(authorization.encode()).digest(),
+    )
+
+
+def _copy(response: Response) -> Response:
+    copy = Response(response.body, status_code=response.status_code)
+    copy.raw_headers = list(response.raw_headers)
+    return copy
+
+
+class CoalescingRoute(TimedRoute):
+    # concurrent identical GETs wait for the first one and get a copy of its
+    # serialized response instead of running dependencies and queries again
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        if self.methods != {'GET'}:
+            return handler
+        route = self.path_format
+
+        async def coalescing_handler(request: Request) -> Response:
+            if not settings.coalesce_reads or profiling.capturing():
+                return await handler(request)
+
+            loop = asyncio.get_running_loop()
+            key = (loop, request_key(route, request))
+            flight = _flights.get(key)
+            if flight is not None:
+                timings = timing.current()
+                if timings is not None:
+                    timings.route = route
+                shared = await asyncio.shield(flight)
+                if shared is not None:
+                    COALESCED_REQUESTS.inc(route)
+                    return _copy(shared)
+                return await handler(request)
+
+            flight = _flights[key] = loop.create_future()
+            shareable: Optional[Response] = None
+            try:
+                response = await handler(request)
+            except Exception as exc:
+                flight.set_exception(exc)
+                # retrieved here as nobody may be waiting for it
+                flight.exception()
+                raise
+            else:
+                if hasattr(response, 'body'):
+                    shareable = response
+                return response
+            finally:
+                del _flights[key]
+                # a streamed response or a cancelled request leaves followers on
+                # their own
+                if not flight.done():
+                    flight.set_result(shareable)
+
+        return coalescing_handler
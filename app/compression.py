@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+from typing import Callable, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import cache, metrics, negotiation, timing
+from app.config import settings
+
+# brotli and zstandard are optional, without them responses are only gzipped
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('application/json', negotiation.MSGPACK, 'text/')
+
+COMPRESSED_BYTES = metrics.registry.counter(
+    'compression_bytes_total',
+    'Response body bytes before and after compression',
+    ('encoding', 'stage'),
+)
+
+# popular pages are served with the same body again and again, keyed on a digest
+# of the body they are compressed once
+compressed_bodies: cache.LRUCache[bytes] = cache.LRUCache(
+    'compressed_responses',
+    maxsize=settings.compression_cache_size,
+    ttl=settings.compression_cache_ttl,
+)
+
+
+def _gzip(body: bytes, level: int) -> bytes:
+    # a fixed mtime keeps the output of identical bodies identical
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def _brotli(body: bytes, level: int) -> bytes:  # pragma: no cover
+    return bytes(brotli.compress(body, quality=level))
+
+
+def _zstd(body: bytes, level: int) -> bytes:  # pragma: no cover
+    return bytes(zstandard.ZstdCompressor(level=level).compress(body))
+
+
+def compressors() -> Dict[str, Callable[[bytes, int], bytes]]:
+    available: Dict[str, Callable[[bytes, int], bytes]] = {'gzip': _gzip}
+    if brotli is not None:
+        available['br'] = _brotli
+    if zstandard is not None:
+        available['zstd'] = _zstd
+    return available
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    # the configured encoding the client weighs highest, ties go to the one
+    # listed first in the settings
+    accepted = negotiation.qualities(accept_encoding)
+    available = compressors()
+    chosen, best = None, 0.0
+    for encoding, level in settings.compression_levels.items():
+        if level <= 0 or encoding not in available:
+            continue
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best:
+            chosen, best = encoding, quality
+    return chosen
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    level = settings.compression_levels[encoding]
+
+    def load() -> bytes:
+        with timing.phase('compress'):
+            return compressors()[encoding](body, level)
+
+    compressed = None
+    if cached:
+        key = (encoding, level, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = compressed_bodies.get_or_load(key, load)
+    if compressed is None:
+        compressed = load()
+    COMPRESSED_BYTES.inc(encoding, 'in', amount=len(body))
+    COMPRESSED_BYTES.inc(encoding, 'out', amount=len(compressed))
+    return compressed
+
+
+def _compressible(headers: Headers) -> bool:
+    content_type = headers.get('content-type', '')
+    return 'content-encoding' not in headers and content_type.startswith(
+        COMPRESSIBLE_TYPES
+    )
+
+
+class CompressionMiddleware:
+    # complete bodies over the size threshold are compressed, streamed ones pass
+    # through as they are
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not settings.compression:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        # GET responses repeat, others are rarely worth keeping
+        cached = scope['method'] == 'GET'
+        start: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            response_start, start = start, None
+            body = message.get('body', b'')
+            headers = MutableHeaders(scope=response_start)
+            if (
+                not message.get('more_body', False)
+                and len(body) >= settings.compression_min_size
+                and _compressible(headers)
+            ):
+                headers.add_vary_header('Accept-Encoding')
+                if encoding is not None:
+                    body = compress(body, encoding, cached)
+                    headers['Content-Encoding'] = encoding
+                    headers['Content-Length'] = str(len(body))
+                    message = dict(message, body=body)
+            await send(response_start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
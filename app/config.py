@@ -0,0 +1,76 @@
+from typing import Dict, List
+
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    database_url: str = 'sqlite:///./sql_app.db'
+    sqlite_wal: bool = True
+    sqlite_busy_timeout_ms: int = 5000
+    writer_lock_path: str = 'sql_app.db.writer.lock'
+    writer_timeout: float = 10.0
+    movie_cache_size: int = 1024
+    movie_cache_ttl: float = 60.0
+    leaderboard_min_votes: int = 10
+    leaderboard_rebuild_interval: float = 3600.0
+    similar_movies_k: int = 20
+    similar_movies_min_common: int = 2
+    similar_movies_batch_size: int = 500
+    invalidation_poll_interval: float = 0.1
+    invalidation_retention: float = 300.0
+    admission_limits: Dict[str, int] = {'auth': 8, 'search': 4, 'write': 16, 'read': 64}
+    admission_queues: Dict[str, int] = {
+        'auth': 64,
+        'search': 16,
+        'write': 64,
+        'read': 256,
+    }
+    admission_timeout: float = 5.0
+    rate_limit_per_second: float = 0.0
+    rate_limit_burst: int = 20
+    coalesce_reads: bool = True
+    batch_max_requests: int = 20
+    review_stream_buffer: int = 64
+    review_stream_history: int = 1024
+    review_stream_keepalive: float = 15.0
+    compression: bool = True
+    compression_min_size: int = 1024
+    compression_levels: Dict[str, int] = {'zstd': 3, 'br': 4, 'gzip': 6}
+    compression_cache_size: int = 256
+    compression_cache_ttl: float = 60.0
+    maintenance: bool = True
+    maintenance_tick: float = 60.0
+    maintenance_intervals: Dict[str, float] = {
+        'analyze': 3600.0,
+        'checkpoint': 300.0,
+        'incremental_vacuum': 3600.0,
+        'reconcile_ratings': 900.0,
+        'archive_reviews': 3600.0,
+    }
+    maintenance_analysis_limit: int = 1000
+    maintenance_vacuum_pages: int = 1000
+    maintenance_reconcile_batch_size: int = 500
+    archive_after_days: float = 0.0
+    archive_batch_size: int = 10000
+    backup_dir: str = 'backups'
+    backup_step_pages: int = 1024
+    backup_step_sleep: float = 0.005
+    admin_panel: bool = True
+    admin_panel_port: int = 5000
+    api_port: int = 8000
+    workers: int = 1
+    server_timing: bool = False
+    metrics: bool = True
+    slow_query_ms: float = 250.0
+    slow_query_log_path: str = 'slow_queries.log'
+    slow_query_log_max_bytes: int = 10 * 1024 * 1024
+    slow_query_log_backups: int = 5
+    admin_usernames: List[str] = []
+    profiling: bool = False
+    profile_dir: str = 'profiles'
+
+    class Config:
+        env_prefix = 'movies_'
+
+
+settings = Settings()
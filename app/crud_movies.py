@@ -1,16 +1,34 @@
 import datetime
 from typing import List, Optional
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
 
-from app import models, schemas
+from app import (
+    archive,
+    cache,
+    crud_users,
+    invalidation,
+    models,
+    ratings,
+    review_stream,
+    rollups,
+    schemas,
+    search,
+    similarity,
+)
+from app.config import settings
 
 # from app.utils import make_query_string_for_prev_and_next_keyset_paging
 
 
 # pylint: disable=too-many-arguments
 
+movie_cache: cache.LRUCache[schemas.MovieSnapshot] = cache.LRUCache(
+    'movies', maxsize=settings.movie_cache_size, ttl=settings.movie_cache_ttl
+)
+invalidation.subscribe('movie', movie_cache)
+
 
 def get_movie_by_title(session: Session, title: str) -> Optional[models.Movie]:
     return session.query(models.Movie).filter(models.Movie.title == title).one_or_none()
@@ -20,6 +38,19 @@ def get_movie_by_id(session: Session, movie_id: int) -> Optional[models.Movie]:
     return session.query(models.Movie).filter(models.Movie.id == movie_id).one_or_none()
 
 
+def get_movie_snapshot(
+    session: Session, movie_id: int
+) -> Optional[schemas.MovieSnapshot]:
+    def load() -> Optional[schemas.MovieSnapshot]:
+        db_movie = get_movie_by_id(session=session, movie_id=movie_id)
+        return schemas.MovieSnapshot.from_orm(db_movie) if db_movie else None
+
+    if invalidation.is_pending(session, 'movie', movie_id):
+        return load()
+    invalidation.poll(session)
+    return movie_cache.get_or_load(movie_id, load)
+
+
 def create_review(
     session: Session,
     current_user: schemas.User,
@@ -28,35 +59,40 @@ def create_review(
 ) -> models.Review:
     db_review = models.Review(
         **review.dict(),
+        id=archive.next_review_id(session),
         movie_id=db_movie.id,
         user_id=current_user.id,
         datetime=datetime.datetime.now(),
     )
+    crud_users.update_user_stats(
+        session,
+        current_user.id,
+        no_ratings=1,
+        no_reviews=int(db_review.text is not None),
+        rating_sum=db_review.rate,
+        active_at=db_review.datetime,
+    )
     session.add(db_review)
     session.flush()
     session.refresh(db_review)
+    rollups.record(session, db_movie.id, db_review.rate, db_review.datetime, 1)
+    search.index_review(session, db_review.id, db_review.text)
 
-    update_avg_rating_of_movie(session=session, db_movie=db_movie)
+    ratings.update_avg_rating_of_movie(session=session, db_movie=db_movie)
+    similarity.mark_stale(session, [current_user.id])
+    review_stream.publish(
+        session, 'created', db_movie.id, schemas.Review.from_orm(db_review)
+    )
 
     return db_review
 
 
-def update_avg_rating_of_movie(session: Session, db_movie: models.Movie) -> float:
-    db_movie.avg_rating = calc_avg_rating(session=session, movie_id=db_movie.id)
-
-    session.add(db_movie)
-    session.flush()
-    session.refresh(db_movie)
-
-    return db_movie.avg_rating
-
-
 def get_reviews(
     session: Session,
     movie_id: int,
     after_id: int = 0,
     limit: int = 20,
-) -> List[models.Review]:
+) -> List[archive.AnyReview]:
     reviews = (
         session.query(models.Review)
         .filter(models.Review.movie_id == movie_id)
@@ -66,7 +102,9 @@ def get_reviews(
         .all()
     )
 
-    return reviews
+    return archive.merge_page(
+        session, reviews, models.ArchivedReview.movie_id == movie_id, after_id, limit
+    )
 
 
 def create_movie(session: Session, movie: schemas.MovieCreate) -> models.Movie:
@@ -74,33 +112,11 @@ def create_movie(session: Session, movie: schemas.MovieCreate) -> models.Movie:
     session.add(db_movie)
     session.flush()
     session.refresh(db_movie)
+    invalidation.publish(session, 'movie', db_movie.id)
 
     return db_movie
 
 
-def calc_avg_rating(session: Session, movie_id: int) -> float:
-    avg_rating = (
-        session.query(func.avg(models.Review.rate))
-        .filter(models.Review.movie_id == movie_id)
-        .scalar()
-    )
-
-    return 0.0 if not avg_rating else avg_rating
-
-
-def calc_no_ratings(session: Session, movie_id: int) -> int:
-    return session.query(models.Review).filter_by(movie_id=movie_id).count()
-
-
-def calc_no_reviews(session: Session, movie_id: int) -> int:
-    return (
-        session.query(models.Review.text)
-        .filter(models.Review.movie_id == movie_id)
-        .filter(models.Review.text.isnot(None))
-        .count()
-    )
-
-
 def get_movies(
     session: Session,
     filter_str: Optional[str] = None,
@@ -130,44 +146,138 @@ def get_movies(
     return movies
 
 
+def get_similar_movies(
+    session: Session, movie_id: int, limit: int = 20
+) -> List[schemas.SimilarMovie]:
+    rows = (
+        session.query(models.Movie, models.SimilarMovie.score)
+        .join(models.SimilarMovie, models.SimilarMovie.similar_id == models.Movie.id)
+        .filter(models.SimilarMovie.movie_id == movie_id)
+        .order_by(models.SimilarMovie.score.desc(), models.Movie.id)
+        .limit(limit)
+        .all()
+    )
+    return [
+        schemas.SimilarMovie(**schemas.Movie.from_orm(db_movie).dict(), score=score)
+        for db_movie, score in rows
+    ]
+
+
 def get_review_by_movie_and_user_ids(
     movie_id: int, user_id: int, session: Session
 ) -> Optional[models.Review]:
-    return (
+    # for writes: an archived review is moved back to the hot table
+    db_review = (
         session.query(models.Review)
         .filter_by(movie_id=movie_id, user_id=user_id)
         .one_or_none()
     )
+    if db_review is None:
+        db_review = archive.restore_review(session, movie_id, user_id)
+    return db_review
 
 
 def update_review(
     db_review: models.Review, new_review: schemas.ReviewCreate, session: Session
 ) -> schemas.Review:
+    rollups.record(session, db_review.movie_id, db_review.rate, db_review.datetime, -1)
+    crud_users.update_user_stats(
+        session,
+        db_review.user_id,
+        no_reviews=(new_review.text is not None) - (db_review.text is not None),
+        rating_sum=new_review.rate - db_review.rate,
+        active_at=datetime.datetime.now(),
+    )
+    search.unindex_review(session, db_review.id)
     db_review.text = new_review.text
     db_review.rate = new_review.rate
     db_review.datetime = datetime.datetime.now()
+    rollups.record(session, db_review.movie_id, db_review.rate, db_review.datetime, 1)
+    search.index_review(session, db_review.id, db_review.text)
 
     session.add(db_review)
     session.flush()
     session.refresh(db_review)
 
-    db_movie = session.query(models.Movie).filter_by(id=db_review.movie_id).one()
-    update_avg_rating_of_movie(session=session, db_movie=db_movie)
+    ratings.update_avg_rating_of_movie(session=session, db_movie=db_review.movie)
+    similarity.mark_stale(session, [db_review.user_id])
 
-    return schemas.Review.from_orm(db_review)
+    review = schemas.Review.from_orm(db_review)
+    review_stream.publish(session, 'updated', db_review.movie_id, review)
+    return review
 
 
 def delete_movie(movie_id: int, session: Session) -> int:
+    # removing the movie's reviews is not activity of their authors
+    all_reviews = archive.all_reviews()
+    reviews = (
+        session.query(
+            all_reviews.c.id,
+            all_reviews.c.user_id,
+            all_reviews.c.rate,
+            all_reviews.c.text,
+        )
+        .filter(all_reviews.c.movie_id == movie_id)
+        .all()
+    )
+    similarity.mark_stale(
+        session,
+        select(all_reviews.c.user_id).where(all_reviews.c.movie_id == movie_id),
+    )
+    for review_id, user_id, rate, text in reviews:
+        search.unindex_review(session, review_id)
+        review_stream.publish(
+            session,
+            'deleted',
+            movie_id,
+            schemas.DeletedReview(id=review_id, user_id=user_id, movie_id=movie_id),
+        )
+        crud_users.update_user_stats(
+            session,
+            user_id,
+            no_ratings=-1,
+            no_reviews=-(text is not None),
+            rating_sum=-rate,
+        )
     session.query(models.Movie).filter_by(id=movie_id).delete()
     session.query(models.Review).filter_by(movie_id=movie_id).delete()
+    session.query(models.ArchivedReview).filter_by(movie_id=movie_id).delete()
+    session.query(models.RatingRollup).filter_by(movie_id=movie_id).delete()
+    session.query(models.SimilarMovie).filter(
+        (models.SimilarMovie.movie_id == movie_id)
+        | (models.SimilarMovie.similar_id == movie_id)
+    ).delete(synchronize_session=False)
     session.flush()
+    invalidation.publish(session, 'movie', movie_id)
     return movie_id
 
 
 def delete_review(movie_id: int, user_id: int, session: Session) -> None:
+    db_review = get_review_by_movie_and_user_ids(
+        movie_id=movie_id, user_id=user_id, session=session
+    )
+    if db_review:
+        rollups.record(session, movie_id, db_review.rate, db_review.datetime, -1)
+        search.unindex_review(session, db_review.id)
+        crud_users.update_user_stats(
+            session,
+            user_id,
+            no_ratings=-1,
+            no_reviews=-(db_review.text is not None),
+            rating_sum=-db_review.rate,
+            active_at=datetime.datetime.now(),
+        )
+        review_stream.publish(
+            session,
+            'deleted',
+            movie_id,
+            schemas.DeletedReview(id=db_review.id, user_id=user_id, movie_id=movie_id),
+        )
+    # queued while the review is there, its movie loses a rater
+    similarity.mark_stale(session, [user_id])
     session.query(models.Review).filter_by(user_id=user_id, movie_id=movie_id).delete()
     session.flush()
 
     db_movie = get_movie_by_id(session=session, movie_id=movie_id)
     if db_movie:
-        update_avg_rating_of_movie(session=session, db_movie=db_movie)
+        ratings.update_avg_rating_of_movie(session=session, db_movie=db_movie)
@@ -1,9 +1,10 @@
+import datetime
 from typing import List, Optional
 
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
 
-from app import models, schemas
-from app.utils import make_password_hash
+from app import archive, models, schemas
 
 
 def get_user_by_id(session: Session, user_id: int) -> Optional[models.User]:
@@ -33,7 +34,7 @@ def get_all_users(
 
 def get_user_reviews(
     user_id: int, session: Session, after_id: int = 0, limit: int = 20
-) -> List[models.Review]:
+) -> List[archive.AnyReview]:
     reviews = (
         session.query(models.Review)
         .filter_by(user_id=user_id)
@@ -43,22 +44,148 @@ def get_user_reviews(
         .all()
     )
 
-    return reviews
+    return archive.merge_page(
+        session, reviews, models.ArchivedReview.user_id == user_id, after_id, limit
+    )
 
 
 def get_user_review_on_movie(
     user_id: int, movie_id: int, session: Session
-) -> Optional[models.Review]:
-    return (
+) -> Optional[archive.AnyReview]:
+    db_review = (
         session.query(models.Review)
         .filter_by(user_id=user_id, movie_id=movie_id)
         .one_or_none()
     )
+    if db_review is None:
+        return archive.get_archived_review(session, movie_id, user_id)
+    return db_review
 
 
-def create_user(session: Session, user: schemas.UserCreate) -> models.User:
-    hashed_password = make_password_hash(user.password)
+def create_user(
+    session: Session, user: schemas.UserCreate, hashed_password: str
+) -> models.User:
     db_user = models.User(username=user.username, hashed_password=hashed_password)
     session.add(db_user)
     session.flush()
     return db_user
+
+
+def update_user_stats(
+    session: Session,
+    user_id: int,
+    no_ratings: int = 0,
+    no_reviews: int = 0,
+    rating_sum: int = 0,
+    active_at: Optional[datetime.datetime] = None,
+) -> None:
+    # a single relative update, review writes hold the writer lock so the insert of a
+    # missing row cannot race; callers apply the deltas before writing the review, so
+    # a missing row is counted from the reviews the user has so far
+    values = {
+        models.UserStats.no_ratings: models.UserStats.no_ratings + no_ratings,
+        models.UserStats.no_reviews: models.UserStats.no_reviews + no_reviews,
+        models.UserStats.rating_sum: models.UserStats.rating_sum + rating_sum,
+    }
+    if active_at:
+        values[models.UserStats.last_active_at] = active_at
+    updated = (
+        session.query(models.UserStats)
+        .filter_by(user_id=user_id)
+        .update(values, synchronize_session=False)
+    )
+    if not updated:
+        reviews = archive.all_reviews()
+        counted_ratings, counted_reviews, counted_sum, last_active_at = (
+            session.query(
+                func.count(reviews.c.id),
+                func.count(reviews.c.text),
+                func.total(reviews.c.rate),
+                func.max(reviews.c.datetime),
+            )
+            .filter(reviews.c.user_id == user_id)
+            .one()
+        )
+        session.add(
+            models.UserStats(
+                user_id=user_id,
+                no_ratings=counted_ratings + no_ratings,
+                no_reviews=counted_reviews + no_reviews,
+                rating_sum=int(counted_sum) + rating_sum,
+                last_active_at=active_at or last_active_at,
+            )
+        )
+        session.flush()
+
+
+def _user_stats(db_stats: Optional[models.UserStats]) -> schemas.UserStats:
+    if not db_stats or not db_stats.no_ratings:
+        return schemas.UserStats(
+            no_ratings=0,
+            no_reviews=0,
+            avg_given_rating=0.0,
+            last_active_at=db_stats.last_active_at if db_stats else None,
+        )
+    return schemas.UserStats(
+        no_ratings=db_stats.no_ratings,
+        no_reviews=db_stats.no_reviews,
+        avg_given_rating=db_stats.rating_sum / db_stats.no_ratings,
+        last_active_at=db_stats.last_active_at,
+    )
+
+
+def get_user_stats(session: Session, user_id: int) -> Optional[schemas.UserStats]:
+    row = (
+        session.query(models.User.id, models.UserStats)
+        .outerjoin(models.UserStats, models.UserStats.user_id == models.User.id)
+        .filter(models.User.id == user_id)
+        .one_or_none()
+    )
+    return _user_stats(row[1]) if row else None
+
+
+def get_all_users_with_stats(
+    session: Session, after_id: int = 0, limit: int = 20
+) -> List[schemas.UserWithStats]:
+    rows = (
+        session.query(models.User, models.UserStats)
+        .outerjoin(models.UserStats, models.UserStats.user_id == models.User.id)
+        .filter(models.User.id > after_id)
+        .order_by(models.User.id)
+        .limit(limit)
+        .all()
+    )
+    return [
+        schemas.UserWithStats(
+            id=db_user.id, username=db_user.username, stats=_user_stats(db_stats)
+        )
+        for db_user, db_stats in rows
+    ]
+
+
+def backfill_user_stats(session: Session) -> int:
+    session.query(models.UserStats).delete(synchronize_session=False)
+    reviews = archive.all_reviews()
+    rows = session.query(
+        reviews.c.user_id,
+        func.count(reviews.c.id),
+        func.count(reviews.c.text),
+        func.sum(reviews.c.rate),
+        func.max(reviews.c.datetime),
+    ).group_by(reviews.c.user_id)
+    session.bulk_insert_mappings(
+        models.UserStats,
+        [
+            {
+                'user_id': user_id,
+                'no_ratings': no_ratings,
+                'no_reviews': no_reviews,
+                'rating_sum': rating_sum,
+                'last_active_at': last_active_at,
+            }
+            for user_id, no_ratings, no_reviews, rating_sum, last_active_at in rows
+            if user_id is not None
+        ],
+    )
+    count: int = session.query(models.UserStats).count()
+    return count
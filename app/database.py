@@ -1,12 +1,41 @@
-from sqlalchemy import create_engine
+from typing import Any
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-SQLALCHEMY_DATABASE_URL = 'sqlite:///./sql_app.db'
+from app.config import settings
+
+SQLALCHEMY_DATABASE_URL = settings.database_url
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={'check_same_thread': False}
 )
 
-DeclarativeBase = declarative_base()
+
+@event.listens_for(engine, 'connect')
+def _configure_sqlite(dbapi_connection: Any, connection_record: Any) -> None:
+    if engine.dialect.name != 'sqlite':
+        return
+    cursor = dbapi_connection.cursor()
+    # takes effect in new database files only, lets maintenance return free pages
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    # WAL lets reads in every worker proceed while the single writer commits
+    if settings.sqlite_wal:
+        cursor.execute('PRAGMA journal_mode = WAL')
+        cursor.execute('PRAGMA synchronous = NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout = {settings.sqlite_busy_timeout_ms}')
+    cursor.close()
+
+
+DeclarativeBase: Any = declarative_base()
 
 Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def init_db(bind: Engine = engine) -> None:
+    # models register their tables on DeclarativeBase when imported
+    # pylint: disable=import-outside-toplevel,unused-import
+    from app import models  # noqa: F401
+
+    DeclarativeBase.metadata.create_all(bind=bind)
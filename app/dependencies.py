@@ -1,10 +1,12 @@
 import secrets
 from typing import Generator
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from starlette.concurrency import run_in_threadpool
 
-from app import schemas
+from app import admission, batch, profiling, schemas, timing, writer
+from app.config import settings
 from app.crud_users import get_user_by_username
 from app.database import Session
 from app.utils import make_password_hash
@@ -27,15 +29,40 @@ def get_session() -> Generator[Session, None, None]:
         session.close()
 
 
+# every transaction that writes queues for the host-wide single writer before its
+# first statement, reads keep using get_session and scale across workers
+def get_write_session() -> Generator[Session, None, None]:
+    with writer.exclusive():
+        yield from get_session()
+
+
 class UnauthorizedException(Exception):
     pass
 
 
 # implements basic auth
-def get_current_user(
+async def get_current_user(
+    request: Request,
     credentials: HTTPBasicCredentials = Depends(security),
     session: Session = Depends(get_session),
 ) -> schemas.User:
+    user = batch.authenticated_user()
+    if user is None:
+        # requests over the limit cost no hash, and a client sending somebody
+        # else's username only drains its own bucket; logins queue on the event
+        # loop and take a thread only for bcrypt
+        address = request.client.host if request.client else ''
+        admission.login_buckets.take(f'{address} {credentials.username}')
+        with timing.phase('auth'):
+            async with admission.admitted('auth'):
+                user = await run_in_threadpool(
+                    _authenticate, credentials=credentials, session=session
+                )
+    admission.user_buckets.take(user.username)
+    return user
+
+
+def _authenticate(credentials: HTTPBasicCredentials, session: Session) -> schemas.User:
     db_user = get_user_by_username(username=credentials.username, session=session)
 
     if not db_user:
@@ -48,4 +75,16 @@ def get_current_user(
     if not correct_password:
         raise UnauthorizedException
 
-    return schemas.User.from_orm(db_user)
+    user = schemas.User.from_orm(db_user)
+    profiling.record_user(user)
+    return user
+
+
+def get_current_admin(
+    current_user: schemas.User = Depends(get_current_user),
+) -> schemas.User:
+    if current_user.username not in settings.admin_usernames:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail='Admin privileges required'
+        )
+    return current_user
@@ -0,0 +1,158 @@
+import os
+import threading
+from time import monotonic, time
+from typing import Dict, List, Optional, Protocol, Set, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from app import metrics, models
+from app.config import settings
+
+# pylint: disable=unused-argument
+
+# every worker of the host shares the database, so invalidations are rows of the
+# invalidations table: written in the same transaction as the change they describe
+# and polled by id from the other workers before they answer from their caches
+
+PENDING_KEY = 'pending_invalidations'
+
+PUBLISHED = metrics.registry.counter(
+    'cache_invalidations_published_total', 'Invalidations broadcast', ('entity',)
+)
+APPLIED = metrics.registry.counter(
+    'cache_invalidations_applied_total',
+    'Invalidations received from other workers',
+    ('entity',),
+)
+LAG = metrics.registry.histogram(
+    'cache_invalidation_lag_seconds',
+    'Time from a commit in another worker until this worker dropped the entry',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+RESETS = metrics.registry.counter(
+    'cache_invalidation_resets_total',
+    'Caches cleared because invalidations were pruned before they were polled',
+)
+
+
+class Subscriber(Protocol):
+    def invalidate(self, key: int) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+_subscribers: Dict[str, List[Subscriber]] = {}
+
+
+class _PollState:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.last_id: Optional[int] = None
+        self.last_poll = 0.0
+        self.last_prune = 0.0
+
+
+_state = _PollState()
+
+
+def subscribe(entity: str, subscriber: Subscriber) -> None:
+    _subscribers.setdefault(entity, []).append(subscriber)
+
+
+def _dispatch(entity: str, entity_id: int) -> None:
+    for subscriber in _subscribers.get(entity, ()):
+        subscriber.invalidate(entity_id)
+
+
+def _reset() -> None:
+    for subscribers in _subscribers.values():
+        for subscriber in subscribers:
+            subscriber.clear()
+
+
+def _pending(session: Session) -> Set[Tuple[str, int]]:
+    pending: Set[Tuple[str, int]] = session.info.setdefault(PENDING_KEY, set())
+    return pending
+
+
+def publish(session: Session, entity: str, entity_id: int) -> None:
+    if (entity, entity_id) in _pending(session):
+        return
+    _pending(session).add((entity, entity_id))
+    session.add(
+        models.Invalidation(
+            entity=entity, entity_id=entity_id, origin=os.getpid(), created_at=time()
+        )
+    )
+    PUBLISHED.inc(entity)
+    if monotonic() - _state.last_prune > settings.invalidation_retention / 10:
+        _state.last_prune = monotonic()
+        session.query(models.Invalidation).filter(
+            models.Invalidation.created_at < time() - settings.invalidation_retention
+        ).delete(synchronize_session=False)
+
+
+def is_pending(session: Session, entity: str, entity_id: int) -> bool:
+    # a session that changed the entity must see its own uncommitted row
+    return (entity, entity_id) in session.info.get(PENDING_KEY, ())
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _invalidate_pending(session: Session) -> None:
+    # this worker drops its entries right away, others once they poll
+    for entity, entity_id in session.info.pop(PENDING_KEY, ()):
+        _dispatch(entity, entity_id)
+
+
+def poll(session: Session, force: bool = False) -> None:
+    now = monotonic()
+    if not force and now - _state.last_poll < settings.invalidation_poll_interval:
+        return
+    # one thread polls for the whole worker, the others keep using the cache
+    if not _state.lock.acquire(blocking=False):
+        return
+    try:
+        if _state.last_id is None or now - _state.last_poll > (
+            settings.invalidation_retention
+        ):
+            if _state.last_id is not None:
+                RESETS.inc()
+                _reset()
+            _state.last_id = session.query(
+                func.coalesce(func.max(models.Invalidation.id), 0)
+            ).scalar()
+        else:
+            rows = (
+                session.query(
+                    models.Invalidation.id,
+                    models.Invalidation.entity,
+                    models.Invalidation.entity_id,
+                    models.Invalidation.origin,
+                    models.Invalidation.created_at,
+                )
+                .filter(models.Invalidation.id > _state.last_id)
+                .order_by(models.Invalidation.id)
+                .all()
+            )
+            pid = os.getpid()
+            for row_id, entity, entity_id, origin, created_at in rows:
+                _state.last_id = row_id
+                if origin == pid:
+                    continue
+                _dispatch(entity, entity_id)
+                APPLIED.inc(entity)
+                LAG.observe(value=max(time() - created_at, 0.0))
+        _state.last_poll = now
+    finally:
+        _state.lock.release()
+
+
+def reset_state() -> None:
+    _reset()
+    _state.last_id = None
+    _state.last_poll = 0.0
+    _state.last_prune = 0.0
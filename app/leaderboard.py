@@ -0,0 +1,142 @@
+import threading
+from bisect import bisect_left, insort
+from time import monotonic
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import archive, invalidation, models, schemas
+from app.config import settings
+
+Key = Tuple[float, int]
+
+# middle of the 1-10 scale, used until there are ratings to average
+DEFAULT_PRIOR_MEAN = 5.5
+
+
+def weighted_rating(
+    avg_rating: float, no_ratings: int, prior_mean: float, min_votes: int
+) -> float:
+    # bayesian average: a movie needs about min_votes ratings before its own average
+    # outweighs the mean rating of all movies
+    return (no_ratings * avg_rating + min_votes * prior_mean) / (no_ratings + min_votes)
+
+
+class Leaderboard:
+    # movies ordered by weighted rating, globally and per release year; rating changes
+    # arrive through the invalidation bus and are applied on the next read
+    def __init__(self) -> None:
+        self.prior_mean = DEFAULT_PRIOR_MEAN
+        self._entries: Dict[int, schemas.RankedMovie] = {}
+        self._boards: Dict[Optional[int], List[Key]] = {}
+        self._dirty: Set[int] = set()
+        self._built_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def invalidate(self, movie_id: int) -> None:
+        with self._lock:
+            self._dirty.add(movie_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def _stale(self) -> bool:
+        return (
+            self._built_at is None
+            or monotonic() - self._built_at > settings.leaderboard_rebuild_interval
+        )
+
+    def _load(
+        self, session: Session, movie_ids: Optional[Collection[int]] = None
+    ) -> List[schemas.RankedMovie]:
+        counts = archive.rating_counts(movie_ids)
+        query = session.query(models.Movie, counts.c.no_ratings).join(
+            counts, counts.c.movie_id == models.Movie.id
+        )
+        return [
+            schemas.RankedMovie(
+                id=db_movie.id,
+                title=db_movie.title,
+                description=db_movie.description,
+                release_year=db_movie.release_year,
+                avg_rating=db_movie.avg_rating,
+                no_ratings=no_ratings,
+                score=weighted_rating(
+                    db_movie.avg_rating,
+                    no_ratings,
+                    self.prior_mean,
+                    settings.leaderboard_min_votes,
+                ),
+            )
+            for db_movie, no_ratings in query
+            if no_ratings
+        ]
+
+    @staticmethod
+    def _years(entry: schemas.RankedMovie) -> Tuple[Optional[int], ...]:
+        # None keys the overall board, movies without a release year are only on it
+        if entry.release_year is None:
+            return (None,)
+        return (None, entry.release_year)
+
+    def _remove(self, movie_id: int) -> None:
+        entry = self._entries.pop(movie_id, None)
+        if entry is None:
+            return
+        key = (-entry.score, entry.id)
+        for year in self._years(entry):
+            board = self._boards[year]
+            del board[bisect_left(board, key)]
+
+    def _add(self, entry: schemas.RankedMovie) -> None:
+        self._entries[entry.id] = entry
+        key = (-entry.score, entry.id)
+        for year in self._years(entry):
+            insort(self._boards.setdefault(year, []), key)
+
+    def refresh(self, session: Session) -> None:
+        invalidation.poll(session)
+        if not self._stale() and not self._dirty:
+            return
+        with self._refresh_lock:
+            with self._lock:
+                rebuild = self._stale()
+                dirty, self._dirty = self._dirty, set()
+            if rebuild:
+                self.prior_mean = float(
+                    session.query(func.avg(archive.all_reviews().c.rate)).scalar()
+                    or DEFAULT_PRIOR_MEAN
+                )
+                entries = self._load(session)
+                with self._lock:
+                    self._entries = {}
+                    self._boards = {None: []}
+                    for entry in entries:
+                        self._add(entry)
+                    self._built_at = monotonic()
+            elif dirty:
+                entries = self._load(session, dirty)
+                with self._lock:
+                    for movie_id in dirty:
+                        self._remove(movie_id)
+                    for entry in entries:
+                        self._add(entry)
+
+    def top(
+        self,
+        session: Session,
+        release_year: Optional[int] = None,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> List[schemas.RankedMovie]:
+        self.refresh(session)
+        with self._lock:
+            keys = self._boards.get(release_year, [])[offset : offset + limit]
+            return [self._entries[movie_id] for _, movie_id in keys]
+
+
+leaderboard = Leaderboard()
+invalidation.subscribe('movie', leaderboard)
@@ -0,0 +1,246 @@
+import logging
+import threading
+from time import monotonic, time
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import text
+
+from app import archive, invalidation, metrics, models, writer
+from app.config import settings
+
+logger = logging.getLogger('app.maintenance')
+
+MAINTENANCE_RUNS = metrics.registry.counter(
+    'maintenance_runs_total', 'Maintenance task runs by result', ('task', 'result')
+)
+MAINTENANCE_SECONDS = metrics.registry.counter(
+    'maintenance_seconds_total', 'Time spent running maintenance tasks', ('task',)
+)
+MAINTENANCE_ROWS = metrics.registry.counter(
+    'maintenance_rows_total',
+    'Pages checkpointed or freed, movies corrected and reviews archived by maintenance tasks',
+    ('task',),
+)
+MAINTENANCE_LAST_RUN = metrics.registry.gauge(
+    'maintenance_last_run_timestamp_seconds',
+    'Unix time a maintenance task last finished',
+    ('task',),
+)
+
+
+def _sqlite(session: Session) -> bool:
+    return bool(session.get_bind().dialect.name == 'sqlite')
+
+
+def analyze(session: Session) -> int:
+    # with a limit ANALYZE samples large indexes instead of reading all of them
+    if _sqlite(session):
+        session.execute(
+            text(f'PRAGMA analysis_limit = {settings.maintenance_analysis_limit}')
+        )
+    session.execute(text('ANALYZE'))
+    return 0
+
+
+def checkpoint(session: Session) -> int:
+    if not _sqlite(session):
+        return 0
+    _, log, checkpointed = session.execute(
+        text('PRAGMA wal_checkpoint(TRUNCATE)')
+    ).one()
+    # -1 when the database is not in WAL mode
+    return max(checkpointed, 0) if log != -1 else 0
+
+
+def incremental_vacuum(session: Session) -> int:
+    # only databases created with auto_vacuum = INCREMENTAL keep the pointer maps
+    # this needs, older ones have to be converted by one VACUUM
+    if (
+        not _sqlite(session)
+        or session.execute(text('PRAGMA auto_vacuum')).scalar() != 2
+    ):
+        return 0
+    before = session.execute(text('PRAGMA freelist_count')).scalar()
+    # execute() of the sqlite3 module steps the pragma once, freeing one page
+    session.connection().connection.executescript(
+        f'PRAGMA incremental_vacuum({settings.maintenance_vacuum_pages})'
+    )
+    after = session.execute(text('PRAGMA freelist_count')).scalar()
+    return int(before - after)
+
+
+def reconcile_ratings(session: Session) -> int:
+    # ratings written around the api (the admin page, imports) are found with one
+    # aggregate over all reviews and fixed in batches, each a short transaction of
+    # the single writer; a movie whose rating a review changed since it was read is
+    # left to that review's own update
+    reviews = archive.all_reviews()
+    ratings = (
+        select(
+            reviews.c.movie_id,
+            (func.total(reviews.c.rate) / func.count()).label('avg_rating'),
+        )
+        .group_by(reviews.c.movie_id)
+        .subquery('ratings')
+    )
+    actual = func.coalesce(ratings.c.avg_rating, 0.0)
+    drifted = [
+        {'movie_id': movie_id, 'seen': seen, 'actual': value}
+        for movie_id, seen, value in session.query(
+            models.Movie.id, models.Movie.avg_rating, actual
+        )
+        .outerjoin(ratings, ratings.c.movie_id == models.Movie.id)
+        .filter(func.abs(models.Movie.avg_rating - actual) > 1e-9)
+    ]
+    session.rollback()
+
+    correct = (
+        update(models.Movie)
+        .where(
+            models.Movie.id == bindparam('movie_id'),
+            models.Movie.avg_rating == bindparam('seen'),
+        )
+        .values(avg_rating=bindparam('actual'))
+    )
+    corrected = 0
+    size = max(settings.maintenance_reconcile_batch_size, 1)
+    for start in range(0, len(drifted), size):
+        batch = drifted[start : start + size]
+        with writer.exclusive():
+            corrected += session.execute(correct, batch).rowcount
+            for row in batch:
+                invalidation.publish(session, 'movie', row['movie_id'])
+            session.commit()
+    return corrected
+
+
+# tasks that take the single writer for each of their transactions themselves
+SELF_LOCKING = ('reconcile_ratings',)
+
+TASKS: Dict[str, Callable[[Session], int]] = {
+    'analyze': analyze,
+    'checkpoint': checkpoint,
+    'incremental_vacuum': incremental_vacuum,
+    'reconcile_ratings': reconcile_ratings,
+    'archive_reviews': archive.archive_reviews,
+}
+
+
+def _due(session: Session, task: str, now: float) -> bool:
+    started_at = (
+        session.query(models.MaintenanceRun.started_at).filter_by(task=task).scalar()
+    )
+    return (
+        started_at is None or started_at <= now - settings.maintenance_intervals[task]
+    )
+
+
+def _claim(session: Session, task: str, now: float, force: bool) -> bool:
+    db_query = session.query(models.MaintenanceRun).filter_by(task=task)
+    if not force:
+        db_query = db_query.filter(
+            models.MaintenanceRun.started_at
+            <= now - settings.maintenance_intervals[task]
+        )
+    if db_query.update({models.MaintenanceRun.started_at: now}):
+        return True
+    if session.get(models.MaintenanceRun, task) is not None:
+        return False
+    session.add(models.MaintenanceRun(task=task, started_at=now))
+    return True
+
+
+def _execute(session: Session, task: str) -> Tuple[str, Optional[int]]:
+    try:
+        rows: Optional[int] = TASKS[task](session)
+        result = 'ok'
+    except writer.WriterBusy:
+        session.rollback()
+        raise
+    except Exception:  # pylint: disable=broad-except
+        logger.exception('maintenance task %s failed', task)
+        session.rollback()
+        result, rows = 'error', None
+    return result, rows
+
+
+def _record(session: Session, task: str, result: str, rows: Optional[int]) -> None:
+    session.query(models.MaintenanceRun).filter_by(task=task).update(
+        {
+            models.MaintenanceRun.finished_at: time(),
+            models.MaintenanceRun.result: result,
+            models.MaintenanceRun.rows: rows,
+        }
+    )
+    session.commit()
+
+
+def run_task(session: Session, task: str, force: bool = False) -> Optional[int]:
+    # None when the task is disabled, did not run or another worker ran it within
+    # its interval
+    interval = settings.maintenance_intervals.get(task, 0)
+    if interval <= 0 or not force and not _due(session, task, time()):
+        session.rollback()
+        return None
+
+    start = monotonic()
+    try:
+        with writer.exclusive():
+            claimed = _claim(session, task, time(), force)
+            session.commit()
+            if not claimed:
+                return None
+            if task not in SELF_LOCKING:
+                result, rows = _execute(session, task)
+                _record(session, task, result, rows)
+        if task in SELF_LOCKING:
+            result, rows = _execute(session, task)
+            with writer.exclusive():
+                _record(session, task, result, rows)
+    except writer.WriterBusy:
+        MAINTENANCE_RUNS.inc(task, 'busy')
+        return None
+
+    MAINTENANCE_RUNS.inc(task, result)
+    MAINTENANCE_SECONDS.inc(task, amount=monotonic() - start)
+    MAINTENANCE_ROWS.inc(task, amount=rows or 0)
+    MAINTENANCE_LAST_RUN.set(task, value=time())
+    return rows
+
+
+def run_due(session: Session, force: bool = False) -> Dict[str, Optional[int]]:
+    return {task: run_task(session, task, force=force) for task in TASKS}
+
+
+class Scheduler:
+    def __init__(self, session_factory: Callable[[], Session]) -> None:
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='maintenance', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(settings.maintenance_tick):
+            session = self.session_factory()
+            try:
+                run_due(session)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('maintenance failed')
+            finally:
+                session.close()
@@ -0,0 +1,237 @@
+import threading
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+# pylint: disable=unused-argument
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, Any] = {}
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            values = dict(self._values)
+        for labelvalues, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+    def render(self) -> List[str]:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        lines.extend(
+            f'{name}{labels} {_format_value(value)}'
+            for name, labels, value in self.samples()
+        )
+        return lines
+
+    def get(self, *labelvalues: str) -> Any:
+        with self._lock:
+            return self._values.get(labelvalues)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, *labelvalues: str, value: float) -> None:
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labelvalues: str, value: float) -> None:
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                # per-bucket counts followed by +Inf count and sum
+                state = self._values[labelvalues] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[-2] += 1
+            state[-1] += value
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        bucket_names = self.labelnames + ('le',)
+        for labelvalues, state in sorted(values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(bucket_names, labelvalues + (le,))
+                yield f'{self.name}_bucket', labels, cumulative
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f'{self.name}_sum', labels, state[-1]
+            yield f'{self.name}_count', labels, cumulative
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self.register(metric)
+        return metric
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self.register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.register(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests handled', ('method', 'route', 'status')
+)
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('method', 'route')
+)
+SQL_STATEMENTS = registry.counter(
+    'db_statements_total', 'SQL statements executed per route', ('route',)
+)
+SQL_SECONDS = registry.counter(
+    'db_statement_seconds_total', 'Time spent executing SQL per route', ('route',)
+)
+POOL_CHECKED_OUT = registry.gauge(
+    'db_pool_checked_out', 'Database connections currently checked out'
+)
+POOL_CONNECTIONS = registry.counter(
+    'db_pool_connections_total', 'New DBAPI connections opened by the pool'
+)
+PASSWORD_HASHES = registry.counter(
+    'auth_password_hashes_total', 'bcrypt password hashes computed'
+)
+PASSWORD_HASH_SECONDS = registry.counter(
+    'auth_password_hash_seconds_total', 'Time spent computing bcrypt password hashes'
+)
+CACHE_REQUESTS = registry.counter(
+    'cache_requests_total', 'Cache lookups by result', ('cache', 'result')
+)
+
+
+def observe_request(
+    method: str,
+    route: str,
+    status: int,
+    duration: float,
+    db_statements: int,
+    db_seconds: float,
+) -> None:
+    REQUESTS.inc(method, route, str(status))
+    REQUEST_LATENCY.observe(method, route, value=duration)
+    if db_statements:
+        SQL_STATEMENTS.inc(route, amount=db_statements)
+        SQL_SECONDS.inc(route, amount=db_seconds)
+
+
+@event.listens_for(Pool, 'connect')
+def _pool_connect(dbapi_connection: Any, connection_record: Any) -> None:
+    POOL_CONNECTIONS.inc()
+
+
+@event.listens_for(Pool, 'checkout')
+def _pool_checkout(
+    dbapi_connection: Any, connection_record: Any, connection_proxy: Any
+) -> None:
+    POOL_CHECKED_OUT.inc()
+
+
+@event.listens_for(Pool, 'checkin')
+def _pool_checkin(dbapi_connection: Any, connection_record: Any) -> None:
+    POOL_CHECKED_OUT.dec()
@@ -3,14 +3,18 @@ from typing import Any
 from sqlalchemy import (
     CheckConstraint,
     Column,
+    Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     UniqueConstraint,
+    event,
 )
 from sqlalchemy.orm import relationship, validates
+from sqlalchemy.schema import DDL
 
 from .database import DeclarativeBase
 
@@ -27,6 +31,9 @@ class User(DeclarativeBase):
     reviews = relationship(
         'Review', back_populates='user', cascade='all, delete', passive_deletes=True
     )
+    archived_reviews = relationship(
+        'ArchivedReview', cascade='all, delete', passive_deletes=True
+    )
 
     def __repr__(self) -> str:
         return f'username: {self.username}, id: {self.id}'
@@ -45,6 +52,9 @@ class Movie(DeclarativeBase):
     reviews = relationship(
         'Review', back_populates='movie', cascade='all, delete', passive_deletes=True
     )
+    archived_reviews = relationship(
+        'ArchivedReview', cascade='all, delete', passive_deletes=True
+    )
 
     @validates('title')
     def validate_title(self, _: Any, value: str) -> str:
@@ -87,3 +97,134 @@ class Review(DeclarativeBase):
 
     def __repr__(self) -> str:
         return f'user_id: {self.user_id}, movie_id: {self.movie_id}, rate: {self.rate}, text: {self.text}'
+
+
+class ArchivedReview(DeclarativeBase):
+    # reviews older than settings.archive_after_days moved out of the hot table with
+    # their ids, a write to one moves it back
+    __tablename__ = 'reviews_archive'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'movie_id'),
+        Index('ix_reviews_archive_movie_id', 'movie_id', 'id'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    rate = Column(Integer, nullable=False)
+    text = Column(String)
+    datetime = Column(DateTime, nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'))
+
+    user = relationship('User', uselist=False, viewonly=True)
+    movie = relationship('Movie', uselist=False, viewonly=True)
+
+    def __repr__(self) -> str:
+        return f'user_id: {self.user_id}, movie_id: {self.movie_id}, rate: {self.rate}, text: {self.text}'
+
+
+# full text index of review text kept in sync by the review crud functions, rowid is
+# the review id; it keeps its own copy of the text so removing a review that was
+# never indexed (written by the admin page, imported) cannot corrupt it
+REVIEWS_FTS = 'reviews_fts'
+
+event.listen(
+    DeclarativeBase.metadata,
+    'after_create',
+    DDL(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {REVIEWS_FTS} USING fts5('
+        "text, tokenize='unicode61 remove_diacritics 2')"
+    ).execute_if(dialect='sqlite'),
+)
+event.listen(
+    DeclarativeBase.metadata,
+    'before_drop',
+    DDL(f'DROP TABLE IF EXISTS {REVIEWS_FTS}').execute_if(dialect='sqlite'),
+)
+
+
+class Invalidation(DeclarativeBase):
+    __tablename__ = 'invalidations'
+    # ids must never be reused once old rows are pruned, workers poll by id
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    origin = Column(Integer, nullable=False)
+    created_at = Column(Float, nullable=False)
+
+    def __repr__(self) -> str:
+        return f'entity: {self.entity}, entity_id: {self.entity_id}'
+
+
+class SimilarMovie(DeclarativeBase):
+    __tablename__ = 'similar_movies'
+
+    movie_id = Column(
+        Integer, ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True
+    )
+    similar_id = Column(
+        Integer, ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True
+    )
+    score = Column(Float, nullable=False)
+
+    similar = relationship('Movie', foreign_keys=[similar_id], uselist=False)
+
+    def __repr__(self) -> str:
+        return f'movie_id: {self.movie_id}, similar_id: {self.similar_id}, score: {self.score}'
+
+
+class StaleSimilarity(DeclarativeBase):
+    __tablename__ = 'stale_similarities'
+
+    movie_id = Column(Integer, primary_key=True)
+
+    def __repr__(self) -> str:
+        return f'movie_id: {self.movie_id}'
+
+
+class RatingRollup(DeclarativeBase):
+    # one row per movie, period bucket and rate: counts, sums and histograms of a
+    # bucket are all read from its rows
+    __tablename__ = 'rating_rollups'
+
+    movie_id = Column(
+        Integer, ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True
+    )
+    period = Column(String, primary_key=True)
+    bucket = Column(Date, primary_key=True)
+    rate = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f'movie_id: {self.movie_id}, {self.period}: {self.bucket}, rate: {self.rate}, count: {self.count}'
+
+
+class UserStats(DeclarativeBase):
+    __tablename__ = 'user_stats'
+
+    user_id = Column(
+        Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True
+    )
+    no_ratings = Column(Integer, nullable=False, default=0)
+    no_reviews = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    last_active_at = Column(DateTime)
+
+    def __repr__(self) -> str:
+        return f'user_id: {self.user_id}, no_ratings: {self.no_ratings}, no_reviews: {self.no_reviews}'
+
+
+class MaintenanceRun(DeclarativeBase):
+    # a worker claims a task by moving started_at forward, so each task runs once
+    # per interval however many workers there are
+    __tablename__ = 'maintenance_runs'
+
+    task = Column(String, primary_key=True)
+    started_at = Column(Float, nullable=False)
+    finished_at = Column(Float)
+    result = Column(String)
+    rows = Column(Integer)
+
+    def __repr__(self) -> str:
+        return f'task: {self.task}, result: {self.result}, rows: {self.rows}'
@@ -0,0 +1,104 @@
+import logging
+from typing import Any, Callable, Coroutine, Dict
+
+from fastapi import status
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import APIRoute, get_request_handler
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+logger = logging.getLogger('app.negotiation')
+
+# msgpack is optional (poetry install -E msgpack): without it every response is json
+# and msgpack bodies are refused with 415
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+    logger.warning('msgpack is not installed, responses are json only')
+
+MSGPACK = 'application/msgpack'
+MSGPACK_TYPES = (MSGPACK, 'application/x-msgpack')
+JSON = 'application/json'
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK
+
+    def render(self, content: Any) -> bytes:
+        return bytes(msgpack.packb(content, use_bin_type=True))
+
+
+class MsgpackRequest(Request):
+    # fastapi validates the decoded body of request.json() whatever encoded it
+    async def json(self) -> Any:
+        if not hasattr(self, '_json'):
+            self._json = msgpack.unpackb(await self.body())
+        return self._json
+
+
+def _media_type(value: str) -> str:
+    return value.split(';', 1)[0].strip().lower()
+
+
+def qualities(header: str) -> Dict[str, float]:
+    # q-values of an Accept or Accept-Encoding header by lowercase name
+    result = {}
+    for item in header.split(','):
+        name, *params = (part.strip() for part in item.split(';'))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        result[name.lower()] = quality
+    return result
+
+
+def wants_msgpack(request: Request) -> bool:
+    if msgpack is None:
+        return False
+    accepted = qualities(request.headers.get('accept', ''))
+    preferred = max(accepted.get(media_type, 0.0) for media_type in MSGPACK_TYPES)
+    return preferred > 0 and preferred >= accepted.get(JSON, 0.0)
+
+
+class NegotiatedRoute(APIRoute):
+    # routes returning data serialize it as msgpack for clients that accept it
+    # and read msgpack request bodies; errors stay json
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        json_handler = super().get_route_handler()
+        if not isinstance(self.response_class, DefaultPlaceholder):
+            return json_handler
+        msgpack_handler = get_request_handler(
+            dependant=self.dependant,
+            body_field=self.body_field,
+            status_code=self.status_code,
+            response_class=MsgpackResponse,
+            response_field=self.secure_cloned_response_field,
+            response_model_include=self.response_model_include,
+            response_model_exclude=self.response_model_exclude,
+            response_model_by_alias=self.response_model_by_alias,
+            response_model_exclude_unset=self.response_model_exclude_unset,
+            response_model_exclude_defaults=self.response_model_exclude_defaults,
+            response_model_exclude_none=self.response_model_exclude_none,
+            dependency_overrides_provider=self.dependency_overrides_provider,
+        )
+
+        async def negotiated_handler(request: Request) -> Response:
+            content_type = _media_type(request.headers.get('content-type', ''))
+            if content_type in MSGPACK_TYPES:
+                if msgpack is None:
+                    return JSONResponse(
+                        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        content={'detail': 'msgpack request bodies are not supported'},
+                    )
+                request = MsgpackRequest(request.scope, request.receive)
+            if wants_msgpack(request):
+                return await msgpack_handler(request)
+            return await json_handler(request)
+
+        return negotiated_handler
@@ -0,0 +1,238 @@
+import asyncio
+import base64
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import schemas
+from app.config import settings
+
+PROFILE_HEADER = b'x-profile'
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+_thread_profiler = threading.local()
+
+
+class Capture:
+    def __init__(self, scope: Scope) -> None:
+        self.id = uuid.uuid4().hex[:16]
+        self.scope = scope
+        self.user: Optional[schemas.User] = None
+        self.profilers: List[cProfile.Profile] = []
+        self.status_code = 500
+        self.duration = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_admin(self) -> bool:
+        return self.user is not None and self.user.username in settings.admin_usernames
+
+    def start_thread_profiler(self) -> None:
+        profiler = cProfile.Profile()
+        with self._lock:
+            self.profilers.append(profiler)
+        _thread_profiler.profiler = profiler
+        profiler.enable()
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.profilers[0])
+        for profiler in self.profilers[1:]:
+            stats.add(profiler)
+        return stats
+
+
+_capture: contextvars.ContextVar[Optional[Capture]] = contextvars.ContextVar(
+    'profile_capture', default=None
+)
+
+
+def capturing() -> bool:
+    return _capture.get() is not None
+
+
+def record_user(user: schemas.User) -> None:
+    capture = _capture.get()
+    if capture is not None:
+        capture.user = user
+
+
+def _stop_thread_profiler() -> None:
+    _thread_profiler.profiler.disable()
+    del _thread_profiler.profiler
+
+
+def _requested(scope: Scope) -> bool:
+    if any(name == PROFILE_HEADER for name, _ in scope['headers']):
+        return True
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    return PROFILE_QUERY_PARAM in query
+
+
+def _admin_named(scope: Scope) -> bool:
+    # only requests of admins are profiled, anyone else's go straight to the app;
+    # the password is checked by the request's own authentication and the profile
+    # of a request whose credentials turn out wrong is discarded
+    for name, value in scope['headers']:
+        if name != b'authorization':
+            continue
+        scheme, _, param = value.decode('latin-1').partition(' ')
+        if scheme.lower() != 'basic':
+            return False
+        try:
+            username = base64.b64decode(param).decode('ascii').partition(':')[0]
+        except ValueError:
+            return False
+        return username in settings.admin_usernames
+    return False
+
+
+def _bridge(
+    call: Callable[..., Awaitable[Any]], loop: asyncio.AbstractEventLoop
+) -> Callable[..., Awaitable[Any]]:
+    async def bridged(*args: Any) -> Any:
+        async def run() -> Any:
+            return await call(*args)
+
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(run(), loop))
+
+    return bridged
+
+
+def _run_profiled(
+    capture: Capture,
+    app: ASGIApp,
+    receive: Receive,
+    send: Send,
+    server_loop: asyncio.AbstractEventLoop,
+) -> None:
+    # the request runs on a private loop whose single executor thread is profiled
+    # too, so sync dependencies, endpoints and serialization are all captured
+    executor = ThreadPoolExecutor(
+        max_workers=1,
+        thread_name_prefix=f'profile-{capture.id}',
+        initializer=capture.start_thread_profiler,
+    )
+    loop = asyncio.new_event_loop()
+    loop.set_default_executor(executor)
+    _capture.set(capture)
+    capture.start_thread_profiler()
+    start = perf_counter()
+    try:
+        loop.run_until_complete(
+            app(
+                capture.scope, _bridge(receive, server_loop), _bridge(send, server_loop)
+            )
+        )
+    finally:
+        capture.duration = perf_counter() - start
+        _stop_thread_profiler()
+        if len(capture.profilers) > 1:
+            executor.submit(_stop_thread_profiler).result()
+        executor.shutdown(wait=True)
+        loop.close()
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope['type'] != 'http'
+            or not settings.profiling
+            or not _requested(scope)
+            or not _admin_named(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        capture = Capture(scope)
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                capture.status_code = message['status']
+                if capture.is_admin:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(PROFILE_ID_HEADER, capture.id)
+            await send(message)
+
+        loop = asyncio.get_event_loop()
+        context = contextvars.copy_context()
+        try:
+            await loop.run_in_executor(
+                None,
+                context.run,
+                _run_profiled,
+                capture,
+                self.app,
+                receive,
+                send_with_profile_id,
+                loop,
+            )
+        finally:
+            # profiles of anyone but admins are discarded
+            if capture.is_admin:
+                save(capture)
+
+
+def _path(capture_id: str, suffix: str) -> str:
+    return os.path.join(settings.profile_dir, f'{capture_id}{suffix}')
+
+
+def save(capture: Capture) -> None:
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    stats = capture.stats()
+    stats.dump_stats(_path(capture.id, '.prof'))
+
+    stream = io.StringIO()
+    pstats.Stats(_path(capture.id, '.prof'), stream=stream).sort_stats(
+        'cumulative'
+    ).print_stats().print_callees(30)
+    with open(_path(capture.id, '.txt'), 'w') as text_file:
+        text_file.write(stream.getvalue())
+
+    metadata = {
+        'id': capture.id,
+        'method': capture.scope['method'],
+        'path': capture.scope['path'],
+        'query_string': capture.scope.get('query_string', b'').decode('latin-1'),
+        'username': capture.user.username if capture.user else None,
+        'status': capture.status_code,
+        'duration_ms': round(capture.duration * 1000, 2),
+        'threads': len(capture.profilers),
+        'created_at': datetime.now().isoformat(),
+    }
+    with open(_path(capture.id, '.json'), 'w') as metadata_file:
+        json.dump(metadata, metadata_file)
+
+
+def list_captures() -> List[Dict[str, Any]]:
+    if not os.path.isdir(settings.profile_dir):
+        return []
+    captures = []
+    for name in os.listdir(settings.profile_dir):
+        if name.endswith('.json'):
+            with open(os.path.join(settings.profile_dir, name)) as metadata_file:
+                captures.append(json.load(metadata_file))
+    return sorted(captures, key=lambda capture: capture['created_at'], reverse=True)
+
+
+def capture_path(capture_id: str, suffix: str) -> Optional[str]:
+    if not capture_id.isalnum():
+        return None
+    path = _path(capture_id, suffix)
+    return path if os.path.isfile(path) else None
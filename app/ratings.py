@@ -0,0 +1,76 @@
+import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement, func
+
+from app import archive, invalidation, models, rollups, schemas
+
+# aggregates of the hot and archived reviews of a movie
+
+
+def avg_rating_of(movie_id: Any) -> ColumnElement:
+    # archived ratings count as much as hot ones
+    return func.coalesce(
+        archive.rating_total_of(movie_id)
+        / func.nullif(archive.rating_count_of(movie_id), 0),
+        0.0,
+    )
+
+
+def update_avg_rating_of_movie(session: Session, db_movie: models.Movie) -> None:
+    # computed and written by one statement of the review's transaction, so a
+    # review committed in between can never be lost from the average
+    session.query(models.Movie).filter(models.Movie.id == db_movie.id).update(
+        {models.Movie.avg_rating: avg_rating_of(db_movie.id)},
+        synchronize_session=False,
+    )
+    session.expire(db_movie, ['avg_rating'])
+    invalidation.publish(session, 'movie', db_movie.id)
+
+
+def calc_avg_rating(session: Session, movie_id: int) -> float:
+    return float(session.query(avg_rating_of(movie_id)).scalar())
+
+
+def calc_no_ratings(session: Session, movie_id: int) -> int:
+    return int(session.query(archive.rating_count_of(movie_id)).scalar())
+
+
+def calc_no_reviews(session: Session, movie_id: int) -> int:
+    return int(session.query(archive.review_count_of(movie_id)).scalar())
+
+
+def get_rating_trend(
+    session: Session,
+    movie_id: int,
+    period: schemas.TrendPeriod,
+    since: Optional[datetime.date] = None,
+    until: Optional[datetime.date] = None,
+) -> List[schemas.RatingBucket]:
+    db_query = session.query(models.RatingRollup).filter_by(
+        movie_id=movie_id, period=period.value
+    )
+    if since:
+        db_query = db_query.filter(
+            models.RatingRollup.bucket >= rollups.BUCKETS[period](since)
+        )
+    if until:
+        db_query = db_query.filter(models.RatingRollup.bucket <= until)
+
+    histograms: Dict[datetime.date, Dict[int, int]] = {}
+    for rollup in db_query.filter(models.RatingRollup.count > 0).order_by(
+        models.RatingRollup.bucket, models.RatingRollup.rate
+    ):
+        histograms.setdefault(rollup.bucket, {})[rollup.rate] = rollup.count
+
+    return [
+        schemas.RatingBucket(
+            bucket=bucket,
+            count=sum(histogram.values()),
+            avg_rating=sum(rate * count for rate, count in histogram.items())
+            / sum(histogram.values()),
+            histogram=histogram,
+        )
+        for bucket, histogram in histograms.items()
+    ]
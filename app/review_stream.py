@@ -0,0 +1,230 @@
+import asyncio
+import secrets
+import threading
+from collections import deque
+from typing import (
+    AsyncGenerator,
+    Deque,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app import metrics, schemas
+from app.config import settings
+
+# pylint: disable=unused-argument
+
+# review changes are pushed to the streams open in this worker once their
+# transaction commits; event ids carry a token of the worker, a client resuming on
+# another worker or after a restart is told to reload instead of missing events
+
+PENDING_KEY = 'pending_review_events'
+
+PUBLISHED = metrics.registry.counter(
+    'review_events_published_total', 'Review changes pushed to streams', ('type',)
+)
+SUBSCRIBERS = metrics.registry.gauge('review_stream_subscribers', 'Open review streams')
+OVERFLOWS = metrics.registry.counter(
+    'review_stream_overflows_total', 'Streams closed as their client fell behind'
+)
+
+ReviewPayload = Union[schemas.Review, schemas.DeletedReview]
+
+
+class ReviewEvent(NamedTuple):
+    seq: int
+    movie_id: int
+    type: str
+    data: str
+
+
+class Subscription:
+    def __init__(self, movie_id: int) -> None:
+        self.movie_id = movie_id
+        self.loop = asyncio.get_running_loop()
+        # None ends the stream
+        self.queue: 'asyncio.Queue[Optional[ReviewEvent]]' = asyncio.Queue(
+            max(settings.review_stream_buffer, 1)
+        )
+
+    def put(self, review_event: ReviewEvent) -> None:
+        try:
+            self.queue.put_nowait(review_event)
+        except asyncio.QueueFull:
+            # the buffered events are dropped and the stream ends, the client
+            # reconnects with the id of the last event it got and is replayed the rest
+            OVERFLOWS.inc()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class _Hub:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.token = secrets.token_hex(4)
+        self.seq = 0
+        self.history: Deque[ReviewEvent] = deque()
+        self.subscriptions: Dict[int, Set[Subscription]] = {}
+
+
+_hub = _Hub()
+
+
+def event_id(seq: int) -> str:
+    return f'{_hub.token}-{seq}'
+
+
+def _pending(session: Session) -> List[Tuple[int, str, ReviewPayload]]:
+    pending: List[Tuple[int, str, ReviewPayload]] = session.info.setdefault(
+        PENDING_KEY, []
+    )
+    return pending
+
+
+def publish(
+    session: Session, event_type: str, movie_id: int, review: ReviewPayload
+) -> None:
+    # the payload is read inside the transaction, the review may be expired or
+    # gone once it commits
+    _pending(session).append((movie_id, event_type, review))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending(session: Session) -> None:
+    for movie_id, event_type, review in session.info.pop(PENDING_KEY, ()):
+        _dispatch(movie_id, event_type, review.json())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+def _deliver(subscriptions: List[Subscription], review_event: ReviewEvent) -> None:
+    for subscription in subscriptions:
+        subscription.put(review_event)
+
+
+def _dispatch(movie_id: int, event_type: str, data: str) -> None:
+    # serialized once and handed to every event loop with subscribers in a single
+    # callback, which fans it out to their queues; scheduled under the lock so
+    # every loop runs the callbacks in the order of the events
+    with _hub.lock:
+        _hub.seq += 1
+        review_event = ReviewEvent(_hub.seq, movie_id, event_type, data)
+        _hub.history.append(review_event)
+        while len(_hub.history) > settings.review_stream_history:
+            _hub.history.popleft()
+
+        by_loop: Dict[asyncio.AbstractEventLoop, List[Subscription]] = {}
+        for subscription in _hub.subscriptions.get(movie_id, ()):
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, subscriptions, review_event)
+            except RuntimeError:
+                # the loop closed, its streams are gone with it
+                pass
+    PUBLISHED.inc(event_type)
+
+
+def _seq_of(last_event_id: str) -> Optional[int]:
+    token, _, seq = last_event_id.rpartition('-')
+    if token != _hub.token or not seq.isdigit():
+        return None
+    return int(seq)
+
+
+def _subscribe(
+    subscription: Subscription, last_event_id: Optional[str]
+) -> Tuple[Optional[List[ReviewEvent]], int]:
+    # returns the events to replay, None when some of the ones after
+    # last_event_id are no longer kept, and the id of the newest event
+    with _hub.lock:
+        _hub.subscriptions.setdefault(subscription.movie_id, set()).add(subscription)
+        if last_event_id is None:
+            return [], _hub.seq
+
+        seq = _seq_of(last_event_id)
+        oldest = _hub.history[0].seq if _hub.history else _hub.seq + 1
+        if seq is None or seq > _hub.seq or seq + 1 < oldest:
+            return None, _hub.seq
+        replay = [
+            review_event
+            for review_event in _hub.history
+            if review_event.seq > seq and review_event.movie_id == subscription.movie_id
+        ]
+        return replay, _hub.seq
+
+
+def _unsubscribe(subscription: Subscription) -> None:
+    with _hub.lock:
+        subscriptions = _hub.subscriptions.get(subscription.movie_id, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            _hub.subscriptions.pop(subscription.movie_id, None)
+
+
+def _format(seq: int, event_type: str, data: str) -> str:
+    return f'id: {event_id(seq)}\nevent: {event_type}\ndata: {data}\n\n'
+
+
+async def stream(
+    movie_id: int, last_event_id: Optional[str]
+) -> AsyncGenerator[str, None]:
+    subscription = Subscription(movie_id)
+    replay, newest = _subscribe(subscription, last_event_id)
+    SUBSCRIBERS.inc()
+    try:
+        # sent right away so the headers get through to the client
+        yield ': connected\n\n'
+        if replay is None:
+            yield _format(newest, 'reset', '{}')
+        else:
+            for missed in replay:
+                yield _format(missed.seq, missed.type, missed.data)
+        while True:
+            try:
+                review_event = await asyncio.wait_for(
+                    subscription.queue.get(), settings.review_stream_keepalive
+                )
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if review_event is None:
+                return
+            yield _format(review_event.seq, review_event.type, review_event.data)
+    finally:
+        _unsubscribe(subscription)
+        SUBSCRIBERS.dec()
+
+
+class EventStreamResponse(StreamingResponse):
+    media_type = 'text/event-stream'
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # streams until the client disconnects, with tasks where starlette's
+        # run_until_first_complete hands asyncio.wait coroutines newer pythons refuse
+        streaming = asyncio.ensure_future(self.stream_response(send))
+        listening = asyncio.ensure_future(self.listen_for_disconnect(receive))
+        try:
+            await asyncio.wait(
+                (streaming, listening), return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for task in (streaming, listening):
+                task.cancel()
+            await asyncio.wait((streaming, listening))
+        if not streaming.cancelled():
+            streaming.result()
@@ -0,0 +1,70 @@
+import datetime
+from typing import Any, Callable, Dict
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app import archive, models, schemas, writer
+
+BUCKETS: Dict[schemas.TrendPeriod, Callable[[datetime.date], datetime.date]] = {
+    schemas.TrendPeriod.day: lambda day: day,
+    schemas.TrendPeriod.month: lambda day: day.replace(day=1),
+}
+
+
+def record(
+    session: Session, movie_id: int, rate: int, moment: datetime.datetime, delta: int
+) -> None:
+    # review writes hold the writer lock, so update-then-insert cannot race
+    for period, bucket_of in BUCKETS.items():
+        key = {
+            'movie_id': movie_id,
+            'period': period.value,
+            'bucket': bucket_of(moment.date()),
+            'rate': rate,
+        }
+        updated = (
+            session.query(models.RatingRollup)
+            .filter_by(**key)
+            .update(
+                {models.RatingRollup.count: models.RatingRollup.count + delta},
+                synchronize_session=False,
+            )
+        )
+        if not updated:
+            session.add(models.RatingRollup(**key, count=delta))
+
+
+def _bucket_sql(period: schemas.TrendPeriod, reviews: Any) -> object:
+    if period is schemas.TrendPeriod.day:
+        return func.date(reviews.c.datetime)
+    return func.strftime('%Y-%m-01', reviews.c.datetime)
+
+
+def backfill(session: Session) -> int:
+    # rebuilds every rollup from the reviews table, for databases that had reviews
+    # before the rollups existed or after reviews were edited outside the api
+    with writer.exclusive():
+        session.query(models.RatingRollup).delete(synchronize_session=False)
+        reviews = archive.all_reviews()
+        for period in schemas.TrendPeriod:
+            bucket = _bucket_sql(period, reviews)
+            rows = (
+                select(
+                    reviews.c.movie_id,
+                    literal(period.value),
+                    bucket,
+                    reviews.c.rate,
+                    func.count(),
+                )
+                .where(reviews.c.movie_id.isnot(None))
+                .group_by(reviews.c.movie_id, bucket, reviews.c.rate)
+            )
+            session.execute(
+                insert(models.RatingRollup).from_select(
+                    ['movie_id', 'period', 'bucket', 'rate', 'count'], rows
+                )
+            )
+        count: int = session.query(models.RatingRollup).count()
+        session.commit()
+    return count
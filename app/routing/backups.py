@@ -0,0 +1,43 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from .. import backup
+from ..dependencies import get_current_admin, get_session
+from ..timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.post(
+    '',
+    response_model=Dict[str, Any],
+    status_code=status.HTTP_202_ACCEPTED,
+    summary='Start an online backup of the database',
+    dependencies=[Depends(get_current_admin)],
+)
+def start_backup(session: Session = Depends(get_session)) -> Dict[str, Any]:
+    try:
+        return backup.start_backup(session.get_bind()).as_dict()
+    except backup.BackupRunning:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail='A backup is already running'
+        ) from None
+    except backup.BackupError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from None
+
+
+@router.get(
+    '/latest',
+    response_model=Dict[str, Any],
+    summary='Progress and throughput of the latest backup',
+    dependencies=[Depends(get_current_admin)],
+)
+def get_latest_backup() -> Dict[str, Any]:
+    progress = backup.latest()
+    if progress is None:
+        raise HTTPException(status_code=404, detail='No backup has run')
+    return progress.as_dict()
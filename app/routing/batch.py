@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from .. import batch, schemas
+from ..config import settings
+from ..dependencies import get_current_user
+from ..timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+# not admitted itself: every sub-request queues for a slot of its own route class,
+# a batch holding one too could starve them
+@router.post(
+    '',
+    response_model=schemas.BatchResponse,
+    summary='Run several requests with one authentication and round trip',
+)
+async def run_batch(
+    batch_request: schemas.BatchRequest,
+    request: Request,
+    current_user: schemas.User = Depends(get_current_user),
+) -> schemas.BatchResponse:
+    if len(batch_request.requests) > settings.batch_max_requests:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f'At most {settings.batch_max_requests} requests per batch',
+        )
+
+    responses = await batch.run(request, current_user, batch_request.requests)
+    return schemas.BatchResponse(responses=responses)
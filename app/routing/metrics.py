@@ -0,0 +1,27 @@
+from typing import Any, Dict, List
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from .. import metrics, slow_queries
+from ..timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get(
+    '',
+    response_class=PlainTextResponse,
+    summary='Prometheus metrics',
+)
+def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@router.get(
+    '/slow_queries',
+    response_model=List[Dict[str, Any]],
+    summary='Slow queries summarized by fingerprint',
+)
+def get_slow_queries() -> List[Dict[str, Any]]:
+    return slow_queries.summary()
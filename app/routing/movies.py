@@ -1,14 +1,19 @@
-from typing import Any, Dict, List, Optional, Union
+from datetime import date
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from .. import crud_movies as crud
-from .. import models, schemas
-from ..dependencies import get_current_user, get_session
+from .. import models, ratings, schemas
+from ..admission import admit, admitted
+from ..autocomplete import MAX_SUGGESTIONS, autocomplete
+from ..coalescing import CoalescingRoute
+from ..dependencies import get_current_user, get_session, get_write_session
+from ..leaderboard import leaderboard
 
-router = APIRouter()
+router = APIRouter(route_class=CoalescingRoute)
 
 
 # pylint: disable=too-many-arguments
@@ -24,16 +29,23 @@ class MovieNotFound(HTTPException):
         super().__init__(status_code=404, detail='Movie not found', **kwargs)
 
 
+async def admit_movie_listing(request: Request) -> AsyncIterator[None]:
+    # a title filter is a LIKE scan of the whole table
+    route_class = 'search' if request.query_params.get('filter_str') else 'read'
+    async with admitted(route_class):
+        yield
+
+
 @router.post(
     '',
     response_model=schemas.Movie,
     status_code=status.HTTP_201_CREATED,
     tags=['movies'],
     summary='Create new movie',
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(admit('write')), Depends(get_current_user)],
 )
 def create_movie(
-    movie: schemas.MovieCreate, session: Session = Depends(get_session)
+    movie: schemas.MovieCreate, session: Session = Depends(get_write_session)
 ) -> Optional[models.Movie]:
     return crud.create_movie(session=session, movie=movie)
 
@@ -44,12 +56,14 @@ def create_movie(
     status_code=status.HTTP_201_CREATED,
     tags=['movies', 'reviews'],
     summary='Create new review for given movie',
+    dependencies=[Depends(admit('write'))],
 )
 def create_review(
     movie_id: int,
     review: schemas.ReviewCreate,
-    session: Session = Depends(get_session),
+    # authenticate before queueing for the writer, bcrypt must not run under the lock
     current_user: schemas.User = Depends(get_current_user),
+    session: Session = Depends(get_write_session),
 ) -> Optional[models.Review]:
     db_movie = crud.get_movie_by_id(session=session, movie_id=movie_id)
     if not db_movie:
@@ -79,12 +93,13 @@ def create_review(
     response_model=schemas.Review,
     tags=['movies', 'reviews'],
     summary='Update review of authorized user',
+    dependencies=[Depends(admit('write'))],
 )
 def update_review(
     movie_id: int,
     review: schemas.ReviewCreate,
-    session: Session = Depends(get_session),
     current_user: schemas.User = Depends(get_current_user),
+    session: Session = Depends(get_write_session),
 ) -> Optional[schemas.Review]:
     db_review = crud.get_review_by_movie_and_user_ids(
         session=session, movie_id=movie_id, user_id=current_user.id
@@ -96,12 +111,15 @@ def update_review(
 
 
 @router.delete(
-    '/{movie_id}/reviews', tags=['reviews'], summary='Delete review of authorized user'
+    '/{movie_id}/reviews',
+    tags=['reviews'],
+    summary='Delete review of authorized user',
+    dependencies=[Depends(admit('write'))],
 )
 def delete_review(
     movie_id: int,
-    session: Session = Depends(get_session),
     current_user: schemas.User = Depends(get_current_user),
+    session: Session = Depends(get_write_session),
 ) -> Optional[int]:
     db_review = crud.get_review_by_movie_and_user_ids(
         session=session, movie_id=movie_id, user_id=current_user.id
@@ -119,7 +137,7 @@ def delete_review(
     tags=['movies', 'reviews'],
     response_model=Dict[str, Union[List[schemas.Review], float]],
     summary='Get reviews of given movie',
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(admit('read')), Depends(get_current_user)],
 )
 def get_reviews(
     movie_id: int,
@@ -130,19 +148,19 @@ def get_reviews(
     no_reviews: bool = False,
     session: Session = Depends(get_session),
 ) -> Dict[str, Union[List[models.Review], float]]:
-    db_movie = crud.get_movie_by_id(session=session, movie_id=movie_id)
-    if not db_movie:
+    movie = crud.get_movie_snapshot(session=session, movie_id=movie_id)
+    if not movie:
         raise MovieNotFound
 
-    response = dict()
+    response: Dict[str, Union[List[models.Review], float]] = dict()
     if avg_rating:
-        response['avg_rating'] = db_movie.avg_rating
+        response['avg_rating'] = movie.avg_rating
     if no_ratings:
-        response['no_ratings'] = crud.calc_no_ratings(
+        response['no_ratings'] = ratings.calc_no_ratings(
             session=session, movie_id=movie_id
         )
     if no_reviews:
-        response['no_reviews'] = crud.calc_no_reviews(
+        response['no_reviews'] = ratings.calc_no_reviews(
             session=session, movie_id=movie_id
         )
 
@@ -158,12 +176,52 @@ def get_reviews(
     return response
 
 
+@router.get(
+    '/{movie_id}/ratings/trend',
+    tags=['movies', 'reviews'],
+    response_model=List[schemas.RatingBucket],
+    summary='Get number and average of ratings of given movie per day or month',
+    dependencies=[Depends(admit('read')), Depends(get_current_user)],
+)
+def get_rating_trend(
+    movie_id: int,
+    period: schemas.TrendPeriod = schemas.TrendPeriod.day,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    session: Session = Depends(get_session),
+) -> List[schemas.RatingBucket]:
+    if not crud.get_movie_snapshot(session=session, movie_id=movie_id):
+        raise MovieNotFound
+
+    return ratings.get_rating_trend(
+        session=session, movie_id=movie_id, period=period, since=since, until=until
+    )
+
+
+@router.get(
+    '/{movie_id}/similar',
+    tags=['movies'],
+    response_model=List[schemas.SimilarMovie],
+    summary='Get movies liked by the people who liked given movie',
+    dependencies=[Depends(admit('read')), Depends(get_current_user)],
+)
+def get_similar_movies(
+    movie_id: int,
+    limit: int = Query(20, gt=0),
+    session: Session = Depends(get_session),
+) -> List[schemas.SimilarMovie]:
+    if not crud.get_movie_snapshot(session=session, movie_id=movie_id):
+        raise MovieNotFound
+
+    return crud.get_similar_movies(session=session, movie_id=movie_id, limit=limit)
+
+
 @router.get(
     '',
     tags=['movies'],
     response_model=List[schemas.Movie],
     summary='Get a list of movies',
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(admit_movie_listing), Depends(get_current_user)],
 )
 def get_movies(
     after_id: int = 0,
@@ -187,17 +245,49 @@ def get_movies(
     return movies
 
 
+@router.get(
+    '/autocomplete',
+    tags=['movies'],
+    response_model=List[schemas.MovieSuggestion],
+    summary='Suggest movies whose title has a word starting with q',
+    dependencies=[Depends(admit('read')), Depends(get_current_user)],
+)
+def autocomplete_movies(
+    q: str,
+    limit: int = Query(10, gt=0, le=MAX_SUGGESTIONS),
+    session: Session = Depends(get_session),
+) -> List[schemas.MovieSuggestion]:
+    return autocomplete.suggest(session=session, query=q, limit=limit)
+
+
+@router.get(
+    '/top',
+    tags=['movies'],
+    response_model=List[schemas.RankedMovie],
+    summary='Get top rated movies, overall or of one release year',
+    dependencies=[Depends(admit('read')), Depends(get_current_user)],
+)
+def get_top_movies(
+    release_year: Optional[int] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, gt=0),
+    session: Session = Depends(get_session),
+) -> List[schemas.RankedMovie]:
+    return leaderboard.top(
+        session=session, release_year=release_year, offset=offset, limit=limit
+    )
+
+
 @router.delete(
     '/{movie_id}',
     tags=['movies'],
     summary='Delete Movie',
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(admit('write')), Depends(get_current_user)],
 )
 def delete_movie(
-    movie_id: int, session: Session = Depends(get_session)
+    movie_id: int, session: Session = Depends(get_write_session)
 ) -> Optional[int]:
-    db_movie = crud.get_movie_by_id(session=session, movie_id=movie_id)
-    if not db_movie:
+    if not crud.get_movie_snapshot(session=session, movie_id=movie_id):
         raise MovieNotFound
 
     return crud.delete_movie(session=session, movie_id=movie_id)
@@ -0,0 +1,48 @@
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+
+from .. import profiling
+from ..dependencies import get_current_admin
+from ..timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+MEDIA_TYPES = {
+    'prof': 'application/octet-stream',
+    'txt': 'text/plain',
+    'json': 'application/json',
+}
+
+
+@router.get(
+    '',
+    response_model=List[Dict[str, Any]],
+    summary='List profile captures',
+    dependencies=[Depends(get_current_admin)],
+)
+def list_profiles() -> List[Dict[str, Any]]:
+    return profiling.list_captures()
+
+
+@router.get(
+    '/{capture_id}',
+    response_class=Response,
+    summary='Download profile capture as pstats dump, text report or metadata',
+    dependencies=[Depends(get_current_admin)],
+)
+def get_profile(
+    capture_id: str, fmt: str = Query('prof', alias='format', regex='^(prof|txt|json)$')
+) -> Response:
+    path = profiling.capture_path(capture_id, f'.{fmt}')
+    if not path:
+        raise HTTPException(status_code=404, detail='Profile not found')
+
+    with open(path, 'rb') as capture_file:
+        content = capture_file.read()
+    return Response(
+        content,
+        media_type=MEDIA_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{capture_id}.{fmt}"'},
+    )
@@ -0,0 +1,40 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from .. import schemas, search
+from ..admission import admit
+from ..coalescing import CoalescingRoute
+from ..dependencies import get_current_user, get_session
+
+router = APIRouter(route_class=CoalescingRoute)
+
+
+# pylint: disable=too-many-arguments
+
+
+@router.get(
+    '/search',
+    response_model=List[schemas.ReviewSearchResult],
+    summary='Search review texts, best matches first',
+    dependencies=[Depends(admit('search')), Depends(get_current_user)],
+)
+def search_reviews(
+    q: str = Query(..., min_length=1),
+    movie_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    after_rank: Optional[float] = None,
+    after_id: int = 0,
+    limit: int = Query(20, gt=0),
+    session: Session = Depends(get_session),
+) -> List[schemas.ReviewSearchResult]:
+    return search.search_reviews(
+        session=session,
+        query=q,
+        movie_id=movie_id,
+        user_id=user_id,
+        after_rank=after_rank,
+        after_id=after_id,
+        limit=limit,
+    )
@@ -0,0 +1,40 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
+from sqlalchemy.orm import Session
+
+from .. import crud_movies as crud
+from .. import review_stream
+from ..dependencies import get_current_user, get_session
+from ..timing import TimedRoute
+from .movies import MovieNotFound
+
+# streamed responses are never shared, identical streams are not coalesced
+router = APIRouter(route_class=TimedRoute)
+
+
+# not admitted: a stream stays open for as long as its client listens, it would
+# hold a read slot all that time
+@router.get(
+    '/{movie_id}/reviews/stream',
+    tags=['reviews'],
+    summary='Stream new, updated and deleted reviews of given movie as server-sent events',
+    dependencies=[Depends(get_current_user)],
+)
+def stream_reviews(
+    movie_id: int,
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias='Last-Event-ID'),
+    session: Session = Depends(get_session),
+) -> review_stream.EventStreamResponse:
+    if not crud.get_movie_snapshot(session=session, movie_id=movie_id):
+        raise MovieNotFound
+    # the connection goes back to the pool instead of staying with the stream
+    session.close()
+
+    # browsers send the header when they reconnect, it is newer than the query
+    resume_from = last_event_id_header or last_event_id
+    return review_stream.EventStreamResponse(
+        review_stream.stream(movie_id, resume_from),
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
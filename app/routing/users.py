@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.exc import IntegrityError
@@ -6,9 +6,12 @@ from sqlalchemy.orm import Session
 
 from .. import crud_users as crud
 from .. import models, schemas
-from ..dependencies import get_current_user, get_session
+from ..admission import admit
+from ..coalescing import CoalescingRoute
+from ..dependencies import get_current_user, get_session, get_write_session
+from ..utils import make_password_hash
 
-router = APIRouter()
+router = APIRouter(route_class=CoalescingRoute)
 
 
 class UsernameAlreadyTaken(HTTPException):
@@ -16,20 +19,28 @@ class UsernameAlreadyTaken(HTTPException):
         super().__init__(status_code=409, detail='Username already taken', **kwargs)
 
 
+def hash_password(user: schemas.UserCreate) -> str:
+    return make_password_hash(user.password)
+
+
 @router.post(
     '',
     response_model=schemas.User,
     status_code=status.HTTP_201_CREATED,
     summary='Register new user',
+    dependencies=[Depends(admit('write'))],
 )
 def create_user(
-    user: schemas.UserCreate, session: Session = Depends(get_session)
+    user: schemas.UserCreate,
+    # hashed before queueing for the writer, bcrypt must not run under the lock
+    hashed_password: str = Depends(hash_password),
+    session: Session = Depends(get_write_session),
 ) -> models.User:
     db_user = crud.get_user_by_username(session, username=user.username)
     if db_user:
         raise UsernameAlreadyTaken
     try:  # to catch racing condition
-        return crud.create_user(session, user)
+        return crud.create_user(session, user, hashed_password)
     except IntegrityError as err:
         raise UsernameAlreadyTaken from err
 
@@ -37,24 +48,47 @@ def create_user(
 @router.get(
     '',
     tags=['users'],
-    response_model=List[schemas.User],
+    response_model=List[schemas.UserWithStats],
+    response_model_exclude_unset=True,
     summary='Get all users',
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(admit('read')), Depends(get_current_user)],
 )
 def get_all_users(
     after_id: int = 0,
     limit: int = Query(20, gt=0),
+    with_stats: bool = False,
     session: Session = Depends(get_session),
-) -> List[models.User]:
+) -> Union[List[models.User], List[schemas.UserWithStats]]:
+    if with_stats:
+        return crud.get_all_users_with_stats(
+            session=session, after_id=after_id, limit=limit
+        )
     return crud.get_all_users(session=session, after_id=after_id, limit=limit)
 
 
+@router.get(
+    '/{user_id}/stats',
+    response_model=schemas.UserStats,
+    tags=['users'],
+    summary='Get review statistics of user with given id',
+    dependencies=[Depends(admit('read')), Depends(get_current_user)],
+)
+def get_user_stats(
+    user_id: int, session: Session = Depends(get_session)
+) -> schemas.UserStats:
+    stats = crud.get_user_stats(session=session, user_id=user_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail='User not found')
+
+    return stats
+
+
 @router.get(
     '/{user_id}/reviews/movies/{movie_id}',
     response_model=schemas.Review,
     tags=['reviews', 'movies'],
     summary='Get review of a user to given movie',
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(admit('read')), Depends(get_current_user)],
 )
 def get_user_review_on_movie(
     user_id: int, movie_id: int, session: Session = Depends(get_session)
@@ -74,7 +108,7 @@ def get_user_review_on_movie(
     response_model=List[schemas.Review],
     tags=['users', 'reviews'],
     summary='Get reviews of user with given id',
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(admit('read')), Depends(get_current_user)],
 )
 def get_user_reviews(
     user_id: int,
@@ -1,5 +1,6 @@
 import datetime
-from typing import Optional
+from enum import Enum
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -26,6 +27,31 @@ class Movie(MovieBase):
         orm_mode = True
 
 
+class MovieSnapshot(Movie):
+    class Config:
+        allow_mutation = False
+
+
+class RankedMovie(MovieSnapshot):
+    no_ratings: int
+    score: float
+
+
+class MovieSuggestion(BaseModel):
+    id: int
+    title: str
+    release_year: Optional[int]
+    avg_rating: float
+    no_ratings: int
+
+    class Config:
+        allow_mutation = False
+
+
+class SimilarMovie(Movie):
+    score: float
+
+
 class UserBase(BaseModel):
     username: str
 
@@ -41,6 +67,17 @@ class User(UserBase):
         orm_mode = True
 
 
+class UserStats(BaseModel):
+    no_ratings: int
+    no_reviews: int
+    avg_given_rating: float
+    last_active_at: Optional[datetime.datetime]
+
+
+class UserWithStats(User):
+    stats: Optional[UserStats] = None
+
+
 class ReviewBase(BaseModel):
     rate: int = Field(..., ge=1, le=10)
     text: str = Field(None, min_length=5)
@@ -58,3 +95,53 @@ class Review(ReviewBase):
 
     class Config:
         orm_mode = True
+
+
+class DeletedReview(BaseModel):
+    id: int
+    user_id: int
+    movie_id: int
+
+
+class ReviewSearchResult(Review):
+    rank: float
+
+
+class TrendPeriod(str, Enum):
+    day = 'day'
+    month = 'month'
+
+
+class RatingBucket(BaseModel):
+    bucket: datetime.date
+    count: int
+    avg_rating: float
+    histogram: Dict[int, int]
+
+
+class BatchMethod(str, Enum):
+    get = 'GET'
+    post = 'POST'
+    put = 'PUT'
+    delete = 'DELETE'
+
+
+class SubRequest(BaseModel):
+    id: Optional[str] = None
+    method: BatchMethod = BatchMethod.get
+    path: str = Field(..., regex='^/')
+    body: Optional[Any] = None
+
+
+class BatchRequest(BaseModel):
+    requests: List[SubRequest] = Field(..., min_items=1)
+
+
+class SubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    body: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    responses: List[SubResponse]
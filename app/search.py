@@ -0,0 +1,114 @@
+import re
+from typing import Any, List, Optional, Tuple, Union
+
+from sqlalchemy import and_, column, literal_column, or_, table
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.sql import text
+
+from app import models, schemas
+
+# pylint: disable=too-many-arguments
+
+fts = table(models.REVIEWS_FTS, column('rowid'), column('rank'))
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def match_expression(query: str) -> str:
+    # every word is quoted so user input can never be fts5 query syntax, all of
+    # them have to occur and the last one may still be typed
+    tokens = [f'"{token}"' for token in TOKEN.findall(query)]
+    if tokens:
+        tokens[-1] += '*'
+    return ' '.join(tokens)
+
+
+def index_review(session: Session, review_id: int, body: Optional[str]) -> None:
+    if body is not None:
+        session.execute(
+            text(f'INSERT INTO {models.REVIEWS_FTS}(rowid, text) VALUES (:id, :body)'),
+            {'id': review_id, 'body': body},
+        )
+
+
+def unindex_review(session: Session, review_id: int) -> None:
+    session.execute(
+        text(f'DELETE FROM {models.REVIEWS_FTS} WHERE rowid = :id'), {'id': review_id}
+    )
+
+
+def rebuild(bind: Union[Session, Connection]) -> None:
+    bind.execute(text(f'DELETE FROM {models.REVIEWS_FTS}'))
+    bind.execute(
+        text(
+            f'INSERT INTO {models.REVIEWS_FTS}(rowid, text) '
+            'SELECT id, text FROM reviews WHERE text IS NOT NULL '
+            'UNION ALL SELECT id, text FROM reviews_archive WHERE text IS NOT NULL'
+        )
+    )
+
+
+def search_reviews(
+    session: Session,
+    query: str,
+    movie_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    after_rank: Optional[float] = None,
+    after_id: int = 0,
+    limit: int = 20,
+) -> List[schemas.ReviewSearchResult]:
+    match = match_expression(query)
+    if not match:
+        return []
+
+    # rank is bm25, lower is better; pages continue after the last (rank, id).
+    # archived reviews keep their ids and their index entries, so both tables are
+    # searched and the pages merged
+    rows = [
+        row
+        for model in (models.Review, models.ArchivedReview)
+        for row in _matches(
+            session, model, match, movie_id, user_id, after_rank, after_id, limit
+        )
+    ]
+    rows.sort(key=lambda row: (row[1], row[0].id))
+    return [
+        schemas.ReviewSearchResult(
+            **schemas.Review.from_orm(db_review).dict(), rank=rank
+        )
+        for db_review, rank in rows[:limit]
+    ]
+
+
+def _matches(
+    session: Session,
+    model: Any,
+    match: str,
+    movie_id: Optional[int],
+    user_id: Optional[int],
+    after_rank: Optional[float],
+    after_id: int,
+    limit: int,
+) -> List[Tuple[Any, float]]:
+    db_query = (
+        session.query(model, fts.c.rank)
+        .join(fts, fts.c.rowid == model.id)
+        .filter(literal_column(models.REVIEWS_FTS).op('MATCH')(match))
+        .options(joinedload(model.user), joinedload(model.movie))
+    )
+    if movie_id is not None:
+        db_query = db_query.filter(model.movie_id == movie_id)
+    if user_id is not None:
+        db_query = db_query.filter(model.user_id == user_id)
+    if after_rank is not None:
+        db_query = db_query.filter(
+            or_(
+                fts.c.rank > after_rank,
+                and_(fts.c.rank == after_rank, model.id > after_id),
+            )
+        )
+    rows: List[Tuple[Any, float]] = (
+        db_query.order_by(fts.c.rank, model.id).limit(limit).all()
+    )
+    return rows
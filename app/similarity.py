@@ -0,0 +1,194 @@
+import heapq
+from collections import defaultdict
+from math import sqrt
+from operator import itemgetter
+from typing import (
+    Any,
+    Collection,
+    DefaultDict,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from sqlalchemy import insert, select, union
+from sqlalchemy.orm import Session
+
+from app import archive, models, writer
+from app.config import settings
+
+# movie id or user id -> the other id -> rating centered on the user's mean rating
+Vectors = DefaultDict[int, Dict[int, float]]
+Neighbors = List[Tuple[int, float]]
+
+
+def mark_stale(session: Session, user_ids: Any) -> None:
+    # a review moves its author's mean rating, which all of the author's ratings are
+    # centered on, so every movie the author rated is queued, the reviewed one too
+    rated = union(
+        *(
+            select(model.movie_id).where(model.user_id.in_(user_ids))
+            for model in (models.Review, models.ArchivedReview)
+        )
+    )
+    session.execute(
+        insert(models.StaleSimilarity)
+        .prefix_with('OR IGNORE')
+        .from_select(['movie_id'], rated)
+    )
+
+
+def _rows(
+    session: Session, user_ids: Optional[Collection[int]]
+) -> Iterable[Tuple[int, int, float]]:
+    if user_ids is None:
+        reviews = archive.all_reviews()
+        yield from session.query(
+            reviews.c.user_id, reviews.c.movie_id, reviews.c.rate
+        ).yield_per(10000)
+        return
+    for model in (models.Review, models.ArchivedReview):
+        for batch in _chunks(sorted(user_ids)):
+            yield from session.query(model.user_id, model.movie_id, model.rate).filter(
+                model.user_id.in_(batch)
+            )
+
+
+def load_ratings(
+    session: Session, user_ids: Optional[Collection[int]] = None
+) -> Tuple[Vectors, Vectors]:
+    # every rating of the given users, of all users without them
+    by_user: Vectors = defaultdict(dict)
+    for user_id, movie_id, rate in _rows(session, user_ids):
+        by_user[user_id][movie_id] = rate
+
+    # adjusted cosine: centering on the user mean removes how generous a reviewer is
+    by_movie: Vectors = defaultdict(dict)
+    for user_id, ratings in by_user.items():
+        mean = sum(ratings.values()) / len(ratings)
+        for movie_id, rate in ratings.items():
+            ratings[movie_id] = rate - mean
+            by_movie[movie_id][user_id] = rate - mean
+    return by_user, by_movie
+
+
+def norms(by_movie: Vectors) -> Dict[int, float]:
+    return {
+        movie_id: sqrt(sum(value * value for value in ratings.values()))
+        for movie_id, ratings in by_movie.items()
+    }
+
+
+def neighbors(
+    movie_id: int,
+    by_user: Vectors,
+    by_movie: Vectors,
+    movie_norms: Dict[int, float],
+) -> Neighbors:
+    # only movies sharing a reviewer get a dot product, walking the sparse rows of
+    # the movie's reviewers instead of comparing against every movie
+    dots: DefaultDict[int, float] = defaultdict(float)
+    common: DefaultDict[int, int] = defaultdict(int)
+    for user_id, centered in by_movie.get(movie_id, {}).items():
+        for other_id, other_centered in by_user[user_id].items():
+            dots[other_id] += centered * other_centered
+            common[other_id] += 1
+
+    norm = movie_norms.get(movie_id, 0.0)
+    scores = (
+        (other_id, dot / (norm * movie_norms[other_id]))
+        for other_id, dot in dots.items()
+        if other_id != movie_id
+        and dot > 0
+        and common[other_id] >= settings.similar_movies_min_common
+    )
+    return heapq.nlargest(settings.similar_movies_k, scores, key=itemgetter(1))
+
+
+def _chunks(ids: Iterable[int]) -> Iterable[List[int]]:
+    batch: List[int] = []
+    for some_id in ids:
+        batch.append(some_id)
+        if len(batch) == settings.similar_movies_batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _linked(session: Session, found: str, by: str, ids: Set[int]) -> Set[int]:
+    # the users of reviews of the given movies or the movies of reviews of the
+    # given users, hot and archived
+    linked: Set[int] = set()
+    for model in (models.Review, models.ArchivedReview):
+        for batch in _chunks(sorted(ids)):
+            linked.update(
+                value
+                for value, in session.query(getattr(model, found))
+                .filter(getattr(model, by).in_(batch))
+                .distinct()
+            )
+    return linked
+
+
+def _targets(session: Session, stale: Set[int]) -> Set[int]:
+    # stale movies are the ones whose centered ratings changed; their scores with
+    # every movie sharing a rater changed too, and the lists that held one of them
+    # may have lost it with a rater
+    raters = _linked(session, 'user_id', 'movie_id', stale)
+    listing: Set[int] = set()
+    for batch in _chunks(sorted(stale)):
+        listing.update(
+            movie_id
+            for movie_id, in session.query(models.SimilarMovie.movie_id).filter(
+                models.SimilarMovie.similar_id.in_(batch)
+            )
+        )
+    return stale | listing | _linked(session, 'movie_id', 'user_id', raters)
+
+
+def _load_for(session: Session, targets: Set[int]) -> Tuple[Vectors, Vectors]:
+    # the neighbours of the targets are among the movies their raters rated, whose
+    # norms need all of their own raters' ratings; nobody else's are read
+    raters = _linked(session, 'user_id', 'movie_id', targets)
+    candidates = _linked(session, 'movie_id', 'user_id', raters)
+    return load_ratings(session, _linked(session, 'user_id', 'movie_id', candidates))
+
+
+def refresh(session: Session, full: bool = False) -> int:
+    # the queue is emptied before the ratings are read, a review written after that
+    # queues its movie again for the next run
+    with writer.exclusive():
+        stale = {
+            movie_id for movie_id, in session.query(models.StaleSimilarity.movie_id)
+        }
+        session.query(models.StaleSimilarity).delete(synchronize_session=False)
+        session.commit()
+
+    if full:
+        targets = {movie_id for movie_id, in session.query(models.Movie.id)}
+        by_user, by_movie = load_ratings(session)
+    else:
+        targets = _targets(session, stale)
+        by_user, by_movie = _load_for(session, targets)
+    movie_norms = norms(by_movie)
+    session.rollback()
+
+    # every batch is a short transaction of its own so api writes are not queued
+    # behind the whole job
+    for batch in _chunks(sorted(targets)):
+        rows = [
+            {'movie_id': movie_id, 'similar_id': similar_id, 'score': score}
+            for movie_id in batch
+            for similar_id, score in neighbors(movie_id, by_user, by_movie, movie_norms)
+        ]
+        with writer.exclusive():
+            session.query(models.SimilarMovie).filter(
+                models.SimilarMovie.movie_id.in_(batch)
+            ).delete(synchronize_session=False)
+            session.bulk_insert_mappings(models.SimilarMovie, rows)
+            session.commit()
+    return len(targets)
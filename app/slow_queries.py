@@ -0,0 +1,190 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import metrics
+from app.config import settings
+
+# pylint: disable=unused-argument,too-many-arguments,broad-except
+
+logger = logging.getLogger('app.slow_queries')
+logger.propagate = False
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+SLOW_QUERIES = metrics.registry.counter(
+    'db_slow_queries_total', 'Statements slower than the slow query threshold'
+)
+
+
+class QueryStats:
+    __slots__ = ('fingerprint', 'statement', 'caller', 'count', 'total', 'max')
+
+    def __init__(self, fingerprint: str, statement: str, caller: str) -> None:
+        self.fingerprint = fingerprint
+        self.statement = statement
+        self.caller = caller
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'fingerprint': self.fingerprint,
+            'statement': self.statement,
+            'caller': self.caller,
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 2),
+            'max_ms': round(self.max * 1000, 2),
+        }
+
+
+_lock = threading.Lock()
+_stats: Dict[str, QueryStats] = {}
+_handler: Optional[RotatingFileHandler] = None
+
+
+def normalize(statement: str) -> str:
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    statement = _PLACEHOLDER_LIST.sub('(...)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+def fingerprint(statement: str) -> str:
+    return hashlib.sha1(normalize(statement).encode('utf-8')).hexdigest()[:12]
+
+
+def summary() -> List[Dict[str, Any]]:
+    with _lock:
+        stats = [query_stats.as_dict() for query_stats in _stats.values()]
+    return sorted(stats, key=lambda query_stats: -query_stats['total_ms'])
+
+
+def reset() -> None:
+    global _handler  # pylint: disable=global-statement
+    with _lock:
+        _stats.clear()
+        if _handler is not None:
+            logger.removeHandler(_handler)
+            _handler.close()
+            _handler = None
+
+
+def _ensure_handler() -> None:
+    global _handler  # pylint: disable=global-statement
+    path = os.path.abspath(settings.slow_query_log_path)
+    if _handler is not None and _handler.baseFilename == path:
+        return
+    if _handler is not None:
+        logger.removeHandler(_handler)
+        _handler.close()
+    _handler = RotatingFileHandler(
+        path,
+        maxBytes=settings.slow_query_log_max_bytes,
+        backupCount=settings.slow_query_log_backups,
+        delay=True,
+    )
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+def _find_caller() -> str:
+    frame = sys._getframe(2)  # pylint: disable=protected-access
+    fallback = 'unknown'
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith('app.crud_'):
+            return f'{module}.{frame.f_code.co_name}'
+        if fallback == 'unknown' and module.startswith('app.') and module != __name__:
+            fallback = f'{module}.{frame.f_code.co_name}'
+        frame = frame.f_back  # type: ignore
+    return fallback
+
+
+def _explain(conn: Any, statement: str, parameters: Any) -> List[str]:
+    if conn.dialect.name != 'sqlite':
+        return []
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception as e:
+        return [f'unavailable: {e}']
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, many: bool
+) -> None:
+    conn.info.setdefault('slow_query_start', []).append(perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, many: bool
+) -> None:
+    starts = conn.info.get('slow_query_start')
+    if not starts:
+        return
+    elapsed = perf_counter() - starts.pop()
+    threshold = settings.slow_query_ms
+    if threshold <= 0 or elapsed * 1000 < threshold:
+        return
+
+    _record(conn, statement, parameters, elapsed, many)
+
+
+def _record(
+    conn: Any, statement: str, parameters: Any, elapsed: float, many: bool
+) -> None:
+    query_fingerprint = fingerprint(statement)
+    caller = _find_caller()
+    plan = [] if many else _explain(conn, statement, parameters)
+
+    with _lock:
+        query_stats = _stats.get(query_fingerprint)
+        if query_stats is None:
+            query_stats = _stats[query_fingerprint] = QueryStats(
+                query_fingerprint, normalize(statement), caller
+            )
+        query_stats.count += 1
+        query_stats.total += elapsed
+        query_stats.max = max(query_stats.max, elapsed)
+        _ensure_handler()
+
+    SLOW_QUERIES.inc()
+    logger.info(
+        json.dumps(
+            {
+                'time': datetime.now().isoformat(),
+                'duration_ms': round(elapsed * 1000, 2),
+                'fingerprint': query_fingerprint,
+                'caller': caller,
+                'statement': statement,
+                'parameters': parameters,
+                'plan': plan,
+            },
+            default=str,
+        )
+    )
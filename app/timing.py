@@ -0,0 +1,196 @@
+import asyncio
+import functools
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Callable, Coroutine, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import metrics
+from app.config import settings
+from app.negotiation import NegotiatedRoute
+
+# pylint: disable=unused-argument,too-many-arguments
+
+access_logger = logging.getLogger('app.access')
+
+
+class RequestTimings:
+    __slots__ = ('start', 'phases', 'db_queries', 'route', 'endpoint_done')
+
+    def __init__(self) -> None:
+        self.start = perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.db_queries = 0
+        self.route: Optional[str] = None
+        self.endpoint_done: Optional[float] = None
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        metrics = [
+            f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.phases.items()
+        ]
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    'request_timings', default=None
+)
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def set_enabled(enabled: bool) -> None:
+    settings.server_timing = enabled
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, many: bool
+) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault('timing_query_start', []).append(perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, many: bool
+) -> None:
+    timings = _current.get()
+    starts = conn.info.get('timing_query_start')
+    if timings is None or not starts:
+        return
+
+    timings.add('db', perf_counter() - starts.pop())
+    timings.db_queries += 1
+
+
+def _mark_endpoint_done(call: Callable[..., Any]) -> Callable[..., Any]:
+    def mark() -> None:
+        timings = _current.get()
+        if timings is not None:
+            timings.endpoint_done = perf_counter()
+
+    if asyncio.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            result = await call(*args, **kwargs)
+            mark()
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(call)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        result = call(*args, **kwargs)
+        mark()
+        return result
+
+    return wrapper
+
+
+class TimedRoute(NegotiatedRoute):
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        assert self.dependant.call is not None
+        self.dependant.call = _mark_endpoint_done(self.dependant.call)
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def timed_handler(request: Request) -> Response:
+            timings = _current.get()
+            if timings is None:
+                return await handler(request)
+
+            timings.route = route
+            response = await handler(request)
+            if timings.endpoint_done is not None:
+                timings.add('serialize', perf_counter() - timings.endpoint_done)
+            return response
+
+        return timed_handler
+
+
+class TimingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not (settings.server_timing or settings.metrics):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        server_timing = settings.server_timing
+        status_code = 500
+
+        async def send_with_timings(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        'Server-Timing',
+                        timings.server_timing(perf_counter() - timings.start),
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _current.reset(token)
+            if server_timing:
+                _log_access(scope, status_code, timings)
+            if settings.metrics:
+                metrics.observe_request(
+                    method=scope['method'],
+                    route=timings.route or 'unmatched',
+                    status=status_code,
+                    duration=perf_counter() - timings.start,
+                    db_statements=timings.db_queries,
+                    db_seconds=timings.phases.get('db', 0.0),
+                )
+
+
+def _log_access(scope: Scope, status_code: int, timings: RequestTimings) -> None:
+    record = {
+        'method': scope['method'],
+        'path': scope['path'],
+        'route': timings.route,
+        'status': status_code,
+        'duration_ms': round((perf_counter() - timings.start) * 1000, 2),
+        'db_queries': timings.db_queries,
+        'phases_ms': {
+            name: round(seconds * 1000, 2) for name, seconds in timings.phases.items()
+        },
+    }
+    access_logger.info(json.dumps(record))
@@ -1,6 +1,14 @@
+from time import perf_counter
+
 import bcrypt
 
+from app import metrics
+
 
 def make_password_hash(password: str) -> str:
     salt = b'$2b$12$yJR/5VAr5eKdxOdnbQLWiu'
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    start = perf_counter()
+    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    metrics.PASSWORD_HASHES.inc()
+    metrics.PASSWORD_HASH_SECONDS.inc(amount=perf_counter() - start)
+    return hashed_password
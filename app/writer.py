@@ -0,0 +1,91 @@
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from time import monotonic, sleep
+from typing import Dict, Iterator, Optional
+
+from app import metrics
+from app.config import settings
+
+WRITER_WAIT_SECONDS = metrics.registry.counter(
+    'db_writer_wait_seconds_total', 'Time spent queueing for the single writer'
+)
+WRITER_WAITING = metrics.registry.gauge(
+    'db_writer_waiting', 'Write transactions queued for the single writer'
+)
+WRITER_TIMEOUTS = metrics.registry.counter(
+    'db_writer_timeouts_total', 'Write transactions rejected after queueing too long'
+)
+
+
+class WriterBusy(Exception):
+    pass
+
+
+class WriterLock:
+    # threads of one worker queue on the mutex, worker processes of one host
+    # queue on an flock of the same file, so at most one write transaction runs
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._mutex = threading.Lock()
+        self._fd: Optional[int] = None
+
+    def acquire(self, timeout: float) -> None:
+        deadline = monotonic() + timeout
+        if not self._mutex.acquire(timeout=timeout):
+            raise WriterBusy
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if monotonic() >= deadline:
+                        os.close(fd)
+                        raise WriterBusy from None
+                    sleep(0.001)
+            self._fd = fd
+        except BaseException:
+            self._mutex.release()
+            raise
+
+    def release(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self._mutex.release()
+
+
+_locks: Dict[str, WriterLock] = {}
+_locks_guard = threading.Lock()
+
+
+def get_lock(path: str) -> WriterLock:
+    path = os.path.abspath(path)
+    with _locks_guard:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = WriterLock(path)
+        return lock
+
+
+@contextmanager
+def exclusive() -> Iterator[None]:
+    lock = get_lock(settings.writer_lock_path)
+    start = monotonic()
+    WRITER_WAITING.inc()
+    try:
+        lock.acquire(settings.writer_timeout)
+    except WriterBusy:
+        WRITER_TIMEOUTS.inc()
+        raise
+    finally:
+        WRITER_WAITING.dec()
+        WRITER_WAIT_SECONDS.inc(amount=monotonic() - start)
+    try:
+        yield
+    finally:
+        lock.release()
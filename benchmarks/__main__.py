@@ -0,0 +1,92 @@
+import argparse
+import json
+from pathlib import Path
+from time import perf_counter
+from typing import List, Optional
+
+from sqlalchemy import create_engine
+
+from . import formats, generator, load, micro, results, similarity, startup
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('--db', default='bench.db', help='sqlite file to benchmark')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    defaults = generator.DatasetSpec()
+    generate = commands.add_parser('generate', help='build a synthetic dataset')
+    generate.add_argument('--users', type=int, default=defaults.users)
+    generate.add_argument('--movies', type=int, default=defaults.movies)
+    generate.add_argument('--reviews', type=int, default=defaults.reviews)
+    generate.add_argument('--seed', type=int, default=defaults.seed)
+
+    micro_parser = commands.add_parser('micro', help='time each crud function')
+    micro_parser.add_argument('--iterations', type=int, default=200)
+    micro_parser.add_argument('--filter', default='', help='only run matching cases')
+    micro_parser.add_argument('--output', type=Path)
+
+    load_parser = commands.add_parser('load', help='drive the http api in process')
+    load_parser.add_argument('--requests', type=int, default=200)
+    load_parser.add_argument('--concurrency', type=int, default=4)
+    load_parser.add_argument('--output', type=Path)
+
+    formats_parser = commands.add_parser(
+        'formats', help='compare json and msgpack response size and encode time'
+    )
+    formats_parser.add_argument('--iterations', type=int, default=200)
+    formats_parser.add_argument('--output', type=Path)
+
+    startup_parser = commands.add_parser(
+        'startup', help='time app import and first request in a fresh process'
+    )
+    startup_parser.add_argument('--runs', type=int, default=5)
+    startup_parser.add_argument('--output', type=Path)
+
+    similarity_parser = commands.add_parser(
+        'similarity', help='time full and incremental similar movies refreshes'
+    )
+    similarity_parser.add_argument('--output', type=Path)
+
+    compare = commands.add_parser('compare', help='compare two result files')
+    compare.add_argument('baseline', type=Path)
+    compare.add_argument('candidate', type=Path)
+    compare.add_argument('--metric', default='p50_ms')
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    engine = create_engine(
+        f'sqlite:///{args.db}', connect_args={'check_same_thread': False}
+    )
+
+    if args.command == 'generate':
+        spec = generator.DatasetSpec(
+            users=args.users, movies=args.movies, reviews=args.reviews, seed=args.seed
+        )
+        start = perf_counter()
+        counts = generator.generate(engine, spec)
+        print(json.dumps(counts), f'in {perf_counter() - start:.1f}s')
+    elif args.command == 'micro':
+        output = micro.run(engine, iterations=args.iterations, pattern=args.filter)
+        print(results.save('micro', output, args.output))
+    elif args.command == 'load':
+        output = load.run(engine, requests=args.requests, concurrency=args.concurrency)
+        print(results.save('load', output, args.output))
+    elif args.command == 'formats':
+        output = formats.run(engine, iterations=args.iterations)
+        print(results.save('formats', output, args.output))
+    elif args.command == 'startup':
+        output = startup.run(runs=args.runs)
+        print(results.save('startup', output, args.output))
+    elif args.command == 'similarity':
+        output = similarity.run(engine)
+        print(results.save('similarity', output, args.output))
+    else:
+        print('\n'.join(results.compare(args.baseline, args.candidate, args.metric)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import json
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from starlette.responses import JSONResponse
+
+from app import compression, crud_movies, negotiation, schemas
+from app.config import settings
+
+from .generator import hot_ids
+from .results import summarize
+
+PAGE = 100
+
+
+def payloads(engine: Engine) -> Dict[str, Any]:
+    # the content fastapi hands to the response class: validated, json compatible
+    ids = hot_ids(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        movies = crud_movies.get_movies(session=session, limit=PAGE)
+        reviews = crud_movies.get_reviews(
+            session=session, movie_id=ids['movie_id'], limit=PAGE
+        )
+        return {
+            'movies': jsonable_encoder(
+                [schemas.Movie.from_orm(movie) for movie in movies]
+            ),
+            'reviews': jsonable_encoder(
+                {'reviews': [schemas.Review.from_orm(review) for review in reviews]}
+            ),
+        }
+    finally:
+        session.close()
+
+
+def _time(call: Callable[[], Any], iterations: int) -> List[float]:
+    latencies = []
+    for _ in range(iterations):
+        start = perf_counter()
+        call()
+        latencies.append(perf_counter() - start)
+    return latencies
+
+
+def run(engine: Engine, iterations: int = 200) -> Dict[str, Any]:
+    formats: Dict[str, Any] = {
+        'json': (lambda content: JSONResponse(content).body, json.loads)
+    }
+    if negotiation.msgpack is not None:
+        formats['msgpack'] = (
+            lambda content: negotiation.MsgpackResponse(content).body,
+            negotiation.msgpack.unpackb,
+        )
+
+    results: Dict[str, Dict[str, float]] = {}
+    for payload, content in payloads(engine).items():
+        for name, (encode, decode) in formats.items():
+            body = encode(content)
+            results[f'{payload}[{name}].encode'] = dict(
+                summarize(_time(lambda: encode(content), iterations)),
+                bytes=len(body),
+            )
+            results[f'{payload}[{name}].decode'] = dict(
+                summarize(_time(lambda: decode(body), iterations)),
+                bytes=len(body),
+            )
+        # the configured levels, to tune MOVIES_COMPRESSION_LEVELS against
+        body = JSONResponse(content).body
+        for encoding, compress in compression.compressors().items():
+            level = settings.compression_levels.get(encoding, 0)
+            if level <= 0:
+                continue
+            results[f'{payload}[json+{encoding}].encode'] = dict(
+                summarize(_time(lambda: compress(body, level), iterations)),
+                bytes=len(compress(body, level)),
+            )
+
+    return {'page': PAGE, 'iterations': iterations, 'cases': results}
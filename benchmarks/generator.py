@@ -0,0 +1,181 @@
+import itertools
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app import models, search
+from app.database import DeclarativeBase
+from app.utils import make_password_hash
+
+BENCH_PASSWORD = 'password'
+CHUNK_SIZE = 10_000
+
+_ADJECTIVES = ('Dark', 'Silent', 'Last', 'Golden', 'Broken', 'Hidden', 'Lost', 'Red')
+_NOUNS = ('River', 'Empire', 'Night', 'Garden', 'Storm', 'City', 'Dream', 'Road')
+_REVIEW_TEXTS = (
+    'great acting and a strong script',
+    'too long, but the ending pays off',
+    'boring from start to finish',
+    'would happily watch it again',
+    'beautiful photography, thin story',
+    'the soundtrack carries the whole film',
+)
+_START = datetime(2020, 1, 1)
+_PERIOD_SECONDS = 2 * 365 * 24 * 3600
+
+
+class DatasetSpec(NamedTuple):
+    users: int = 1_000
+    movies: int = 500
+    reviews: int = 20_000
+    seed: int = 42
+    # zipf exponents: higher values concentrate reviews on fewer movies/users
+    movie_skew: float = 1.1
+    reviewer_skew: float = 1.2
+
+
+def _zipf_cum_weights(size: int, exponent: float) -> List[float]:
+    return list(
+        itertools.accumulate(1.0 / (rank**exponent) for rank in range(1, size + 1))
+    )
+
+
+Row = Tuple[Any, ...]
+
+
+def _chunks(rows: Iterable[Row]) -> Iterator[List[Row]]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, CHUNK_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _users(spec: DatasetSpec) -> Iterator[Row]:
+    # bcrypt is far too slow to run per row, every generated user shares one password
+    hashed_password = make_password_hash(BENCH_PASSWORD)
+    for user_id in range(1, spec.users + 1):
+        yield user_id, f'user{user_id}', hashed_password
+
+
+def _movies(spec: DatasetSpec, rng: random.Random) -> Iterator[Row]:
+    for movie_id in range(1, spec.movies + 1):
+        title = f'{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} {movie_id}'
+        yield movie_id, title, f'description of {title}', rng.randint(1950, 2021), 0.0
+
+
+def _reviews(
+    spec: DatasetSpec, rng: random.Random, rate_sums: List[int], rate_counts: List[int]
+) -> Iterator[Row]:
+    max_reviews = spec.users * spec.movies // 2
+    if spec.reviews > max_reviews:
+        raise ValueError(
+            f'at most {max_reviews} reviews fit {spec.users}x{spec.movies}'
+        )
+
+    movie_ids = list(range(1, spec.movies + 1))
+    user_ids = list(range(1, spec.users + 1))
+    # popularity rank is independent from id, blockbusters are spread over the table
+    rng.shuffle(movie_ids)
+    rng.shuffle(user_ids)
+    movie_weights = _zipf_cum_weights(spec.movies, spec.movie_skew)
+    user_weights = _zipf_cum_weights(spec.users, spec.reviewer_skew)
+    quality = [rng.gauss(6.5, 1.5) for _ in range(spec.movies + 1)]
+
+    seen = set()
+    review_id = 0
+    while review_id < spec.reviews:
+        batch = min(CHUNK_SIZE, spec.reviews - review_id)
+        movies = rng.choices(movie_ids, cum_weights=movie_weights, k=batch)
+        users = rng.choices(user_ids, cum_weights=user_weights, k=batch)
+        for movie_id, user_id in zip(movies, users):
+            key = user_id * (spec.movies + 1) + movie_id
+            if key in seen:
+                continue
+            seen.add(key)
+            review_id += 1
+            rate = min(10, max(1, round(rng.gauss(quality[movie_id], 1.8))))
+            rate_sums[movie_id] += rate
+            rate_counts[movie_id] += 1
+            created = _START + timedelta(seconds=rng.randrange(_PERIOD_SECONDS))
+            yield (
+                review_id,
+                rate,
+                rng.choice(_REVIEW_TEXTS) if rng.random() < 0.4 else None,
+                # the storage format sqlalchemy uses for sqlite DATETIME columns
+                created.isoformat(' ', 'microseconds'),
+                user_id,
+                movie_id,
+            )
+            if review_id == spec.reviews:
+                return
+
+
+def _insert(conn: Connection, table: Any, rows: Iterable[Row]) -> int:
+    # plain executemany skips the per-row parameter processing of table.insert()
+    columns: Sequence[str] = [column.name for column in table.columns]
+    statement = (
+        f'INSERT INTO {table.name} ({", ".join(columns)}) '
+        f'VALUES ({", ".join("?" for _ in columns)})'
+    )
+    count = 0
+    for chunk in _chunks(rows):
+        conn.exec_driver_sql(statement, chunk)
+        count += len(chunk)
+    return count
+
+
+def generate(engine: Engine, spec: DatasetSpec = DatasetSpec()) -> Dict[str, int]:
+    rng = random.Random(spec.seed)
+    rate_sums = [0] * (spec.movies + 1)
+    rate_counts = [0] * (spec.movies + 1)
+    DeclarativeBase.metadata.drop_all(bind=engine)
+    DeclarativeBase.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        if engine.dialect.name == 'sqlite':
+            conn.exec_driver_sql('PRAGMA synchronous = OFF')
+        counts = {
+            'users': _insert(conn, models.User.__table__, _users(spec)),
+            'movies': _insert(conn, models.Movie.__table__, _movies(spec, rng)),
+            'reviews': _insert(
+                conn,
+                models.Review.__table__,
+                _reviews(spec, rng, rate_sums, rate_counts),
+            ),
+        }
+        conn.exec_driver_sql(
+            'UPDATE movies SET avg_rating = ? WHERE id = ?',
+            [
+                (rate_sums[movie_id] / count, movie_id)
+                for movie_id, count in enumerate(rate_counts)
+                if count
+            ],
+        )
+        if engine.dialect.name == 'sqlite':
+            search.rebuild(conn)
+    return counts
+
+
+def hot_ids(engine: Engine) -> Dict[str, int]:
+    with engine.connect() as conn:
+        movie_id = conn.execute(
+            text(
+                'SELECT movie_id FROM reviews GROUP BY movie_id '
+                'ORDER BY COUNT(*) DESC LIMIT 1'
+            )
+        ).scalar()
+        user_id = conn.execute(
+            text(
+                'SELECT user_id FROM reviews GROUP BY user_id '
+                'ORDER BY COUNT(*) DESC LIMIT 1'
+            )
+        ).scalar()
+        release_year = conn.execute(
+            text('SELECT release_year FROM movies WHERE id = :id'), {'id': movie_id}
+        ).scalar()
+    return {'movie_id': movie_id, 'user_id': user_id, 'release_year': release_year}
@@ -0,0 +1,123 @@
+import threading
+from collections import defaultdict
+from time import perf_counter
+from typing import Any, Dict, Generator, List, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api import app
+from app.dependencies import get_session
+
+from .generator import BENCH_PASSWORD, hot_ids
+from .results import summarize
+
+
+def endpoints(ids: Dict[str, int]) -> List[Tuple[str, str]]:
+    movie_id, user_id = ids['movie_id'], ids['user_id']
+    return [
+        ('GET /movies', '/movies'),
+        ('GET /movies?filter_str', '/movies?filter_str=Storm'),
+        (
+            'GET /movies?release_year&sort_by_avg_rating',
+            f'/movies?release_year={ids["release_year"]}&sort_by_avg_rating=true',
+        ),
+        ('GET /movies/{id}/reviews', f'/movies/{movie_id}/reviews?after_id=0&limit=20'),
+        (
+            'GET /movies/{id}/reviews?stats',
+            f'/movies/{movie_id}/reviews?avg_rating=true&no_ratings=true&no_reviews=true',
+        ),
+        ('GET /reviews/search', '/reviews/search?q=story'),
+        ('GET /users', '/users'),
+        ('GET /users/{id}/reviews', f'/users/{user_id}/reviews'),
+        (
+            'GET /users/{id}/reviews/movies/{movie_id}',
+            f'/users/{user_id}/reviews/movies/{movie_id}',
+        ),
+    ]
+
+
+def _session_dependency(engine: Engine) -> Any:
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_session() -> Generator[Session, None, None]:
+        session = session_factory()
+        try:
+            yield session
+            session.commit()
+        finally:
+            session.close()
+
+    return override_get_session
+
+
+def _worker(
+    targets: List[Tuple[str, str]],
+    requests: int,
+    offset: int,
+    latencies: Dict[str, List[float]],
+    errors: Dict[str, int],
+    lock: threading.Lock,
+) -> None:
+    client = TestClient(app)
+    client.auth = ('user1', BENCH_PASSWORD)
+    local: Dict[str, List[float]] = defaultdict(list)
+    local_errors: Dict[str, int] = defaultdict(int)
+    for i in range(requests):
+        name, url = targets[(i + offset) % len(targets)]
+        start = perf_counter()
+        response = client.get(url)
+        local[name].append(perf_counter() - start)
+        if response.status_code >= 400:
+            local_errors[name] += 1
+    with lock:
+        for name, values in local.items():
+            latencies[name].extend(values)
+        for name, count in local_errors.items():
+            errors[name] += count
+
+
+def run(engine: Engine, requests: int = 200, concurrency: int = 4) -> Dict[str, Any]:
+    ids = hot_ids(engine)
+    targets = endpoints(ids)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+
+    previous_override = app.dependency_overrides.get(get_session)
+    app.dependency_overrides[get_session] = _session_dependency(engine)
+    try:
+        threads = [
+            threading.Thread(
+                target=_worker,
+                args=(targets, requests, offset, latencies, errors, lock),
+            )
+            for offset in range(concurrency)
+        ]
+        start = perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = perf_counter() - start
+    finally:
+        if previous_override is None:
+            app.dependency_overrides.pop(get_session, None)
+        else:
+            app.dependency_overrides[get_session] = previous_override
+
+    cases = {}
+    for name, values in latencies.items():
+        cases[name] = summarize(values)
+        cases[name]['errors'] = errors[name]
+        cases[name]['throughput_rps'] = round(len(values) / elapsed, 2)
+
+    return {
+        'ids': ids,
+        'concurrency': concurrency,
+        'requests_per_worker': requests,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(concurrency * requests / elapsed, 2),
+        'cases': cases,
+    }
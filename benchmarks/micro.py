@@ -0,0 +1,152 @@
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import crud_movies, crud_users, models, ratings, schemas
+
+from .generator import hot_ids
+from .results import summarize
+
+Case = Callable[[Session, Dict[str, int]], Any]
+
+NEW_REVIEW = schemas.ReviewCreate(rate=7, text='benchmark review text')
+
+
+def _create_review(session: Session, ids: Dict[str, int]) -> Any:
+    # the newest user has the fewest reviews, so a free (user, movie) pair is likely
+    user = session.query(models.User).order_by(models.User.id.desc()).first()
+    movie = (
+        session.query(models.Movie)
+        .filter(~models.Movie.reviews.any(models.Review.user_id == user.id))
+        .first()
+    )
+    return crud_movies.create_review(
+        session=session,
+        current_user=schemas.User.from_orm(user),
+        db_movie=movie,
+        review=NEW_REVIEW,
+    )
+
+
+def _update_review(session: Session, ids: Dict[str, int]) -> Any:
+    db_review = session.query(models.Review).filter_by(movie_id=ids['movie_id']).first()
+    return crud_movies.update_review(
+        db_review=db_review, new_review=NEW_REVIEW, session=session
+    )
+
+
+def _delete_review(session: Session, ids: Dict[str, int]) -> Any:
+    db_review = session.query(models.Review).filter_by(movie_id=ids['movie_id']).first()
+    return crud_movies.delete_review(
+        movie_id=db_review.movie_id, user_id=db_review.user_id, session=session
+    )
+
+
+READ_CASES: Dict[str, Case] = {
+    'crud_movies.get_movie_by_id': lambda s, ids: crud_movies.get_movie_by_id(
+        session=s, movie_id=ids['movie_id']
+    ),
+    'crud_movies.get_movie_snapshot[hot]': lambda s, ids: crud_movies.get_movie_snapshot(
+        session=s, movie_id=ids['movie_id']
+    ),
+    'crud_movies.get_movie_by_title': lambda s, ids: crud_movies.get_movie_by_title(
+        session=s, title='Dark River 1'
+    ),
+    'crud_movies.get_movies': lambda s, ids: crud_movies.get_movies(session=s),
+    'crud_movies.get_movies[filter_str]': lambda s, ids: crud_movies.get_movies(
+        session=s, filter_str='Storm'
+    ),
+    'crud_movies.get_movies[year,sorted]': lambda s, ids: crud_movies.get_movies(
+        session=s, release_year=ids['release_year'], sort_by_avg_rating=True
+    ),
+    'crud_movies.get_reviews[hot]': lambda s, ids: crud_movies.get_reviews(
+        session=s, movie_id=ids['movie_id']
+    ),
+    'ratings.calc_avg_rating[hot]': lambda s, ids: ratings.calc_avg_rating(
+        session=s, movie_id=ids['movie_id']
+    ),
+    'ratings.calc_no_ratings[hot]': lambda s, ids: ratings.calc_no_ratings(
+        session=s, movie_id=ids['movie_id']
+    ),
+    'ratings.calc_no_reviews[hot]': lambda s, ids: ratings.calc_no_reviews(
+        session=s, movie_id=ids['movie_id']
+    ),
+    'crud_movies.get_review_by_movie_and_user_ids': (
+        lambda s, ids: crud_movies.get_review_by_movie_and_user_ids(
+            movie_id=ids['movie_id'], user_id=ids['user_id'], session=s
+        )
+    ),
+    'crud_users.get_user_by_id': lambda s, ids: crud_users.get_user_by_id(
+        session=s, user_id=ids['user_id']
+    ),
+    'crud_users.get_user_by_username': lambda s, ids: crud_users.get_user_by_username(
+        session=s, username='user1'
+    ),
+    'crud_users.get_all_users': lambda s, ids: crud_users.get_all_users(session=s),
+    'crud_users.get_user_reviews[power]': lambda s, ids: crud_users.get_user_reviews(
+        user_id=ids['user_id'], session=s
+    ),
+    'crud_users.get_user_review_on_movie': (
+        lambda s, ids: crud_users.get_user_review_on_movie(
+            user_id=ids['user_id'], movie_id=ids['movie_id'], session=s
+        )
+    ),
+}
+
+# write cases run inside a transaction that is rolled back after every call,
+# their timings include loading the rows the crud function operates on
+WRITE_CASES: Dict[str, Case] = {
+    'crud_movies.create_movie': lambda s, ids: crud_movies.create_movie(
+        session=s,
+        movie=schemas.MovieCreate(
+            title='benchmark movie', description=None, release_year=2000
+        ),
+    ),
+    'crud_movies.create_review': _create_review,
+    'crud_movies.update_review[hot]': _update_review,
+    'crud_movies.delete_review[hot]': _delete_review,
+    'crud_movies.delete_movie[hot]': lambda s, ids: crud_movies.delete_movie(
+        movie_id=ids['movie_id'], session=s
+    ),
+    # the route hashes the password before the write, the case times the insert
+    'crud_users.create_user': lambda s, ids: crud_users.create_user(
+        session=s,
+        user=schemas.UserCreate(username='benchmark user', password='password'),
+        hashed_password='x' * 60,
+    ),
+}
+
+
+def _time_case(
+    session_factory: sessionmaker, case: Case, ids: Dict[str, int], iterations: int
+) -> List[float]:
+    latencies = []
+    for _ in range(iterations):
+        session = session_factory()
+        try:
+            start = perf_counter()
+            case(session, ids)
+            latencies.append(perf_counter() - start)
+        finally:
+            session.rollback()
+            session.close()
+    return latencies
+
+
+def run(
+    engine: Engine, iterations: int = 200, warmup: int = 5, pattern: str = ''
+) -> Dict[str, Any]:
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    ids = hot_ids(engine)
+    cases: List[Tuple[str, Case]] = list(READ_CASES.items()) + list(WRITE_CASES.items())
+
+    results = {}
+    for name, case in cases:
+        if pattern not in name:
+            continue
+        _time_case(session_factory, case, ids, warmup)
+        results[name] = summarize(_time_case(session_factory, case, ids, iterations))
+
+    return {'ids': ids, 'iterations': iterations, 'cases': results}
@@ -0,0 +1,66 @@
+import json
+import platform
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies: Sequence[float]) -> Dict[str, float]:
+    return {
+        'count': len(latencies),
+        'mean_ms': (
+            round(sum(latencies) / len(latencies) * 1000, 4) if latencies else 0.0
+        ),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 4),
+        'max_ms': round(max(latencies, default=0.0) * 1000, 4),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save(kind: str, results: Dict[str, Any], path: Optional[Path] = None) -> Path:
+    revision = git_revision()
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f'{revision}-{kind}.json'
+    document = {
+        'kind': kind,
+        'revision': revision,
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'results': results,
+    }
+    path.write_text(json.dumps(document, indent=2, sort_keys=True))
+    return path
+
+
+def compare(baseline: Path, candidate: Path, metric: str = 'p50_ms') -> List[str]:
+    old = json.loads(baseline.read_text())['results']['cases']
+    new = json.loads(candidate.read_text())['results']['cases']
+    lines = [f'{"case":<45} {"baseline":>12} {"candidate":>12} {"change":>8}']
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name][metric], new[name][metric]
+        change = f'{(after - before) / before * 100:+.1f}%' if before else 'n/a'
+        lines.append(f'{name:<45} {before:>12.3f} {after:>12.3f} {change:>8}')
+    return lines
@@ -0,0 +1,53 @@
+import tracemalloc
+from time import perf_counter
+from typing import Any, Callable, Dict, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import similarity
+
+from .generator import hot_ids
+from .results import summarize
+
+
+def _timed(call: Callable[[], Any]) -> Tuple[Any, Dict[str, float]]:
+    start = perf_counter()
+    result = call()
+    return result, summarize([perf_counter() - start])
+
+
+def _ratings_memory(session: Session) -> Dict[str, Any]:
+    # a full run holds every rating twice, by user and by movie, in python dicts
+    tracemalloc.start()
+    try:
+        by_user, _ = similarity.load_ratings(session)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        session.rollback()
+    ratings = sum(len(row) for row in by_user.values())
+    return {
+        'ratings': ratings,
+        'peak_bytes': peak,
+        'bytes_per_rating': round(peak / max(ratings, 1), 1),
+    }
+
+
+def run(engine: Engine) -> Dict[str, Any]:
+    # writes the similar movies of the dataset, every run recomputes all of them
+    ids = hot_ids(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        results: Dict[str, Any] = {'load_ratings.memory': _ratings_memory(session)}
+        movies, timings = _timed(lambda: similarity.refresh(session, full=True))
+        results['refresh[full]'] = dict(timings, movies=movies)
+
+        # the most active user reviews again, queueing every movie they rated
+        similarity.mark_stale(session, [ids['user_id']])
+        session.commit()
+        movies, timings = _timed(lambda: similarity.refresh(session))
+        results['refresh[power user]'] = dict(timings, movies=movies)
+        return results
+    finally:
+        session.close()
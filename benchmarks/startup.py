@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .results import summarize
+
+# runs in a fresh interpreter so import caches of the benchmark process do not count
+_PROBE = '''
+import json, sys
+from time import perf_counter
+
+start = perf_counter()
+from app.api import app
+imported = perf_counter()
+
+from fastapi.testclient import TestClient
+from app.database import init_db
+
+init_db()
+with TestClient(app) as client:
+    started = perf_counter()
+    client.post('/users', json={'username': 'startup', 'password': 'password'})
+    client.auth = ('startup', 'password')
+    first = perf_counter()
+    client.get('/movies')
+    done = perf_counter()
+
+print(json.dumps({
+    'import': imported - start,
+    'first_request': done - first,
+    'flask_imported': 'flask' in sys.modules,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def _probe(database: Path) -> Dict[str, Any]:
+    env = dict(os.environ, MOVIES_DATABASE_URL=f'sqlite:///{database}')
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+        cwd=Path(__file__).parent.parent,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def run(runs: int = 5) -> Dict[str, Any]:
+    samples: List[Dict[str, Any]] = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as directory:
+            samples.append(_probe(Path(directory) / 'startup.db'))
+
+    return {
+        'runs': runs,
+        'flask_imported': any(sample['flask_imported'] for sample in samples),
+        'modules': samples[-1]['modules'],
+        'cases': {
+            'import app.api': summarize([sample['import'] for sample in samples]),
+            'first GET /movies': summarize(
+                [sample['first_request'] for sample in samples]
+            ),
+        },
+    }
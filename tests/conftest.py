@@ -1,3 +1,4 @@
+import base64
 import os
 from datetime import datetime
 from typing import Generator
@@ -7,10 +8,10 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
-from app import models
+from app import invalidation, models, writer
 from app.api import app as fastapi_app
 from app.database import DeclarativeBase
-from app.dependencies import get_session
+from app.dependencies import get_session, get_write_session
 from app.utils import make_password_hash
 
 # pylint: disable=unused-argument
@@ -34,13 +35,58 @@ def override_get_session() -> Generator[Session, None, None]:
         session.close()
 
 
+def override_get_write_session() -> Generator[Session, None, None]:
+    with writer.exclusive():
+        yield from override_get_session()
+
+
 fastapi_app.dependency_overrides[get_session] = override_get_session
+fastapi_app.dependency_overrides[get_write_session] = override_get_write_session
+
+
+def basic_auth(username, password):
+    credentials = base64.b64encode(f'{username}:{password}'.encode())
+    return b'Basic ' + credentials
+
+
+def http_scope(path, query='', headers=(), client=('testclient', 50000)):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': query.encode(),
+        'headers': [(b'host', b'testserver'), *headers],
+        'client': client,
+        'server': ('testserver', 80),
+    }
+
+
+# a GET straight through the asgi app, unlike TestClient requests several of them
+# run concurrently on one event loop; returns the messages the app sent
+async def call(app, path, query='', authorization=b'', client=('testclient', 50000)):
+    scope = http_scope(path, query, [(b'authorization', authorization)], client)
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages
 
 
 @pytest.fixture(name='app')
 def _app():
     try:
         DeclarativeBase.metadata.create_all(bind=engine)
+        invalidation.reset_state()
         yield fastapi_app
     except Exception as e:
         raise e
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+
+from app import admission, metrics
+from app.config import settings
+
+from .conftest import basic_auth, call
+
+# pylint: disable=unused-argument
+
+
+@pytest.fixture(name='limits')
+def _limits(monkeypatch):
+    def configure(route_class, limit, queue, timeout=1.0):
+        monkeypatch.setitem(settings.admission_limits, route_class, limit)
+        monkeypatch.setitem(settings.admission_queues, route_class, queue)
+        monkeypatch.setattr(settings, 'admission_timeout', timeout)
+        return admission.limiters[route_class]
+
+    return configure
+
+
+def test_full_queue_is_rejected(limits):
+    limiter = limits('search', 1, 0)
+
+    async def main():
+        await limiter.acquire_async()
+        with pytest.raises(admission.Overloaded):
+            await limiter.acquire_async()
+        limiter.release()
+
+    asyncio.run(main())
+
+    assert limiter.active == 0
+    assert admission.ADMISSION_REJECTED.get('search', 'queue_full') >= 1
+
+
+def test_queued_requests_take_freed_slots_in_order(limits):
+    limiter = limits('search', 1, 2)
+    order = []
+
+    async def request(name):
+        async with admission.admitted('search'):
+            order.append(name)
+
+    async def main():
+        await limiter.acquire_async()
+        requests = []
+        for name in ('first', 'second'):
+            requests.append(asyncio.ensure_future(request(name)))
+            await asyncio.sleep(0)
+        assert admission.ADMISSION_QUEUED.get('search') == 2
+        limiter.release()
+        await asyncio.gather(*requests)
+
+    asyncio.run(main())
+
+    assert order == ['first', 'second']
+    assert limiter.active == 0
+    assert admission.ADMISSION_QUEUED.get('search') == 0
+
+
+def test_queue_timeout(limits):
+    limiter = limits('search', 1, 1, timeout=0.01)
+
+    async def main():
+        await limiter.acquire_async()
+        with pytest.raises(admission.Overloaded):
+            await limiter.acquire_async()
+        limiter.release()
+
+    asyncio.run(main())
+
+    assert limiter.active == 0
+    assert admission.ADMISSION_REJECTED.get('search', 'timeout') >= 1
+
+
+def test_cancelled_waiter_gives_up_its_place(limits):
+    limiter = limits('search', 1, 1)
+
+    async def main():
+        await limiter.acquire_async()
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+
+    asyncio.run(main())
+
+    assert limiter.active == 0
+    assert not limiter._waiters  # pylint: disable=protected-access
+
+
+def test_overloaded_route_sheds_with_503(limits, auth_client, db_movies):
+    limiter = limits('search', 1, 0)
+    asyncio.run(limiter.acquire_async())
+    try:
+        shed = auth_client.get('/movies', params={'filter_str': 'title'})
+        cheap = auth_client.get('/movies')
+    finally:
+        limiter.release()
+
+    assert shed.status_code == 503
+    assert shed.headers['Retry-After'] == '1'
+    assert cheap.status_code == 200
+    assert 'admission_queued{route_class="search"} 0' in metrics.registry.render()
+    assert auth_client.get('/movies', params={'filter_str': 'title'}).status_code == 200
+
+
+def test_per_user_rate_limit(auth_client, auth_user1, db_movies, monkeypatch):
+    monkeypatch.setattr(settings, 'rate_limit_per_second', 0.5)
+    monkeypatch.setattr(settings, 'rate_limit_burst', 2)
+    # no refill between the requests however long authentication takes
+    monkeypatch.setattr(admission, 'monotonic', lambda: 100.0)
+    hashes = metrics.PASSWORD_HASHES.get()
+    try:
+        responses = [auth_client.get('/movies/top') for _ in range(3)]
+        hashed = metrics.PASSWORD_HASHES.get() - hashes
+        other_user = auth_user1.get('/movies/top')
+    finally:
+        admission.login_buckets.clear()
+        admission.user_buckets.clear()
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    # the request over the limit is rejected before its password is checked
+    assert hashed == 2
+    assert responses[-1].headers['Retry-After'] == '2'
+    assert other_user.status_code == 200
+
+
+def test_wrong_passwords_do_not_limit_the_user(auth_client, db_movies, monkeypatch):
+    monkeypatch.setattr(settings, 'rate_limit_per_second', 0.5)
+    monkeypatch.setattr(settings, 'rate_limit_burst', 2)
+    monkeypatch.setattr(admission, 'monotonic', lambda: 100.0)
+    guessed = basic_auth('new_user', 'guess')
+
+    async def main():
+        return [
+            (await call(auth_client.app, '/movies/top', '', guessed, ('other', 1)))[0]
+            for _ in range(3)
+        ]
+
+    try:
+        guesses = asyncio.run(main())
+        user = auth_client.get('/movies/top')
+    finally:
+        admission.login_buckets.clear()
+        admission.user_buckets.clear()
+
+    assert [start['status'] for start in guesses] == [401, 401, 429]
+    assert user.status_code == 200
+
+
+def test_queued_logins_hold_no_threads(limits, app, db_new_user, monkeypatch):
+    limiter = limits('auth', 1, 64, timeout=0.5)
+    # identical requests would wait for a single one of them
+    monkeypatch.setattr(settings, 'coalesce_reads', False)
+    new_user = basic_auth('new_user', 'password')
+
+    async def main():
+        await limiter.acquire_async()
+        # more logins than the default executor has threads
+        logins = [
+            asyncio.ensure_future(call(app, '/movies', '', new_user)) for _ in range(40)
+        ]
+        while len(limiter._waiters) < 40:  # pylint: disable=protected-access
+            await asyncio.sleep(0.001)
+        unrelated = await asyncio.wait_for(call(app, '/metrics'), 0.25)
+        statuses = [messages[0]['status'] for messages in await asyncio.gather(*logins)]
+        limiter.release()
+        return unrelated[0]['status'], statuses
+
+    unrelated, statuses = asyncio.run(main())
+
+    assert unrelated == 200
+    assert statuses == [503] * 40
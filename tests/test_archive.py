@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import archive, maintenance, models, search
+from app.config import settings
+
+from .conftest import engine
+
+# pylint: disable=unused-argument
+
+READS = [
+    '/movies/1/reviews?no_ratings=true&no_reviews=true&avg_rating=true',
+    '/movies/1/reviews?limit=1',
+    '/movies/1/reviews?after_id=1',
+    '/movies/3/reviews',
+    '/users/1/reviews',
+    '/users/1/reviews?limit=2&after_id=1',
+    '/users/1/reviews/movies/2',
+    '/movies/top',
+]
+
+
+@pytest.fixture(name='archived')
+def _archived(session, db_reviews, monkeypatch):
+    # the reviews of user1, ids 1 to 3, are a month old
+    monkeypatch.setattr(settings, 'archive_after_days', 7)
+    session.query(models.Review).filter_by(user_id=1).update(
+        {models.Review.datetime: datetime.now() - timedelta(days=30)}
+    )
+    session.commit()
+
+    def archive_now():
+        moved = archive.archive_reviews(session)
+        session.commit()
+        return moved
+
+    return archive_now
+
+
+def test_reads_are_unchanged_by_archiving(auth_client, session, archived):
+    before = [auth_client.get(path).json() for path in READS]
+
+    assert archived() == 3
+    assert archived() == 0
+
+    assert session.query(models.Review.id).all() == [(4,), (5,)]
+    assert [auth_client.get(path).json() for path in READS] == before
+
+
+def test_rating_counts_include_the_archive(session, archived):
+    archived()
+
+    counts = archive.rating_counts()
+    assert sorted(session.query(counts.c.movie_id, counts.c.no_ratings)) == [
+        (1, 2),
+        (2, 2),
+        (3, 1),
+    ]
+    assert session.query(archive.rating_counts([2])).all() == [(2, 2)]
+
+
+def test_pages_read_the_archive_only_when_reaching_into_it(auth_client, archived):
+    archived()
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        newer = auth_client.get('/movies/1/reviews?after_id=3').json()
+        reads_after = len([s for s in statements if 'reviews_archive.rate' in s])
+        older = auth_client.get('/movies/1/reviews').json()
+        reads_all = len([s for s in statements if 'reviews_archive.rate' in s])
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    assert [review['id'] for review in newer['reviews']] == [4]
+    assert [review['id'] for review in older['reviews']] == [1, 4]
+    assert reads_after == 0
+    assert reads_all == 1
+
+
+def test_writes_move_reviews_back(auth_user1, session, archived):
+    archived()
+
+    updated = auth_user1.put('/movies/1/reviews', json={'rate': 4})
+    duplicate = auth_user1.post('/movies/2/reviews', json={'rate': 4})
+    deleted = auth_user1.delete('/movies/3/reviews')
+
+    assert updated.status_code == 200
+    assert updated.json()['id'] == 1
+    assert duplicate.status_code == 409
+    assert deleted.status_code == 200
+    assert [review.id for review in session.query(models.ArchivedReview)] == []
+    assert [movie.avg_rating for movie in session.query(models.Movie)] == [3, 3, 0]
+
+
+def test_aggregates_count_archived_ratings(auth_client, session, archived):
+    archived()
+
+    created = auth_client.post('/movies/3/reviews', json={'rate': 3})
+    reviews = auth_client.get('/movies/3/reviews?no_ratings=true&avg_rating=true')
+
+    # new ids continue after the archived ones
+    assert created.json()['id'] == 6
+    assert reviews.json()['no_ratings'] == 2
+    assert reviews.json()['avg_rating'] == 5
+    assert maintenance.reconcile_ratings(session) == 0
+
+
+def test_archived_reviews_stay_searchable(auth_client, session, archived):
+    archived()
+    search.rebuild(session)
+    session.commit()
+
+    response = auth_client.get('/reviews/search?q=boring')
+
+    assert [review['id'] for review in response.json()] == [2]
+
+
+def test_archiving_is_off_by_default(session, db_reviews):
+    later = datetime.now() + timedelta(days=10000)
+
+    assert archive.archive_reviews(session, now=later) == 0
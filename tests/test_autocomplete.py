@@ -0,0 +1,52 @@
+from app.autocomplete import autocomplete, normalize
+
+# pylint: disable=unused-argument
+
+
+def _titles(response):
+    return [movie['title'] for movie in response.json()]
+
+
+def test_normalize():
+    assert normalize('  Amélie: Le Fabuleux_Destin!! ') == 'amelie le fabuleux destin'
+
+
+def test_autocomplete(auth_client, db_reviews):
+    auth_client.post('/movies', json={'title': 'The Dark Title'})
+
+    response = auth_client.get('/movies/autocomplete?q=TIT')
+
+    assert response.status_code == 200
+    assert _titles(response) == ['title1', 'title2', 'title3', 'The Dark Title']
+    assert response.json()[0] == {
+        'id': 1,
+        'title': 'title1',
+        'release_year': 2018,
+        'avg_rating': 6,
+        'no_ratings': 2,
+    }
+    assert _titles(auth_client.get('/movies/autocomplete?q=dark t')) == [
+        'The Dark Title'
+    ]
+    assert _titles(auth_client.get('/movies/autocomplete?q=title&limit=1')) == [
+        'title1'
+    ]
+    assert auth_client.get('/movies/autocomplete?q=%20!').json() == []
+    assert auth_client.get('/movies/autocomplete?q=t&limit=51').status_code == 422
+
+
+def test_autocomplete_follows_writes(auth_client, db_reviews):
+    assert _titles(auth_client.get('/movies/autocomplete?q=ti')) == [
+        'title1',
+        'title2',
+        'title3',
+    ]
+
+    auth_client.post('/movies/3/reviews', json={'rate': 9})
+    auth_client.delete('/movies/2')
+
+    assert _titles(auth_client.get('/movies/autocomplete?q=ti')) == [
+        'title3',
+        'title1',
+    ]
+    assert len(autocomplete._keys) == 2  # pylint: disable=protected-access
@@ -0,0 +1,135 @@
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import create_engine, event
+
+from app import backup, database, models
+from app.__main__ import main
+from app.config import settings
+from app.database import init_db
+
+# pylint: disable=unused-argument
+
+
+@pytest.fixture(name='wal_engine')
+def _wal_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'backup_step_pages', 4)
+    monkeypatch.setattr(settings, 'backup_step_sleep', 0)
+    engine = create_engine(f'sqlite:///{tmp_path / "live.db"}')
+    event.listen(
+        engine,
+        'connect',
+        lambda connection, _: connection.execute('PRAGMA journal_mode = WAL'),
+    )
+    init_db(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            models.Movie.__table__.insert(),
+            [{'title': f'title{i}', 'description': 'x' * 500} for i in range(200)],
+        )
+    yield engine
+    engine.dispose()
+
+
+def _count(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute('SELECT count(*) FROM movies').fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_backup_runs_alongside_writers(wal_engine, tmp_path):
+    writer = sqlite3.connect(wal_engine.url.database, isolation_level=None)
+    remaining = []
+
+    def write(progress):
+        remaining.append(progress.pages_remaining)
+        writer.execute(
+            "INSERT INTO movies (title, avg_rating) VALUES ('written meanwhile', 0)"
+        )
+
+    progress = backup.backup(wal_engine, str(tmp_path / 'copy.db'), report=write)
+    writer.close()
+
+    # every step saw the same snapshot, no commit restarted the copy
+    assert remaining == sorted(remaining, reverse=True)
+    assert len(remaining) > 1
+    assert progress.as_dict()['pages_copied'] == progress.pages_total > 0
+    assert progress.as_dict()['bytes_copied'] == progress.pages_total * 4096
+    assert _count(tmp_path / 'copy.db') == 200
+    assert _count(wal_engine.url.database) == 200 + len(remaining)
+    assert not (tmp_path / 'copy.db.partial').exists()
+
+
+def test_restore_copies_pages_back(wal_engine, tmp_path):
+    path = str(tmp_path / 'copy.db')
+    backup.backup(wal_engine, path)
+    with wal_engine.begin() as connection:
+        connection.execute(models.Movie.__table__.delete())
+
+    progress = backup.restore(path, wal_engine)
+
+    assert progress.state == 'done'
+    assert _count(wal_engine.url.database) == 200
+    with wal_engine.connect() as connection:
+        assert connection.execute('SELECT count(*) FROM movies').scalar() == 200
+
+
+def test_restore_refuses_broken_backups(wal_engine, tmp_path):
+    damaged = tmp_path / 'damaged.db'
+    damaged.write_bytes(b'SQLite format 3\x00' + b'\x00' * 200)
+
+    with pytest.raises(backup.BackupError):
+        backup.restore(str(tmp_path / 'missing.db'), wal_engine)
+    with pytest.raises(backup.BackupError, match='damaged'):
+        backup.restore(str(damaged), wal_engine)
+    assert _count(wal_engine.url.database) == 200
+
+
+def test_backup_and_restore_commands(wal_engine, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(database, 'engine', wal_engine)
+    path = str(tmp_path / 'cli.db')
+    monkeypatch.setattr(settings, 'writer_lock_path', str(tmp_path / 'writer.lock'))
+
+    main(['backup', path])
+    main(['restore', path])
+
+    output = capsys.readouterr().out
+    assert f'backed up to {path}' in output
+    assert f'restored {path}' in output
+    assert 'MB/s' in output
+
+
+def test_backup_endpoint(auth_client, db_movies, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'backup_dir', str(tmp_path / 'backups'))
+    monkeypatch.setattr(settings, 'admin_usernames', ['new_user'])
+
+    started = auth_client.post('/backups')
+    deadline = time.monotonic() + 5
+    latest = auth_client.get('/backups/latest').json()
+    while latest['state'] == 'running':
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+        latest = auth_client.get('/backups/latest').json()
+
+    assert started.status_code == 202
+    assert started.json()['path'].startswith(str(tmp_path / 'backups' / 'test-'))
+    assert latest['state'] == 'done'
+    assert latest['pages_copied'] == latest['pages_total'] > 0
+    assert _count(latest['path']) == 3
+
+
+def test_backup_endpoint_needs_admin(auth_user1, monkeypatch):
+    monkeypatch.setattr(settings, 'admin_usernames', ['new_user'])
+
+    assert auth_user1.post('/backups').status_code == 403
+    assert auth_user1.get('/backups/latest').status_code == 403
+
+
+def test_one_backup_at_a_time(session, monkeypatch):
+    monkeypatch.setattr(backup, '_latest', backup.Progress('backup', 'running.db'))
+
+    with pytest.raises(backup.BackupRunning):
+        backup.start_backup(session.get_bind())
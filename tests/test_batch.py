@@ -0,0 +1,85 @@
+import pytest
+
+from app import metrics
+from app.config import settings
+
+# pylint: disable=unused-argument
+
+MOVIE_SCREEN = [
+    {'id': 'movies', 'path': '/movies?limit=2'},
+    {'id': 'reviews', 'path': '/movies/1/reviews?avg_rating=true&no_ratings=true'},
+    {'id': 'mine', 'path': '/users/1/reviews/movies/1'},
+    {'id': 'stats', 'path': '/users/1/stats'},
+]
+
+
+def test_batch_matches_single_requests(auth_user1, db_reviews):
+    hashes = metrics.PASSWORD_HASHES.get() or 0
+
+    response = auth_user1.post('/batch', json={'requests': MOVIE_SCREEN})
+
+    assert response.status_code == 200
+    # one password check for the whole batch
+    assert metrics.PASSWORD_HASHES.get() == hashes + 1
+    results = response.json()['responses']
+    assert [result['id'] for result in results] == [
+        'movies',
+        'reviews',
+        'mine',
+        'stats',
+    ]
+    for sub, result in zip(MOVIE_SCREEN, results):
+        single = auth_user1.get(sub['path'])
+        assert (result['status'], result['body']) == (single.status_code, single.json())
+
+
+def test_writes_run_in_order(auth_user1, db_movies):
+    response = auth_user1.post(
+        '/batch',
+        json={
+            'requests': [
+                {'path': '/users/1/reviews'},
+                {'method': 'POST', 'path': '/movies/1/reviews', 'body': {'rate': 8}},
+                {'method': 'POST', 'path': '/movies/1/reviews', 'body': {'rate': 2}},
+                {'path': '/movies/1/reviews?avg_rating=true'},
+                {'method': 'PUT', 'path': '/movies/1/reviews', 'body': {'rate': 0}},
+                {'method': 'DELETE', 'path': '/movies/1/reviews'},
+            ]
+        },
+    )
+
+    results = response.json()['responses']
+    assert [result['status'] for result in results] == [200, 201, 409, 200, 422, 200]
+    assert results[0]['body'] == []
+    assert results[3]['body']['avg_rating'] == 8
+    assert results[5]['body'] == results[1]['body']['id']
+
+
+def test_batch_errors(auth_user1, unauth_client, db_movies, monkeypatch):
+    monkeypatch.setattr(settings, 'batch_max_requests', 2)
+
+    unauthorized = unauth_client.post('/batch', json={'requests': MOVIE_SCREEN[:1]})
+    too_many = auth_user1.post('/batch', json={'requests': MOVIE_SCREEN})
+    empty = auth_user1.post('/batch', json={'requests': []})
+    items = auth_user1.post(
+        '/batch',
+        json={'requests': [{'path': '/batch'}, {'path': '/movies/42/reviews'}]},
+    )
+
+    assert unauthorized.status_code == 401
+    assert too_many.status_code == 413
+    assert empty.status_code == 422
+    assert items.json()['responses'] == [
+        {'id': None, 'status': 400, 'body': {'detail': 'Batches cannot be nested'}},
+        {'id': None, 'status': 404, 'body': {'detail': 'Movie not found'}},
+    ]
+
+
+@pytest.mark.parametrize('path', ['/metrics', '/movies/1/reviews/oops'])
+def test_other_content_types(auth_user1, db_movies, path):
+    response = auth_user1.post('/batch', json={'requests': [{'path': path}]})
+
+    result = response.json()['responses'][0]
+    single = auth_user1.get(path)
+    assert result['status'] == single.status_code
+    assert isinstance(result['body'], (str, dict))
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from benchmarks import formats, generator, load, micro, results
+
+SPEC = generator.DatasetSpec(users=30, movies=20, reviews=200, seed=7)
+
+
+@pytest.fixture(name='bench_engine')
+def _bench_engine(tmp_path):
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "bench.db"}', connect_args={'check_same_thread': False}
+    )
+    generator.generate(engine, SPEC)
+    yield engine
+    engine.dispose()
+
+
+def test_generate_is_deterministic_and_skewed(bench_engine, tmp_path):
+    other = create_engine(f'sqlite:///{tmp_path / "other.db"}')
+    generator.generate(other, SPEC)
+    query = text('SELECT movie_id, user_id, rate FROM reviews ORDER BY id')
+
+    with bench_engine.connect() as conn, other.connect() as other_conn:
+        rows = conn.execute(query).fetchall()
+        other_rows = other_conn.execute(query).fetchall()
+        per_movie = conn.execute(
+            text('SELECT COUNT(*) AS c FROM reviews GROUP BY movie_id ORDER BY c DESC')
+        ).fetchall()
+        drift = conn.execute(
+            text(
+                'SELECT COUNT(*) FROM movies WHERE ABS(avg_rating - COALESCE('
+                '(SELECT AVG(rate) FROM reviews WHERE movie_id = movies.id), 0)) > 1e-9'
+            )
+        ).scalar()
+
+    assert rows == other_rows
+    assert len(rows) == SPEC.reviews
+    assert len({(movie_id, user_id) for movie_id, user_id, _ in rows}) == SPEC.reviews
+    assert per_movie[0][0] > 3 * per_movie[-1][0]
+    assert drift == 0
+
+
+def test_micro_and_compare(bench_engine, tmp_path):
+    output = micro.run(bench_engine, iterations=2, warmup=1, pattern='crud_movies')
+    path = results.save('micro', output, tmp_path / 'micro.json')
+
+    document = json.loads(path.read_text())
+    lines = results.compare(path, path)
+
+    assert set(document['results']['cases']) == {
+        name
+        for name in list(micro.READ_CASES) + list(micro.WRITE_CASES)
+        if 'crud_movies' in name
+    }
+    assert document['kind'] == 'micro'
+    assert len(lines) == len(document['results']['cases']) + 1
+
+
+def test_load_driver(bench_engine):
+    output = load.run(bench_engine, requests=2, concurrency=1)
+
+    assert output['throughput_rps'] > 0
+    assert sum(case['count'] for case in output['cases'].values()) == 2
+    assert all(case['errors'] == 0 for case in output['cases'].values())
+
+
+def test_formats(bench_engine):
+    pytest.importorskip('msgpack')
+
+    cases = formats.run(bench_engine, iterations=2)['cases']
+
+    assert set(cases) >= {
+        f'{payload}[{name}].{step}'
+        for payload in ('movies', 'reviews')
+        for name in ('json', 'msgpack')
+        for step in ('encode', 'decode')
+    }
+    json_bytes = cases['reviews[json].encode']['bytes']
+    assert cases['reviews[msgpack].encode']['bytes'] < json_bytes
+    assert cases['reviews[json+gzip].encode']['bytes'] < json_bytes
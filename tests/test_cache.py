@@ -0,0 +1,89 @@
+import pytest
+
+from app import cache, crud_movies, invalidation, metrics, schemas
+
+# pylint: disable=unused-argument
+
+
+def test_lru_eviction():
+    lru: cache.LRUCache[str] = cache.LRUCache('test', maxsize=2, ttl=60)
+    lru.set(1, 'one')
+    lru.set(2, 'two')
+    lru.get(1)
+    lru.set(3, 'three')
+
+    assert lru.get(1) == 'one'
+    assert lru.get(2) is None
+    assert lru.get(3) == 'three'
+    assert len(lru) == 2
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache, 'monotonic', lambda: now[0])
+    lru: cache.LRUCache[str] = cache.LRUCache('test', maxsize=2, ttl=5)
+    lru.set(1, 'one')
+
+    assert lru.get(1) == 'one'
+    now[0] += 5
+    assert lru.get(1) is None
+    assert len(lru) == 0
+
+
+def test_load_racing_invalidation_is_not_cached():
+    lru: cache.LRUCache[str] = cache.LRUCache('test', maxsize=2, ttl=60)
+
+    def load():
+        lru.invalidate(1)
+        return 'stale'
+
+    assert lru.get_or_load(1, load) == 'stale'
+    assert lru.get(1) is None
+
+
+def test_movie_snapshot_cached(session, db_movies):
+    hits = metrics.CACHE_REQUESTS.get('movies', 'hit') or 0
+
+    first = crud_movies.get_movie_snapshot(session=session, movie_id=1)
+    second = crud_movies.get_movie_snapshot(session=session, movie_id=1)
+
+    assert first is second
+    assert first is not None and first.title == 'title1'
+    assert metrics.CACHE_REQUESTS.get('movies', 'hit') == hits + 1
+    assert crud_movies.get_movie_snapshot(session=session, movie_id=42) is None
+    with pytest.raises(TypeError):
+        first.title = 'changed'
+
+
+def test_rating_change_invalidates(auth_client, db_reviews):
+    params = {'avg_rating': True}
+    assert auth_client.get('/movies/1/reviews', params=params).json()['avg_rating'] == 6
+
+    auth_client.post('/movies/1/reviews', json={'rate': 9})
+
+    assert auth_client.get('/movies/1/reviews', params=params).json()['avg_rating'] == 7
+
+
+def test_delete_movie_invalidates(auth_client, db_movies):
+    assert auth_client.get('/movies/1/reviews').status_code == 200
+
+    assert auth_client.delete('/movies/1').status_code == 200
+
+    assert auth_client.get('/movies/1/reviews').status_code == 404
+    assert auth_client.delete('/movies/1').status_code == 404
+
+
+def test_uncommitted_change_bypasses_cache(session, db_movies):
+    db_movie = crud_movies.get_movie_by_id(session=session, movie_id=1)
+    assert db_movie is not None
+    crud_movies.get_movie_snapshot(session=session, movie_id=1)
+    db_movie.avg_rating = 1
+    invalidation.publish(session, 'movie', 1)
+    session.flush()
+
+    changed = crud_movies.get_movie_snapshot(session=session, movie_id=1)
+    assert changed is not None and changed.avg_rating == 1
+    session.rollback()
+    restored = crud_movies.get_movie_snapshot(session=session, movie_id=1)
+    assert restored is not None and restored.avg_rating == 6
+    assert isinstance(crud_movies.movie_cache.get(1), schemas.MovieSnapshot)
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app import coalescing, crud_movies
+from app.config import settings
+
+from .conftest import basic_auth, call
+
+# pylint: disable=unused-argument
+
+
+async def get(app, path, query, authorization):
+    messages = await call(app, path, query, authorization)
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return messages[0]['status'], json.loads(body)
+
+
+@pytest.fixture(name='slow_reviews')
+def _slow_reviews(monkeypatch):
+    calls = []
+    get_reviews = crud_movies.get_reviews
+
+    def slow_get_reviews(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.1)
+        return get_reviews(**kwargs)
+
+    monkeypatch.setattr(crud_movies, 'get_reviews', slow_get_reviews)
+    return calls
+
+
+def test_identical_requests_share_one_response(
+    app, db_new_user, db_users, db_reviews, slow_reviews
+):
+    new_user = basic_auth('new_user', 'password')
+    coalesced = coalescing.COALESCED_REQUESTS.get('/movies/{movie_id}/reviews') or 0
+
+    async def main():
+        return await asyncio.gather(
+            get(app, '/movies/1/reviews', 'after_id=0&limit=20', new_user),
+            get(app, '/movies/1/reviews', 'limit=20&after_id=0', new_user),
+            get(app, '/movies/1/reviews', 'after_id=0&limit=20', new_user),
+            get(app, '/movies/1/reviews', 'after_id=1&limit=20', new_user),
+            get(
+                app,
+                '/movies/1/reviews',
+                'after_id=0&limit=20',
+                basic_auth('username1', 'password1'),
+            ),
+        )
+
+    responses = asyncio.run(main())
+
+    assert [status for status, _ in responses] == [200] * 5
+    assert responses[0] == responses[1] == responses[2] == responses[4]
+    assert len(responses[0][1]['reviews']) == 2
+    assert len(responses[3][1]['reviews']) == 1
+    assert len(slow_reviews) == 3
+    assert coalescing.COALESCED_REQUESTS.get('/movies/{movie_id}/reviews') == (
+        coalesced + 2
+    )
+    assert not coalescing._flights  # pylint: disable=protected-access
+
+
+def test_errors_and_failed_auth_are_shared(app, db_new_user, db_movies):
+    wrong = basic_auth('new_user', 'wrong')
+
+    async def main():
+        return await asyncio.gather(
+            get(app, '/movies/42/reviews', '', basic_auth('new_user', 'password')),
+            get(app, '/movies/42/reviews', '', basic_auth('new_user', 'password')),
+            get(app, '/users', '', wrong),
+            get(app, '/users', '', wrong),
+        )
+
+    responses = asyncio.run(main())
+
+    assert [status for status, _ in responses] == [404, 404, 401, 401]
+
+
+def test_coalescing_can_be_disabled(
+    app, db_new_user, db_reviews, slow_reviews, monkeypatch
+):
+    monkeypatch.setattr(settings, 'coalesce_reads', False)
+    new_user = basic_auth('new_user', 'password')
+
+    async def main():
+        return await asyncio.gather(
+            *(get(app, '/movies/1/reviews', '', new_user) for _ in range(3))
+        )
+
+    responses = asyncio.run(main())
+
+    assert [status for status, _ in responses] == [200] * 3
+    assert len(slow_reviews) == 3
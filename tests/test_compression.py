@@ -0,0 +1,131 @@
+import gzip
+
+import pytest
+
+from app import compression
+from app.config import settings
+
+# pylint: disable=unused-argument
+
+
+@pytest.fixture(name='small_threshold')
+def _small_threshold(monkeypatch):
+    monkeypatch.setattr(settings, 'compression_min_size', 100)
+    compression.compressed_bodies.clear()
+
+
+def test_listings_are_gzipped(auth_client, db_reviews, small_threshold):
+    plain = auth_client.get(
+        '/movies/1/reviews', headers={'Accept-Encoding': 'identity'}
+    )
+    compressed = auth_client.get(
+        '/movies/1/reviews', headers={'Accept-Encoding': 'gzip'}, stream=True
+    )
+    body = compressed.raw.read(decode_content=False)
+
+    assert 'content-encoding' not in plain.headers
+    assert plain.headers['vary'] == 'Accept-Encoding'
+    assert compressed.headers['content-encoding'] == 'gzip'
+    assert compressed.headers['vary'] == 'Accept-Encoding'
+    assert int(compressed.headers['content-length']) == len(body) < len(plain.content)
+    assert gzip.decompress(body) == plain.content
+
+
+def test_small_and_streamed_bodies_pass_through(auth_client, db_movies):
+    small = auth_client.get('/movies/1', headers={'Accept-Encoding': 'gzip'})
+
+    assert len(small.content) < settings.compression_min_size
+    assert 'content-encoding' not in small.headers
+    assert 'vary' not in small.headers
+
+
+def test_popular_pages_are_compressed_once(
+    auth_client, db_reviews, small_threshold, monkeypatch
+):
+    bodies = []
+
+    def counting_gzip(body, level):
+        bodies.append(body)
+        return gzip.compress(body, compresslevel=level, mtime=0)
+
+    monkeypatch.setattr(compression, '_gzip', counting_gzip)
+    headers = {'Accept-Encoding': 'gzip'}
+
+    first = auth_client.get('/movies/1/reviews', headers=headers)
+    second = auth_client.get('/movies/1/reviews', headers=headers)
+    auth_client.post('/movies/3/reviews', json={'rate': 5}, headers=headers)
+    third = auth_client.get('/movies/1/reviews', headers=headers)
+
+    assert first.json() == second.json() == third.json()
+    # the post is not kept, the unchanged listing is still cached
+    assert len(bodies) == 2
+    assert len(compression.compressed_bodies) == 1
+
+
+@pytest.mark.parametrize(
+    ('accept_encoding', 'expected'),
+    [
+        ('gzip, deflate', 'gzip'),
+        ('br, gzip', 'br'),
+        ('zstd;q=0.5, br;q=0.8, gzip', 'gzip'),
+        ('*', 'zstd'),
+        ('zstd;q=0, *', 'br'),
+        ('gzip;q=0', None),
+        ('identity', None),
+        ('', None),
+    ],
+)
+def test_choose_encoding(monkeypatch, accept_encoding, expected):
+    monkeypatch.setattr(
+        compression,
+        'compressors',
+        lambda: {'gzip': compression._gzip, 'br': None, 'zstd': None},
+    )
+
+    assert compression.choose_encoding(accept_encoding) == expected
+
+
+def test_encodings_can_be_disabled(
+    auth_client, db_reviews, small_threshold, monkeypatch
+):
+    monkeypatch.setitem(settings.compression_levels, 'gzip', 0)
+    without_gzip = auth_client.get(
+        '/movies/1/reviews', headers={'Accept-Encoding': 'gzip'}
+    )
+    monkeypatch.setattr(settings, 'compression', False)
+    disabled = auth_client.get('/movies/1/reviews')
+
+    assert 'content-encoding' not in without_gzip.headers
+    assert 'vary' not in disabled.headers
+
+
+@pytest.mark.parametrize(
+    ('module', 'encoding'), [('brotli', 'br'), ('zstandard', 'zstd')]
+)
+def test_optional_encodings(auth_client, db_reviews, small_threshold, module, encoding):
+    library = pytest.importorskip(module)
+    plain = auth_client.get(
+        '/movies/1/reviews', headers={'Accept-Encoding': 'identity'}
+    )
+
+    response = auth_client.get(
+        '/movies/1/reviews', headers={'Accept-Encoding': encoding}, stream=True
+    )
+    body = response.raw.read(decode_content=False)
+    if module == 'zstandard':
+        decompressed = library.ZstdDecompressor().decompress(body)
+    else:
+        decompressed = library.decompress(body)
+
+    assert response.headers['content-encoding'] == encoding
+    assert decompressed == plain.content
+
+
+@pytest.mark.parametrize(
+    ('module', 'encoding'), [('brotli', 'br'), ('zstandard', 'zstd')]
+)
+def test_missing_encodings_fall_back_to_gzip(monkeypatch, module, encoding):
+    monkeypatch.setattr(compression, module, None)
+
+    assert encoding not in compression.compressors()
+    assert compression.choose_encoding(f'{encoding}, gzip;q=0.5') == 'gzip'
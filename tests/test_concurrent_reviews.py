@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from app import crud_movies, crud_users, models, schemas, writer
+
+# pylint: disable=unused-argument
+
+
+def test_concurrent_review_writes_keep_aggregates(session, db_movies):
+    db_users = [
+        models.User(username=f'user{i}', hashed_password='-') for i in range(24)
+    ]
+    session.add_all(db_users)
+    session.commit()
+    users = [schemas.User.from_orm(user) for user in db_users]
+    make_session = sessionmaker(bind=session.get_bind())
+    errors = []
+
+    def write(user, rate):
+        # every transaction takes the single writer, as the write routes do
+        try:
+            for step in range(3):
+                with writer.exclusive():
+                    thread_session = make_session()
+                    try:
+                        db_movie = crud_movies.get_movie_by_id(thread_session, 1)
+                        assert db_movie is not None
+                        db_review = crud_movies.get_review_by_movie_and_user_ids(
+                            movie_id=1, user_id=user.id, session=thread_session
+                        )
+                        review = schemas.ReviewCreate(
+                            rate=(rate + step) % 10 + 1, text='a review'
+                        )
+                        if db_review is None:
+                            crud_movies.create_review(
+                                thread_session, user, db_movie, review
+                            )
+                        elif step == 2 and user.id % 3 == 0:
+                            crud_movies.delete_review(1, user.id, thread_session)
+                        else:
+                            crud_movies.update_review(db_review, review, thread_session)
+                        thread_session.commit()
+                    finally:
+                        thread_session.close()
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=write, args=(user, i)) for i, user in enumerate(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    session.expire_all()
+    rates = [rate for rate, in session.query(models.Review.rate).filter_by(movie_id=1)]
+    assert len(rates) == 16
+    assert session.get(models.Movie, 1).avg_rating == pytest.approx(
+        sum(rates) / len(rates)
+    )
+    assert (
+        session.query(func.sum(models.RatingRollup.count))
+        .filter_by(movie_id=1, period='day')
+        .scalar()
+        == 16
+    )
+    stats = [crud_users.get_user_stats(session, user.id) for user in users]
+    assert sum(user_stats.no_ratings for user_stats in stats if user_stats) == 16
+
+
+def test_review_committed_in_between_is_not_lost(
+    session, db_users, db_new_user, db_movies
+):
+    user1, user2 = (schemas.User.from_orm(user) for user in db_users)
+    newcomer = schemas.User.from_orm(db_new_user)
+    make_session = sessionmaker(bind=session.get_bind())
+    first, late = make_session(), make_session()
+
+    def review(user, rate, cur_session, db_movie=None):
+        db_movie = db_movie or crud_movies.get_movie_by_id(cur_session, 1)
+        assert db_movie is not None
+        crud_movies.create_review(
+            cur_session,
+            user,
+            db_movie,
+            schemas.ReviewCreate(rate=rate, text='a review'),
+        )
+        cur_session.commit()
+
+    try:
+        review(user1, 6, first)
+        # a request loads the movie with average 6, another review commits before
+        # it writes and makes it 8, its own review brings it back to 6
+        db_movie = crud_movies.get_movie_by_id(late, 1)
+        review(user2, 10, first)
+        review(newcomer, 2, late, db_movie)
+    finally:
+        first.close()
+        late.close()
+
+    session.expire_all()
+    assert session.get(models.Movie, 1).avg_rating == 6
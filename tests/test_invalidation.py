@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+from time import time
+
+import pytest
+
+from app import crud_movies, invalidation, models, ratings
+from app.config import settings
+
+# pylint: disable=unused-argument
+
+REMOTE_WRITE = '''
+import sys
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import crud_movies, ratings
+
+session = sessionmaker(bind=create_engine(sys.argv[1]))()
+db_movie = crud_movies.get_movie_by_id(session=session, movie_id=1)
+db_movie.title = 'changed in another worker'
+ratings.update_avg_rating_of_movie(session=session, db_movie=db_movie)
+session.commit()
+'''
+
+
+@pytest.fixture(name='cached_movie')
+def _cached_movie(session, db_movies):
+    invalidation.poll(session, force=True)
+    crud_movies.get_movie_snapshot(session=session, movie_id=1)
+    session.commit()
+    assert 1 in crud_movies.movie_cache._entries  # pylint: disable=protected-access
+    return db_movies[0]
+
+
+def _remote_invalidation(session, origin, created_at=None):
+    session.add(
+        models.Invalidation(
+            entity='movie',
+            entity_id=1,
+            origin=origin,
+            created_at=created_at or time(),
+        )
+    )
+    session.commit()
+
+
+def test_write_in_another_worker(session, cached_movie, monkeypatch):
+    monkeypatch.setattr(settings, 'invalidation_poll_interval', 60)
+    applied = invalidation.APPLIED.get('movie') or 0
+    subprocess.run(
+        [sys.executable, '-c', REMOTE_WRITE, str(session.get_bind().url)], check=True
+    )
+
+    stale = crud_movies.get_movie_snapshot(session=session, movie_id=1)
+    session.commit()
+    invalidation.poll(session, force=True)
+    fresh = crud_movies.get_movie_snapshot(session=session, movie_id=1)
+
+    assert stale is not None and stale.title == 'title1'
+    assert fresh is not None and fresh.title == 'changed in another worker'
+    assert invalidation.APPLIED.get('movie') == applied + 1
+    assert invalidation.LAG.get()[-2:] != [0.0, 0.0]
+
+
+def test_own_invalidations_are_applied_on_commit(session, cached_movie):
+    applied = invalidation.APPLIED.get('movie') or 0
+
+    cached_movie.avg_rating = 2
+    ratings.update_avg_rating_of_movie(session=session, db_movie=cached_movie)
+    session.commit()
+    invalidation.poll(session, force=True)
+
+    assert 1 not in crud_movies.movie_cache._entries  # pylint: disable=protected-access
+    assert invalidation.APPLIED.get('movie') == applied
+    assert session.query(models.Invalidation).count() == 1
+
+
+def test_poll_interval(session, cached_movie, monkeypatch):
+    monkeypatch.setattr(settings, 'invalidation_poll_interval', 60)
+    _remote_invalidation(session, origin=os.getpid() + 1)
+
+    invalidation.poll(session)
+    assert crud_movies.movie_cache.get(1) is not None
+    invalidation.poll(session, force=True)
+    assert crud_movies.movie_cache.get(1) is None
+
+
+def test_missed_invalidations_reset_caches(session, cached_movie, monkeypatch):
+    resets = invalidation.RESETS.get() or 0
+    monkeypatch.setattr(settings, 'invalidation_retention', 0)
+
+    invalidation.poll(session, force=True)
+
+    assert invalidation.RESETS.get() == resets + 1
+    assert len(crud_movies.movie_cache) == 0
+
+
+def test_old_invalidations_are_pruned(session, db_movies, monkeypatch):
+    _remote_invalidation(session, origin=os.getpid() + 1, created_at=time() - 600)
+    monkeypatch.setattr(settings, 'invalidation_retention', 60)
+
+    invalidation.publish(session, 'movie', 2)
+    session.commit()
+
+    assert [row.entity_id for row in session.query(models.Invalidation)] == [2]
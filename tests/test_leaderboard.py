@@ -0,0 +1,73 @@
+from app import crud_movies, models, schemas
+from app.leaderboard import leaderboard, weighted_rating
+
+# pylint: disable=unused-argument
+
+
+def _titles(response):
+    return [movie['title'] for movie in response.json()]
+
+
+def test_weighted_rating():
+    assert weighted_rating(10, 2, 5, 10) < weighted_rating(8, 100, 5, 10)
+    assert weighted_rating(7, 0, 5, 10) == 5
+
+
+def test_top_movies(auth_client, db_reviews):
+    response = auth_client.get('/movies/top')
+    ranked = response.json()
+
+    assert response.status_code == 200
+    assert _titles(response) == ['title3', 'title1', 'title2']
+    assert ranked[0]['no_ratings'] == 1
+    assert ranked[0]['score'] == (7 + 10 * 5) / 11
+    assert _titles(auth_client.get('/movies/top?release_year=2018')) == [
+        'title1',
+        'title2',
+    ]
+    assert _titles(auth_client.get('/movies/top?offset=1&limit=1')) == ['title1']
+    assert auth_client.get('/movies/top?release_year=1999').json() == []
+
+
+def test_few_perfect_ratings_do_not_top_the_chart(session, db_movies):
+    movie1, _, movie3 = db_movies
+    users = [models.User(username=f'user{i}', hashed_password='-') for i in range(12)]
+    session.add_all(users)
+    session.commit()
+    assert leaderboard.top(session=session) == []
+
+    for user, movie, rate in [(user, movie3, 8) for user in users] + [
+        (user, movie1, 10) for user in users[:2]
+    ]:
+        crud_movies.create_review(
+            session=session,
+            current_user=schemas.User.from_orm(user),
+            db_movie=movie,
+            review=schemas.ReviewCreate(rate=rate, text='worth watching'),
+        )
+    session.commit()
+    ranked = leaderboard.top(session=session)
+
+    assert [movie.title for movie in ranked] == ['title3', 'title1']
+    assert ranked[1].avg_rating == 10
+    assert ranked[0].score == (12 * 8 + 10 * 5.5) / 22
+
+
+def test_deleted_movie_leaves_the_chart(auth_client, db_reviews):
+    assert len(auth_client.get('/movies/top').json()) == 3
+
+    auth_client.delete('/movies/3')
+
+    assert _titles(auth_client.get('/movies/top')) == ['title1', 'title2']
+
+
+def test_movie_without_release_year_is_ranked_once(auth_client, session, db_reviews):
+    session.add(models.Movie(title='undated', avg_rating=0))
+    session.commit()
+
+    auth_client.post('/movies/4/reviews', json={'rate': 9})
+    first = [movie['id'] for movie in auth_client.get('/movies/top').json()]
+    auth_client.put('/movies/4/reviews', json={'rate': 10})
+    updated = [movie['id'] for movie in auth_client.get('/movies/top').json()]
+
+    assert sorted(first) == sorted(updated) == [1, 2, 3, 4]
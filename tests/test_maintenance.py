@@ -0,0 +1,135 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from app import crud_movies, maintenance, models, writer
+from app.config import settings
+from app.database import init_db
+
+# pylint: disable=unused-argument
+
+
+def test_reconcile_fixes_drifted_ratings(session, db_reviews):
+    movie1 = session.get(models.Movie, 1)
+    movie1.avg_rating = 9
+    session.add(models.Movie(title='title4', avg_rating=5))
+    session.commit()
+    before = crud_movies.get_movie_snapshot(session=session, movie_id=1)
+    assert before is not None and before.avg_rating == 9
+
+    assert maintenance.run_task(session, 'reconcile_ratings') == 2
+
+    session.expire_all()
+    assert [movie.avg_rating for movie in session.query(models.Movie)] == [6, 3, 7, 0]
+    after = crud_movies.get_movie_snapshot(session=session, movie_id=1)
+    assert after is not None and after.avg_rating == 6
+    assert maintenance.run_task(session, 'reconcile_ratings', force=True) == 0
+
+
+def test_reconcile_keeps_ratings_changed_meanwhile(session, db_reviews, monkeypatch):
+    monkeypatch.setattr(settings, 'maintenance_reconcile_batch_size', 1)
+    for movie_id in (1, 2):
+        session.get(models.Movie, movie_id).avg_rating = 9
+    session.commit()
+    other = sessionmaker(bind=session.get_bind())()
+    exclusive = writer.exclusive
+    batches: List[None] = []
+
+    @contextmanager
+    def first_batch_after_a_review():
+        with exclusive():
+            if not batches:
+                # as a review of movie 2 written after the averages were read
+                other.query(models.Movie).filter_by(id=2).update(
+                    {models.Movie.avg_rating: 4}
+                )
+                other.commit()
+            batches.append(None)
+            yield
+
+    monkeypatch.setattr(writer, 'exclusive', first_batch_after_a_review)
+    try:
+        assert maintenance.reconcile_ratings(session) == 1
+    finally:
+        other.close()
+
+    session.expire_all()
+    assert len(batches) == 2
+    assert [movie.avg_rating for movie in session.query(models.Movie)] == [6, 4, 7]
+
+
+def test_tasks_run_once_per_interval(session, db_movies, monkeypatch):
+    monkeypatch.setitem(settings.maintenance_intervals, 'incremental_vacuum', 0)
+    runs = maintenance.MAINTENANCE_RUNS.get('analyze', 'ok') or 0
+
+    assert maintenance.run_due(session) == {
+        'analyze': 0,
+        'checkpoint': 0,
+        'incremental_vacuum': None,
+        # the fixture movies have ratings but no reviews
+        'reconcile_ratings': 3,
+        # archiving is off by default
+        'archive_reviews': 0,
+    }
+    assert set(maintenance.run_due(session).values()) == {None}
+    assert maintenance.run_task(session, 'analyze', force=True) == 0
+
+    assert inspect(session.get_bind()).has_table('sqlite_stat1')
+    assert maintenance.MAINTENANCE_RUNS.get('analyze', 'ok') == runs + 2
+    assert session.get(models.MaintenanceRun, 'checkpoint').result == 'ok'
+    assert session.get(models.MaintenanceRun, 'incremental_vacuum') is None
+
+
+def test_failed_task_is_recorded(session, monkeypatch):
+    def fail(_):
+        raise RuntimeError('boom')
+
+    monkeypatch.setitem(maintenance.TASKS, 'analyze', fail)
+    errors = maintenance.MAINTENANCE_RUNS.get('analyze', 'error') or 0
+
+    assert maintenance.run_task(session, 'analyze') is None
+
+    run = session.get(models.MaintenanceRun, 'analyze')
+    assert (run.result, run.rows) == ('error', None)
+    assert run.finished_at >= run.started_at
+    assert maintenance.MAINTENANCE_RUNS.get('analyze', 'error') == errors + 1
+
+
+def test_incremental_vacuum_frees_pages(tmp_path):
+    path = tmp_path / 'vacuum.db'
+    sqlite3.connect(path).execute('PRAGMA auto_vacuum = INCREMENTAL').close()
+    engine = create_engine(f'sqlite:///{path}')
+    init_db(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        session.add_all(
+            models.Movie(title=f'title{i}', description='description' * 100)
+            for i in range(500)
+        )
+        session.commit()
+        session.query(models.Movie).delete()
+        session.commit()
+
+        assert (maintenance.run_task(session, 'incremental_vacuum') or 0) > 0
+        assert maintenance.run_task(session, 'incremental_vacuum', force=True) == 0
+    finally:
+        session.close()
+
+
+def test_scheduler_runs_due_tasks(session, monkeypatch):
+    monkeypatch.setattr(settings, 'maintenance_tick', 0.01)
+    scheduler = maintenance.Scheduler(sessionmaker(bind=session.get_bind()))
+    scheduler.start()
+    try:
+        deadline = time.monotonic() + 5
+        while session.query(models.MaintenanceRun).count() < len(maintenance.TASKS):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        scheduler.stop()
+
+    assert {run.result for run in session.query(models.MaintenanceRun)} == {'ok'}
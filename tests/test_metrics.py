@@ -0,0 +1,65 @@
+import pytest
+
+from app import metrics
+
+# pylint: disable=unused-argument
+
+
+@pytest.fixture(name='registry')
+def _registry():
+    metrics.registry.clear()
+    yield metrics.registry
+    metrics.registry.clear()
+
+
+def test_histogram_render():
+    registry = metrics.Registry()
+    histogram = registry.histogram('latency', 'help text', ('route',), (0.1, 1.0))
+    histogram.observe('/a', value=0.05)
+    histogram.observe('/a', value=0.5)
+    histogram.observe('/a', value=5)
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ['# HELP latency help text', '# TYPE latency histogram']
+    assert 'latency_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_sum{route="/a"} 5.55' in lines
+    assert 'latency_count{route="/a"} 3' in lines
+
+
+def test_counter_and_gauge_render():
+    registry = metrics.Registry()
+    counter = registry.counter('hits_total', 'hits', ('name',))
+    gauge = registry.gauge('in_use', 'in use')
+    counter.inc('quote"d')
+    counter.inc('quote"d', amount=2)
+    gauge.inc()
+    gauge.dec()
+    gauge.set(value=4)
+
+    lines = registry.render().splitlines()
+
+    assert 'hits_total{name="quote\\"d"} 3' in lines
+    assert 'in_use 4' in lines
+    with pytest.raises(ValueError):
+        registry.counter('hits_total', 'duplicate')
+
+
+def test_metrics_endpoint(registry, auth_client, db_movies, unauth_client):
+    auth_client.get('/movies')
+    auth_client.get('/movies')
+    unauth_client.get('/no/such/route')
+
+    response = unauth_client.get('/metrics')
+    body = response.text
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert metrics.REQUESTS.get('GET', '/movies', '200') == 2
+    assert metrics.REQUESTS.get('GET', 'unmatched', '404') == 1
+    assert metrics.SQL_STATEMENTS.get('/movies') >= 4
+    assert metrics.PASSWORD_HASHES.get() >= 2
+    assert 'http_request_duration_seconds_count{method="GET",route="/movies"} 2' in body
+    assert 'db_pool_checked_out' in body
@@ -0,0 +1,88 @@
+import pytest
+
+from app import negotiation
+
+msgpack = pytest.importorskip('msgpack')
+
+# pylint: disable=unused-argument
+
+ACCEPT_MSGPACK = {'Accept': 'application/msgpack'}
+
+
+@pytest.mark.parametrize(
+    'path',
+    ['/movies', '/movies/1/reviews?avg_rating=true', '/users/1/reviews', '/movies/top'],
+)
+def test_msgpack_responses_have_the_json_shape(auth_client, db_reviews, path):
+    as_json = auth_client.get(path)
+    as_msgpack = auth_client.get(path, headers=ACCEPT_MSGPACK)
+
+    assert as_msgpack.status_code == 200
+    assert as_msgpack.headers['content-type'] == 'application/msgpack'
+    assert msgpack.unpackb(as_msgpack.content) == as_json.json()
+    assert len(as_msgpack.content) < len(as_json.content)
+
+
+@pytest.mark.parametrize(
+    ('accept', 'expected'),
+    [
+        ('application/json, application/msgpack;q=0.5', 'application/json'),
+        ('application/x-msgpack, application/json;q=0.9', 'application/msgpack'),
+        ('application/msgpack;q=0', 'application/json'),
+        ('*/*', 'application/json'),
+    ],
+)
+def test_accept_quality(auth_client, db_movies, accept, expected):
+    response = auth_client.get('/movies', headers={'Accept': accept})
+
+    assert response.headers['content-type'] == expected
+
+
+def test_msgpack_request_body(auth_client, db_movies):
+    body = msgpack.packb(
+        {'title': 'packed', 'description': 'sent as msgpack', 'release_year': 2021}
+    )
+    headers = {'Content-Type': 'application/msgpack', **ACCEPT_MSGPACK}
+
+    created = auth_client.post('/movies', data=body, headers=headers)
+    review = auth_client.post(
+        '/movies/4/reviews',
+        data=msgpack.packb({'rate': 9, 'text': 'packed review'}),
+        headers={'Content-Type': 'application/msgpack'},
+    )
+
+    assert created.status_code == 201
+    assert msgpack.unpackb(created.content)['title'] == 'packed'
+    assert review.status_code == 201
+    assert review.json()['rate'] == 9
+
+
+def test_errors_stay_json(auth_client, db_movies):
+    missing = auth_client.get('/movies/42/reviews', headers=ACCEPT_MSGPACK)
+    malformed = auth_client.post(
+        '/movies',
+        data=b'\xc1',
+        headers={'Content-Type': 'application/msgpack'},
+    )
+    invalid = auth_client.post(
+        '/movies',
+        data=msgpack.packb({'description': 'no title'}),
+        headers={'Content-Type': 'application/msgpack'},
+    )
+
+    assert missing.status_code == 404
+    assert missing.json() == {'detail': 'Movie not found'}
+    assert malformed.status_code == 400
+    assert invalid.status_code == 422
+
+
+def test_without_msgpack_installed(auth_client, db_movies, monkeypatch):
+    monkeypatch.setattr(negotiation, 'msgpack', None)
+
+    response = auth_client.get('/movies', headers=ACCEPT_MSGPACK)
+    refused = auth_client.post(
+        '/movies', data=b'\x80', headers={'Content-Type': 'application/msgpack'}
+    )
+
+    assert response.headers['content-type'] == 'application/json'
+    assert refused.status_code == 415
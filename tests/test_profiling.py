@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from app import profiling
+from app.config import settings
+
+# pylint: disable=unused-argument
+
+
+@pytest.fixture(name='profiling_enabled')
+def _profiling_enabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'profiling', True)
+    monkeypatch.setattr(settings, 'profile_dir', str(tmp_path / 'profiles'))
+    monkeypatch.setattr(settings, 'admin_usernames', ['new_user'])
+    return tmp_path / 'profiles'
+
+
+def test_admin_profile_capture(profiling_enabled, auth_client, db_movies):
+    response = auth_client.get('/movies', headers={'X-Profile': '1'})
+    capture_id = response.headers['X-Profile-Id']
+
+    captures = auth_client.get('/profiles').json()
+    report = auth_client.get(f'/profiles/{capture_id}?format=txt')
+    dump = auth_client.get(f'/profiles/{capture_id}')
+
+    assert response.status_code == 200
+    assert [movie['title'] for movie in response.json()] == [
+        'title1',
+        'title2',
+        'title3',
+    ]
+    assert captures[0]['id'] == capture_id
+    assert captures[0]['path'] == '/movies'
+    assert captures[0]['username'] == 'new_user'
+    assert captures[0]['threads'] == 2
+    assert 'get_current_user' in report.text
+    assert 'crud_movies.py' in report.text
+    assert 'serialize_response' in report.text
+    assert dump.status_code == 200
+    assert dump.headers['content-type'] == 'application/octet-stream'
+
+
+def test_profile_query_flag(profiling_enabled, auth_client, db_movies):
+    response = auth_client.get('/movies/1/reviews?_profile=1')
+
+    assert response.status_code == 200
+    assert 'X-Profile-Id' in response.headers
+
+
+def test_non_admin_requests_are_not_profiled(
+    profiling_enabled, auth_user1, auth_client, unauth_client, db_movies, monkeypatch
+):
+    profiled = []
+    run_profiled = profiling._run_profiled  # pylint: disable=protected-access
+
+    def counting_run_profiled(*args):
+        profiled.append(args[0].scope['path'])
+        run_profiled(*args)
+
+    monkeypatch.setattr(profiling, '_run_profiled', counting_run_profiled)
+
+    response = auth_user1.get('/movies', headers={'X-Profile': '1'})
+    anonymous = unauth_client.get('/movies', headers={'X-Profile': '1'})
+    wrong_password = auth_client.get(
+        '/movies/1/reviews', headers={'X-Profile': '1'}, auth=('new_user', 'guess')
+    )
+
+    assert response.status_code == 200
+    assert anonymous.status_code == 401
+    assert wrong_password.status_code == 401
+    assert 'X-Profile-Id' not in response.headers
+    # only the request naming an admin is profiled, and discarded
+    assert profiled == ['/movies/1/reviews']
+    assert not os.path.exists(profiling_enabled)
+    assert auth_user1.get('/profiles').status_code == 403
+
+
+def test_profiling_disabled(auth_client, db_movies, monkeypatch):
+    monkeypatch.setattr(settings, 'admin_usernames', ['new_user'])
+
+    response = auth_client.get('/movies', headers={'X-Profile': '1'})
+
+    assert 'X-Profile-Id' not in response.headers
+    assert auth_client.get('/profiles').json() == []
+    assert auth_client.get('/profiles/missing').status_code == 404
@@ -0,0 +1,179 @@
+import asyncio
+import functools
+import json
+from typing import Any, Dict, List
+
+from app import review_stream
+from app.config import settings
+
+from .conftest import basic_auth, http_scope
+
+# pylint: disable=unused-argument
+
+USER1 = basic_auth('username1', 'password1')
+
+
+async def open_stream(app, path, query='', headers=()):
+    scope = http_scope(path, query, [(b'authorization', USER1), *headers])
+    messages: 'asyncio.Queue[Dict[str, Any]]' = asyncio.Queue()
+    disconnected = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    task = asyncio.ensure_future(app(scope, receive, messages.put))
+    start = await messages.get()
+    return start, messages, disconnected, task
+
+
+async def read_events(messages, count, comments=None):
+    # reads one message, and more until count events arrived
+    events = []
+    while True:
+        message = await asyncio.wait_for(messages.get(), 5)
+        for block in message['body'].decode().split('\n\n'):
+            lines = block.splitlines()
+            if comments is not None:
+                comments.extend(line for line in lines if line.startswith(':'))
+            fields = dict(
+                line.split(': ', 1) for line in lines if not line.startswith(':')
+            )
+            if fields:
+                events.append(fields)
+        if len(events) >= count:
+            return events
+
+
+async def close(disconnected, task):
+    disconnected.set()
+    await asyncio.wait_for(task, 5)
+
+
+def in_thread(call, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(None, functools.partial(call, *args, **kwargs))
+
+
+def test_stream_pushes_review_changes(app, auth_user1, auth_user2, db_movies):
+    subscribers = review_stream.SUBSCRIBERS.get() or 0
+    comments: List[str] = []
+
+    async def main():
+        start, messages, disconnected, task = await open_stream(
+            app, '/movies/1/reviews/stream'
+        )
+        await read_events(messages, 0, comments)
+        assert review_stream.SUBSCRIBERS.get() == subscribers + 1
+
+        await in_thread(auth_user2.post, '/movies/2/reviews', json={'rate': 3})
+        await in_thread(auth_user1.post, '/movies/1/reviews', json={'rate': 8})
+        await in_thread(auth_user1.post, '/movies/1/reviews', json={'rate': 9})
+        await in_thread(
+            auth_user1.put, '/movies/1/reviews', json={'rate': 5, 'text': 'better'}
+        )
+        await in_thread(auth_user1.delete, '/movies/1/reviews')
+        events = await read_events(messages, 3, comments)
+        await close(disconnected, task)
+        return start, events
+
+    start, events = asyncio.run(main())
+
+    assert start['status'] == 200
+    assert (b'content-type', b'text/event-stream; charset=utf-8') in start['headers']
+    assert comments == [': connected']
+    assert [event['event'] for event in events] == ['created', 'updated', 'deleted']
+    created, updated, deleted = (json.loads(event['data']) for event in events)
+    assert created['id'] == updated['id'] == deleted['id'] == 2
+    assert (created['rate'], created['movie']['avg_rating']) == (8, 8)
+    assert (updated['rate'], updated['text']) == (5, 'better')
+    assert deleted == {'id': 2, 'user_id': 1, 'movie_id': 1}
+    assert len({event['id'] for event in events}) == 3
+    assert review_stream.SUBSCRIBERS.get() == subscribers
+
+
+def test_resume_from_last_event_id(app, auth_user1, db_movies, monkeypatch):
+    monkeypatch.setattr(settings, 'review_stream_keepalive', 0.01)
+
+    async def main():
+        _, messages, disconnected, task = await open_stream(
+            app, '/movies/1/reviews/stream'
+        )
+        await in_thread(auth_user1.post, '/movies/1/reviews', json={'rate': 8})
+        [created] = await read_events(messages, 1)
+        await close(disconnected, task)
+
+        # missed while disconnected
+        await in_thread(auth_user1.put, '/movies/1/reviews', json={'rate': 5})
+        await in_thread(auth_user1.delete, '/movies/1/reviews')
+
+        resumed = []
+        for query, headers in (
+            ('', [(b'last-event-id', created['id'].encode())]),
+            (f'last_event_id={created["id"]}', []),
+            ('last_event_id=elsewhere-1', []),
+        ):
+            comments: List[str] = []
+            _, messages, disconnected, task = await open_stream(
+                app, '/movies/1/reviews/stream', query, headers
+            )
+            events = await read_events(messages, 1, comments)
+            while not any(comment == ': keepalive' for comment in comments):
+                events += await read_events(messages, 0, comments)
+            await close(disconnected, task)
+            resumed.append([event['event'] for event in events])
+        return resumed
+
+    assert asyncio.run(main()) == [
+        ['updated', 'deleted'],
+        ['updated', 'deleted'],
+        ['reset'],
+    ]
+
+
+def test_history_too_short_to_resume(monkeypatch):
+    monkeypatch.setattr(settings, 'review_stream_history', 1)
+
+    async def main():
+        events = review_stream.stream(1, None)
+        await events.__anext__()
+        review_stream._dispatch(1, 'created', '{}')
+        first = await events.__anext__()
+        await events.aclose()
+        review_stream._dispatch(1, 'deleted', '{}')
+        review_stream._dispatch(1, 'created', '{}')
+
+        last_event_id = first.split('\n')[0][len('id: ') :]
+        resumed = review_stream.stream(1, last_event_id)
+        await resumed.__anext__()
+        reset = await resumed.__anext__()
+        await resumed.aclose()
+        return reset
+
+    assert 'event: reset' in asyncio.run(main())
+
+
+def test_slow_clients_are_dropped(monkeypatch):
+    monkeypatch.setattr(settings, 'review_stream_buffer', 1)
+    overflows = review_stream.OVERFLOWS.get() or 0
+
+    async def main():
+        events = review_stream.stream(1, None)
+        await events.__anext__()
+        review_stream._dispatch(1, 'created', '{}')
+        review_stream._dispatch(1, 'updated', '{}')
+        # both are delivered before the stream reads the first one
+        return [chunk async for chunk in events]
+
+    assert asyncio.run(main()) == []
+    assert review_stream.OVERFLOWS.get() == overflows + 1
+
+
+def test_stream_errors(auth_user1, unauth_client, db_movies):
+    assert auth_user1.get('/movies/42/reviews/stream').status_code == 404
+    assert unauth_client.get('/movies/1/reviews/stream').status_code == 401
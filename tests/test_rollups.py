@@ -0,0 +1,78 @@
+from datetime import date, datetime
+
+from app import models, rollups
+
+# pylint: disable=unused-argument
+
+
+def _rollups(session):
+    return sorted(
+        (row.movie_id, row.period, row.bucket, row.rate, row.count)
+        for row in session.query(models.RatingRollup).filter(
+            models.RatingRollup.count > 0
+        )
+    )
+
+
+def test_trend_follows_review_writes(auth_client, auth_user1, db_movies):
+    today = date.today().isoformat()
+    auth_client.post('/movies/1/reviews', json={'rate': 8})
+    auth_user1.post('/movies/1/reviews', json={'rate': 4})
+
+    response = auth_client.get('/movies/1/ratings/trend')
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {'bucket': today, 'count': 2, 'avg_rating': 6, 'histogram': {'4': 1, '8': 1}}
+    ]
+
+    auth_user1.put('/movies/1/reviews', json={'rate': 10})
+    auth_client.delete('/movies/1/reviews')
+
+    assert auth_client.get('/movies/1/ratings/trend?period=month').json() == [
+        {
+            'bucket': date.today().replace(day=1).isoformat(),
+            'count': 1,
+            'avg_rating': 10,
+            'histogram': {'10': 1},
+        }
+    ]
+    assert auth_client.get('/movies/2/ratings/trend').json() == []
+    assert auth_client.get('/movies/42/ratings/trend').status_code == 404
+
+
+def test_backfill(session, db_reviews):
+    db_reviews[0][0].datetime = datetime(2021, 3, 14, 12)
+    db_reviews[1][0].datetime = datetime(2021, 3, 20, 12)
+    session.commit()
+
+    assert rollups.backfill(session) == 10
+    backfilled = _rollups(session)
+    session.query(models.RatingRollup).delete()
+    for user_reviews in db_reviews:
+        for review in user_reviews:
+            rollups.record(session, review.movie_id, review.rate, review.datetime, 1)
+    session.commit()
+
+    assert _rollups(session) == backfilled
+    assert (1, 'month', date(2021, 3, 1), 2, 1) in backfilled
+
+
+def test_trend_range(auth_client, session, db_reviews):
+    db_reviews[0][0].datetime = datetime(2021, 3, 14, 12)
+    db_reviews[1][0].datetime = datetime(2021, 4, 20, 12)
+    session.commit()
+    rollups.backfill(session)
+
+    march = auth_client.get(
+        '/movies/1/ratings/trend', params={'since': '2021-03-01', 'until': '2021-03-31'}
+    ).json()
+    months = auth_client.get(
+        '/movies/1/ratings/trend', params={'period': 'month', 'since': '2021-03-15'}
+    ).json()
+
+    assert march == [
+        {'bucket': '2021-03-14', 'count': 1, 'avg_rating': 10, 'histogram': {'10': 1}}
+    ]
+    assert [point['bucket'] for point in months] == ['2021-03-01', '2021-04-01']
+    assert months[1]['histogram'] == {'2': 1}
@@ -0,0 +1,61 @@
+from app import search
+
+# pylint: disable=unused-argument
+
+
+def _ids(response):
+    return [review['id'] for review in response.json()]
+
+
+def test_match_expression():
+    assert search.match_expression('Great "acting" OR') == '"Great" "acting" "OR"*'
+    assert search.match_expression('  -*() ') == ''
+
+
+def test_search_follows_review_writes(auth_client, auth_user1, db_movies):
+    auth_client.post('/movies/1/reviews', json={'rate': 8, 'text': 'great acting'})
+    auth_user1.post('/movies/1/reviews', json={'rate': 4, 'text': 'great boredom'})
+    auth_user1.post('/movies/2/reviews', json={'rate': 6, 'text': 'acting was great'})
+
+    assert _ids(auth_client.get('/reviews/search?q=actin')) == [1, 3]
+    assert _ids(auth_client.get('/reviews/search?q=great&movie_id=1&user_id=1')) == [2]
+
+    auth_user1.put('/movies/2/reviews', json={'rate': 6, 'text': 'plain story'})
+    auth_client.delete('/movies/1/reviews')
+
+    assert _ids(auth_client.get('/reviews/search?q=acting')) == []
+    assert _ids(auth_client.get('/reviews/search?q=story')) == [3]
+
+    auth_client.delete('/movies/1')
+
+    assert _ids(auth_client.get('/reviews/search?q=great')) == []
+    assert auth_client.get('/reviews/search?q=').status_code == 422
+    assert auth_client.get('/reviews/search?q=***').json() == []
+
+
+def test_ranked_keyset_pages(auth_client, session, db_reviews):
+    assert auth_client.get('/reviews/search?q=good').json() == []
+    db_reviews[0][1].text = 'good and good again'
+    session.commit()
+
+    search.rebuild(session)
+    session.commit()
+    first = auth_client.get('/reviews/search?q=good&limit=1').json()
+    second = auth_client.get(
+        '/reviews/search',
+        params={
+            'q': 'good',
+            'limit': 1,
+            'after_rank': first[0]['rank'],
+            'after_id': first[0]['id'],
+        },
+    ).json()
+    third = auth_client.get(
+        '/reviews/search',
+        params={'q': 'good', 'after_rank': second[0]['rank'], 'after_id': 99},
+    ).json()
+
+    assert {first[0]['text'], second[0]['text']} == {'very good', 'good and good again'}
+    assert first[0]['rank'] <= second[0]['rank']
+    assert first[0]['movie']['title'] in {'title1', 'title2'}
+    assert third == []
@@ -0,0 +1,113 @@
+from datetime import datetime
+
+import pytest
+
+from app import crud_movies, models, schemas, similarity
+from app.config import settings
+
+# pylint: disable=unused-argument
+
+RATINGS = {
+    'fan1': {1: 9, 2: 9, 3: 2},
+    'fan2': {1: 8, 2: 9, 3: 1},
+    'critic': {1: 3, 2: 2, 3: 8},
+}
+
+
+@pytest.fixture(name='db_ratings')
+def _db_ratings(session, db_movies):
+    for username, ratings in RATINGS.items():
+        user = models.User(username=username, hashed_password='-')
+        session.add(user)
+        for movie_id, rate in ratings.items():
+            session.add(
+                models.Review(
+                    user=user, movie_id=movie_id, rate=rate, datetime=datetime.now()
+                )
+            )
+    session.commit()
+
+
+def test_adjusted_cosine_neighbors(session, db_ratings):
+    by_user, by_movie = similarity.load_ratings(session)
+    movie_norms = similarity.norms(by_movie)
+
+    neighbors = similarity.neighbors(1, by_user, by_movie, movie_norms)
+
+    assert [movie_id for movie_id, _ in neighbors] == [2]
+    assert 0 < neighbors[0][1] <= 1
+    assert similarity.neighbors(3, by_user, by_movie, movie_norms) == []
+
+
+def test_similar_movies(auth_client, session, db_ratings):
+    assert auth_client.get('/movies/1/similar').json() == []
+
+    assert similarity.refresh(session, full=True) == 3
+    response = auth_client.get('/movies/1/similar')
+
+    assert response.status_code == 200
+    assert [movie['title'] for movie in response.json()] == ['title2']
+    assert auth_client.get('/movies/42/similar').status_code == 404
+
+
+def test_incremental_refresh(auth_client, session, db_ratings):
+    similarity.refresh(session, full=True)
+    assert similarity.refresh(session) == 0
+
+    auth_client.post('/movies/3/reviews', json={'rate': 9})
+    assert session.query(models.StaleSimilarity.movie_id).all() == [(3,)]
+    # the raters of movie 3 rated the others too
+    assert similarity.refresh(session) == 3
+    assert session.query(models.StaleSimilarity).count() == 0
+
+    auth_client.delete('/movies/2')
+    assert auth_client.get('/movies/1/similar').json() == []
+    assert session.query(models.SimilarMovie).count() == 0
+
+
+def similar_movies(session):
+    session.expire_all()
+    return {
+        (row.movie_id, row.similar_id): row.score
+        for row in session.query(models.SimilarMovie)
+    }
+
+
+def test_incremental_refresh_matches_full(session, db_movies, monkeypatch):
+    monkeypatch.setattr(settings, 'similar_movies_k', 1)
+    session.add_all(models.Movie(title=title) for title in ('title4', 'title5'))
+    users = {}
+    for username, ratings in {
+        'a': {1: 7, 2: 7, 3: 6, 5: 10},
+        'b': {1: 4, 2: 5, 3: 2, 5: 10},
+        'c': {3: 10, 4: 2},
+    }.items():
+        user = users[username] = models.User(username=username, hashed_password='-')
+        for movie_id, rate in ratings.items():
+            session.add(
+                models.Review(
+                    user=user, movie_id=movie_id, rate=rate, datetime=datetime.now()
+                )
+            )
+    session.commit()
+    similarity.refresh(session, full=True)
+    assert (1, 2) in similar_movies(session)
+
+    # movie 3 is nearer to movie 1 once its norm shrinks, although neither c nor
+    # anyone else changed a rating of movie 1
+    db_review = crud_movies.get_review_by_movie_and_user_ids(
+        movie_id=3, user_id=users['c'].id, session=session
+    )
+    assert db_review is not None
+    crud_movies.update_review(
+        db_review, schemas.ReviewCreate(rate=1, text='changed my mind'), session
+    )
+    session.commit()
+
+    similarity.refresh(session)
+    incremental = similar_movies(session)
+    similarity.refresh(session, full=True)
+    full = similar_movies(session)
+
+    assert (1, 3) in full
+    assert incremental == pytest.approx(full)
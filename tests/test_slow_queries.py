@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from app import crud_movies, slow_queries
+from app.config import settings
+
+# pylint: disable=unused-argument
+
+
+@pytest.fixture(name='slow_log')
+def _slow_log(tmp_path, monkeypatch):
+    path = tmp_path / 'slow.log'
+    monkeypatch.setattr(settings, 'slow_query_ms', 1e-9)
+    monkeypatch.setattr(settings, 'slow_query_log_path', str(path))
+    slow_queries.reset()
+    yield path
+    slow_queries.reset()
+
+
+def test_normalize():
+    statement = "SELECT * FROM movies WHERE id IN (?, ?, ?) AND title = 'a''b' LIMIT 20"
+
+    assert slow_queries.normalize(statement) == (
+        'SELECT * FROM movies WHERE id IN (...) AND title = ? LIMIT ?'
+    )
+    assert slow_queries.fingerprint(statement) == slow_queries.fingerprint(
+        statement.replace('20', '5')
+    )
+
+
+def test_slow_query_logged_with_plan(session, db_movies, slow_log):
+    crud_movies.get_movies(
+        session=session, filter_str='title', release_year=2018, sort_by_avg_rating=True
+    )
+
+    records = [json.loads(line) for line in slow_log.read_text().splitlines()]
+    record = records[-1]
+    summary = slow_queries.summary()
+
+    assert record['caller'] == 'app.crud_movies.get_movies'
+    assert set(record['parameters']) == {2018, '%title%', 0, 11, 20}
+    assert any('movies' in step for step in record['plan'])
+    assert record['fingerprint'] in {query['fingerprint'] for query in summary}
+    assert all(query['count'] >= 1 for query in summary)
+
+
+def test_threshold_disables_logging(session, db_movies, slow_log, monkeypatch):
+    monkeypatch.setattr(settings, 'slow_query_ms', 0)
+
+    crud_movies.get_movies(session=session)
+
+    assert not slow_queries.summary()
+    assert not slow_log.exists()
+
+
+def test_slow_queries_endpoint(unauth_client, db_movies, slow_log):
+    response = unauth_client.get('/metrics/slow_queries')
+
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect
+
+from app.admin import create_admin_app
+from app.api import create_app
+from app.database import init_db
+
+# pylint: disable=unused-argument
+
+
+def test_import_has_no_side_effects(tmp_path):
+    database = tmp_path / 'import.db'
+    env = dict(os.environ, MOVIES_DATABASE_URL=f'sqlite:///{database}')
+    probe = (
+        'import json, sys; import app.api; '
+        'print(json.dumps([name in sys.modules for name in ("flask", "uvicorn")]))'
+    )
+
+    output = subprocess.run(
+        [sys.executable, '-c', probe],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    ).stdout
+
+    assert json.loads(output) == [False, False]
+    assert not database.exists()
+
+
+def test_init_db(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "init.db"}')
+
+    init_db(engine)
+
+    assert set(inspect(engine).get_table_names()) >= {'users', 'movies', 'reviews'}
+
+
+def test_create_app_lifespan(app):
+    fresh_app = create_app()
+
+    with TestClient(fresh_app) as client:
+        response = client.get('/metrics')
+
+    assert fresh_app is not app
+    assert response.status_code == 200
+
+
+def test_admin_app(session, db_reviews):
+    client = create_admin_app(session).test_client()
+
+    assert client.get('/').status_code == 302
+    assert client.get('/admin/movie/').status_code == 200
+    assert b'title1' in client.get('/admin/movie/').data
@@ -0,0 +1,57 @@
+import json
+import logging
+
+import pytest
+
+from app import timing
+from app.config import settings
+
+# pylint: disable=unused-argument
+
+
+@pytest.fixture(name='timing_enabled')
+def _timing_enabled():
+    timing.set_enabled(True)
+    yield
+    timing.set_enabled(False)
+
+
+def test_server_timing_header(timing_enabled, auth_client, db_movies, caplog):
+    with caplog.at_level(logging.INFO, logger='app.access'):
+        response = auth_client.get('/movies?sort_by_avg_rating=true')
+
+    metrics = dict(
+        metric.strip().split(';', 1)
+        for metric in response.headers['Server-Timing'].split(',')
+    )
+    record = json.loads(caplog.records[-1].getMessage())
+
+    assert response.status_code == 200
+    assert {'auth', 'db', 'serialize', 'total'} <= set(metrics)
+    assert record['route'] == '/movies'
+    assert record['status'] == 200
+    assert record['db_queries'] >= 2
+    assert set(record['phases_ms']) == {'auth', 'db', 'serialize'}
+
+
+def test_server_timing_unauthorized(timing_enabled, unauth_client, db_movies):
+    response = unauth_client.get('/movies')
+
+    assert response.status_code == 401
+    assert 'total;dur=' in response.headers['Server-Timing']
+
+
+def test_server_timing_disabled(auth_client, db_movies, caplog):
+    assert not settings.server_timing
+
+    with caplog.at_level(logging.INFO, logger='app.access'):
+        response = auth_client.get('/movies')
+
+    assert response.status_code == 200
+    assert 'Server-Timing' not in response.headers
+    assert not caplog.records
+
+
+def test_phase_without_request():
+    with timing.phase('auth'):
+        assert timing.current() is None
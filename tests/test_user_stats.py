@@ -0,0 +1,82 @@
+from app import crud_users
+
+# pylint: disable=unused-argument
+
+
+def test_stats_follow_review_writes(auth_client, auth_user1, db_movies):
+    auth_client.post('/movies/1/reviews', json={'rate': 8, 'text': 'great movie'})
+    auth_client.post('/movies/2/reviews', json={'rate': 3})
+    auth_user1.post('/movies/1/reviews', json={'rate': 5})
+
+    stats = auth_client.get('/users/3/stats').json()
+
+    assert stats['no_ratings'] == 2
+    assert stats['no_reviews'] == 1
+    assert stats['avg_given_rating'] == 5.5
+    assert stats['last_active_at'] is not None
+
+    auth_client.put('/movies/2/reviews', json={'rate': 9, 'text': 'better second time'})
+    auth_client.delete('/movies/1/reviews')
+    stats = auth_client.get('/users/3/stats').json()
+
+    assert (stats['no_ratings'], stats['no_reviews'], stats['avg_given_rating']) == (
+        1,
+        1,
+        9,
+    )
+
+    auth_client.delete('/movies/1')
+
+    assert auth_client.get('/users/1/stats').json()['no_ratings'] == 0
+    assert auth_client.get('/users/2/stats').json() == {
+        'no_ratings': 0,
+        'no_reviews': 0,
+        'avg_given_rating': 0,
+        'last_active_at': None,
+    }
+    assert auth_client.get('/users/42/stats').status_code == 404
+
+
+def test_users_with_stats(auth_client, session, db_reviews):
+    crud_users.backfill_user_stats(session)
+    session.commit()
+
+    plain = auth_client.get('/users').json()
+    embedded = auth_client.get('/users?with_stats=true&limit=2').json()
+
+    assert plain[0] == {'id': 1, 'username': 'username1'}
+    assert [user['stats']['no_ratings'] for user in embedded] == [3, 2]
+    assert embedded[0]['stats']['no_reviews'] == 2
+    assert embedded[1]['stats']['avg_given_rating'] == 3
+    assert auth_client.get('/users?with_stats=true&after_id=2').json() == [
+        {
+            'id': 3,
+            'username': 'new_user',
+            'stats': {
+                'no_ratings': 0,
+                'no_reviews': 0,
+                'avg_given_rating': 0,
+                'last_active_at': None,
+            },
+        }
+    ]
+
+
+def test_missing_stats_are_counted_from_reviews(auth_user2, db_reviews):
+    auth_user2.delete('/movies/2/reviews')
+    stats = auth_user2.get('/users/2/stats').json()
+
+    assert (stats['no_ratings'], stats['no_reviews'], stats['avg_given_rating']) == (
+        1,
+        0,
+        2,
+    )
+
+    auth_user2.put('/movies/1/reviews', json={'rate': 6, 'text': 'grew on me'})
+    stats = auth_user2.get('/users/2/stats').json()
+
+    assert (stats['no_ratings'], stats['no_reviews'], stats['avg_given_rating']) == (
+        1,
+        1,
+        6,
+    )
@@ -34,6 +34,14 @@ def test_registration_existing_username(unauth_client, session, db_users):
     assert len(users) == len(db_users)
 
 
+def test_wrong_password(unauth_client, db_users):
+    response = unauth_client.get('/users', auth=('username1', 'wrong'))
+
+    assert response.status_code == 401
+    assert response.json() == {'detail': 'Incorrect username or password'}
+    assert response.headers['WWW-Authenticate'] == 'Basic'
+
+
 @pytest.mark.parametrize(('limit', 'after_id'), [(20, 0), (1, 0), (1, 1), (1, 2)])
 def test_get_all_users(session, auth_client, limit, after_id, db_users):
     # new_user, auth = new_user_and_auth_head
@@ -0,0 +1,134 @@
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from app import writer
+from app.config import settings
+from app.database import _configure_sqlite
+from app.routing import users
+
+# pylint: disable=unused-argument
+
+
+@pytest.fixture(name='lock_path')
+def _lock_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'writer.lock')
+    monkeypatch.setattr(settings, 'writer_lock_path', path)
+    return path
+
+
+def test_writes_are_serialized_across_threads(lock_path):
+    active = []
+    overlaps = []
+
+    def write():
+        with writer.exclusive():
+            active.append(1)
+            overlaps.append(len(active))
+            time.sleep(0.01)
+            active.pop()
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlaps == [1] * 8
+
+
+def test_writes_are_serialized_across_processes(lock_path, monkeypatch):
+    monkeypatch.setattr(settings, 'writer_timeout', 0.05)
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            '-c',
+            'import fcntl, sys, time; lock = open(sys.argv[1], "w"); '
+            'fcntl.flock(lock, fcntl.LOCK_EX); print("locked", flush=True); '
+            'sys.stdin.readline()',
+            lock_path,
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert holder.stdout is not None
+    try:
+        assert holder.stdout.readline() == 'locked\n'
+        with pytest.raises(writer.WriterBusy):
+            with writer.exclusive():
+                pass
+    finally:
+        holder.communicate('\n')
+
+    with writer.exclusive():
+        pass
+
+
+def test_writer_busy_returns_503(lock_path, auth_client, db_movies, monkeypatch):
+    monkeypatch.setattr(settings, 'writer_timeout', 0.05)
+    timeouts = writer.WRITER_TIMEOUTS.get()
+    lock = writer.get_lock(lock_path)
+    lock.acquire(1)
+    try:
+        response = auth_client.delete('/movies/1')
+    finally:
+        lock.release()
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert writer.WRITER_TIMEOUTS.get() == timeouts + 1
+    assert writer.WRITER_WAITING.get() == 0
+    assert len(auth_client.get('/movies').json()) == 3
+    assert auth_client.delete('/movies/1').status_code == 200
+
+
+def test_registration_hashes_outside_the_writer_lock(
+    lock_path, auth_client, unauth_client, db_movies, monkeypatch
+):
+    monkeypatch.setattr(settings, 'writer_timeout', 1)
+    hashing = threading.Event()
+    reviewed = threading.Event()
+    make_password_hash = users.make_password_hash
+
+    def slow_hash(password):
+        hashing.set()
+        # the review below has to get through while the password is hashed
+        reviewed.wait(5)
+        return make_password_hash(password)
+
+    monkeypatch.setattr(users, 'make_password_hash', slow_hash)
+    registrations = []
+    registration = threading.Thread(
+        target=lambda: registrations.append(
+            unauth_client.post(
+                '/users', json={'username': 'newcomer', 'password': 'password'}
+            )
+        )
+    )
+    registration.start()
+    try:
+        assert hashing.wait(5)
+        review = auth_client.post('/movies/1/reviews', json={'rate': 5})
+    finally:
+        reviewed.set()
+        registration.join()
+
+    assert review.status_code == 201
+    assert registrations[0].status_code == 201
+
+
+def test_sqlite_wal(tmp_path):
+    connection = sqlite3.connect(tmp_path / 'wal.db')
+
+    _configure_sqlite(connection, None)
+
+    assert connection.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+    assert connection.execute('PRAGMA busy_timeout').fetchone() == (
+        settings.sqlite_busy_timeout_ms,
+    )
+    connection.close()